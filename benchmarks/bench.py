@@ -0,0 +1,310 @@
+# ===========================================================================================
+# benchmarks/bench.py
+# -------------------------------------------------------------------------------------------
+# Mediciones de rendimiento de Klarity con usuarios sintéticos (ver ledger.py):
+# - Para cada tamaño (1k, 10k, 100k y, opcionalmente, 1M transacciones) mide por
+#   separado la carga de datos, el filtrado, los agregados, el llenado de la tabla y el
+#   dibujo de gráficos, usando las mismas funciones que las vistas.
+# - La carga pasa por firebase_service con el backend falso (KLARITY_BACKEND=fake).
+# - El llenado del Treeview solo se mide si hay pantalla (si no, queda como omitido).
+# - Mide el arranque desde la caché en disco (ledger_store: columnas .npy mapeadas).
+# - Mide también la memoria (pico de tracemalloc) de las transacciones como dicts y
+#   como columnar.Ledger, y de los DataFrames que arman las vistas con cada una.
+# - Escribe los resultados en JSON y los compara con una línea base guardada: una etapa
+#   más lenta que la base por encima del umbral cuenta como regresión (código de salida 1).
+# No son pruebas: los tiempos dependen de la máquina, así que la línea base debe
+# generarse (--guardar-base) en la misma máquina donde se compara.
+#
+# Uso (desde la raíz del repositorio):
+#   python benchmarks/bench.py                               # 1k, 10k y 100k contra la base
+#   python benchmarks/bench.py --tamanos 1k 10k 100k 1m --repeticiones 1
+#   python benchmarks/bench.py --guardar-base                # actualiza benchmarks/baseline.json
+# ===========================================================================================
+
+import argparse
+import atexit
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(AQUI, "..", "src"))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+# Siempre contra la base en memoria: nada de red ni credenciales
+os.environ["KLARITY_BACKEND"] = "fake"
+os.environ.pop("KLARITY_FAKE_DB", None)
+os.environ.pop("KLARITY_FAKE_LATENCY_MS", None)
+os.environ.pop("KLARITY_FAKE_FAILURE_RATE", None)
+# Caché en disco temporal: no toca la del usuario
+os.environ["KLARITY_CACHE_DIR"] = tempfile.mkdtemp(prefix="klarity-bench-")
+atexit.register(shutil.rmtree, os.environ["KLARITY_CACHE_DIR"], True)
+
+import aggregates as agg                       # noqa: E402
+import columnar                                # noqa: E402
+import ledger_store                            # noqa: E402
+import firebase_service as fb                  # noqa: E402
+import search_index                            # noqa: E402
+import ui_ai_advisor as advisor                # noqa: E402
+import ui_dashboard as dash                    # noqa: E402
+import ui_transacciones as trans               # noqa: E402
+from chart_render import render_figure         # noqa: E402
+from ledger import generate_ledger, parse_size  # noqa: E402
+
+BASELINE = os.path.join(AQUI, "baseline.json")
+UMBRAL = 0.25           # 25 % más lento que la base = regresión
+MIN_DELTA = 0.005       # Diferencias de menos de 5 ms se consideran ruido
+TAMANOS = ("1k", "10k", "100k")
+UID = "bench-user"
+PROMPT = "Resume mis transacciones entre {desde} y {hasta}:\n{json_txs}"
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Medición
+# -------------------------------------------------------------------------------------------
+
+def medir(fn: Callable[[], object], repeticiones: int) -> Dict[str, float]:
+    """Ejecuta 'fn' varias veces (con el GC recogido antes) y devuelve mediana y mínimo."""
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return {"mediana": statistics.median(tiempos), "min": min(tiempos)}
+
+
+def medir_memoria(fn: Callable[[], object]) -> float:
+    """Pico de memoria (MB, según tracemalloc) mientras 'fn' arma su resultado."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        resultado = fn()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del resultado
+    return round(pico / 1e6, 2)
+
+
+def _tk_tree():
+    """Treeview oculto como el de Transacciones, o None si no hay pantalla."""
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+    except Exception:
+        return None
+    root.withdraw()
+    cols = ("Fecha", "Descripción", "Monto", "Tipo", "Categoría")
+    tree = ttk.Treeview(root, columns=cols, show="headings", selectmode="extended")
+    return root, tree
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Etapas por tamaño
+# -------------------------------------------------------------------------------------------
+
+def bench_size(n: int, repeticiones: int, semilla: int, log=print,
+               memoria: Optional[Dict[str, float]] = None) -> Dict[str, Optional[Dict]]:
+    """
+    Mide todas las etapas para un usuario de 'n' transacciones.
+    Si se pasa 'memoria' (dict), la llena con los picos de memoria en MB.
+    """
+    log(f"· Generando {n:,} transacciones…".replace(",", "."))
+    ledger = generate_ledger(n, seed=semilla)
+    fb.db.child("transacciones").child(UID).set(ledger)
+    payload = json.dumps(ledger)
+    fechas = [t["fecha"] for t in ledger.values()]
+    d0 = datetime.fromtimestamp(min(fechas)).date()
+    d1 = datetime.fromtimestamp(max(fechas)).date()
+    ultimo_trimestre = d1 - timedelta(days=90)
+
+    res: Dict[str, Optional[Dict]] = {}
+
+    def etapa(nombre: str, fn: Callable[[], object]) -> None:
+        res[nombre] = medir(fn, repeticiones)
+        log(f"  {nombre:<24} {res[nombre]['mediana'] * 1000:10.1f} ms")
+
+    # Carga: lectura completa (como al abrir cualquier vista) y decodificación del JSON
+    def cargar():
+        fb._tx_snapshots.pop(UID, None)
+        return fb.get_transactions(UID)
+    etapa("carga.firebase", cargar)
+    etapa("carga.json", lambda: json.loads(payload))
+    raw, _ = fb.get_transactions(UID)
+    etapa("carga.columnas", lambda: columnar.Ledger.from_raw(raw))
+    led = columnar.Ledger.from_raw(raw)
+
+    if memoria is not None:
+        memoria["dicts"] = medir_memoria(lambda: json.loads(payload))
+        memoria["ledger"] = medir_memoria(lambda: columnar.Ledger.from_raw(raw))
+        memoria["ledger_residente"] = round(led.nbytes / 1e6, 2)
+        memoria["dataframe.dicts"] = medir_memoria(lambda: pd.DataFrame(list(raw.values())))
+        memoria["dataframe.ledger"] = medir_memoria(lambda: led.to_dataframe(fechas=True))
+        log("  memoria (MB): " + ", ".join(f"{k}={v}" for k, v in memoria.items()))
+
+    # Arranque en frío desde la caché en disco: abrir las columnas y los totales del mes
+    ledger_store.save(UID, led)
+    etapa("carga.mmap", lambda: ledger_store.load(UID))
+    mes = d1.replace(day=1)
+    etapa("home.arranque",
+          lambda: dash.resumen_periodo(ledger_store.load(UID), mes, d1 + timedelta(days=1)))
+    # Repetición de apertura: solo leer la instantánea del Home (saludo, tarjetas y series)
+    dash.guardar_instantanea(UID, {"formato": dash.FORMATO_INSTANTANEA, "perfil": {},
+                                   "estado": dash.estado_home(led, mes, d1 + timedelta(days=1))})
+    etapa("home.instantanea", lambda: dash.cargar_instantanea(UID))
+
+    # Transacciones: índice de búsqueda, búsqueda, filtro + orden y filas de la tabla
+    etapa("transacciones.indice", lambda: search_index.TransactionIndex(raw, 1))
+    idx = search_index.TransactionIndex(raw, 1)
+    etapa("transacciones.busqueda", lambda: idx.search("mercado exito"))
+    etapa("transacciones.filtro",
+          lambda: trans.filtrar(raw, None, d0, d1, "fecha", True, ledger=led))
+    lista = trans.filtrar(raw, None, d0, d1, "fecha", True, ledger=led)
+    etapa("transacciones.filas", lambda: [trans.fila(t) for t in lista])
+
+    tk_tree = _tk_tree()
+    if tk_tree is None:
+        res["transacciones.tabla"] = None
+        log(f"  {'transacciones.tabla':<24} {'omitido (sin pantalla)':>13}")
+    else:
+        root, tree = tk_tree
+        filas = [(t["__key"], trans.fila(t)) for t in lista]
+
+        def poblar():
+            tree.delete(*tree.get_children())
+            for key, valores in filas:
+                tree.insert("", "end", iid=key, values=valores)
+            root.update_idletasks()
+        etapa("transacciones.tabla", poblar)
+        root.destroy()
+
+    # Home: totales del periodo completo y series de los gráficos
+    fin = d1 + timedelta(days=1)
+    etapa("home.resumen", lambda: dash.resumen_periodo(led, d0, fin))
+    df_r = dash.resumen_periodo(led, d0, fin)[0]
+    etapa("home.series", lambda: (dash.gastos_por_categoria(df_r), dash.saldo_acumulado(df_r)))
+
+    # Reportes: buckets diarios y ventana del periodo completo
+    etapa("reportes.agregados", lambda: agg.DailyBuckets(led).window(d0, d1))
+    w = agg.DailyBuckets(led).window(d0, d1)
+
+    # Gráficos (Agg, sin Tk): rejilla 2x2 de Reportes y línea de saldo del Home
+    panels = agg.report_panels(w)
+    etapa("graficos.reportes", lambda: render_figure(panels, (1000, 640), (2, 2)))
+    serie = dash.saldo_acumulado(df_r)
+    linea = [("Saldo Acumulado", serie.index.to_numpy(), serie.to_numpy(), "line")]
+    etapa("graficos.home", lambda: render_figure(linea, (1000, 300)))
+
+    # Asistente: prompt del último trimestre
+    etapa("asistente.prompt", lambda: advisor.build_prompt(PROMPT, raw, ultimo_trimestre, d1))
+
+    fb.db.child("transacciones").child(UID).remove()
+    fb._tx_snapshots.pop(UID, None)
+    ledger_store.clear(UID)
+    return res
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Comparación con la línea base
+# -------------------------------------------------------------------------------------------
+
+def compare(actual: Dict, base: Dict, umbral: float = UMBRAL,
+            min_delta: float = MIN_DELTA) -> List[str]:
+    """
+    Compara las medianas de 'actual' con las de 'base' (mismo formato de resultados).
+    Retorna las líneas de las regresiones: etapas más lentas que la base en más de
+    'umbral' (fracción) y en más de 'min_delta' segundos.
+    """
+    regresiones = []
+    for tam, etapas in actual.get("resultados", {}).items():
+        etapas_base = base.get("resultados", {}).get(tam, {})
+        for nombre, r in etapas.items():
+            b = etapas_base.get(nombre)
+            if not r or not b:
+                continue
+            t, tb = r["mediana"], b["mediana"]
+            if t > tb * (1 + umbral) and t - tb > min_delta:
+                regresiones.append(f"{tam:>5} {nombre:<24} {tb * 1000:9.1f} ms → "
+                                   f"{t * 1000:9.1f} ms (+{(t / tb - 1):.0%})")
+    return regresiones
+
+
+def _meta(repeticiones: int, semilla: int) -> Dict:
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeticiones": repeticiones,
+        "semilla": semilla,
+    }
+
+
+# -------------------------------------------------------------------------------------------
+# 4) Línea de comandos
+# -------------------------------------------------------------------------------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mide el rendimiento de Klarity con usuarios sintéticos.")
+    parser.add_argument("--tamanos", nargs="+", default=list(TAMANOS), metavar="N",
+                        help="transacciones por usuario (1k, 10k, 100k, 1m…)")
+    parser.add_argument("--repeticiones", type=int, default=3,
+                        help="repeticiones por etapa (se reporta la mediana)")
+    parser.add_argument("--semilla", type=int, default=42, help="semilla del generador")
+    parser.add_argument("--salida", default="bench_resultados.json",
+                        help="archivo JSON con los resultados")
+    parser.add_argument("--base", default=BASELINE, help="línea base con la que comparar")
+    parser.add_argument("--umbral", type=float, default=UMBRAL,
+                        help="fracción de tiempo extra que cuenta como regresión (0.25 = 25 %%)")
+    parser.add_argument("--guardar-base", action="store_true",
+                        help="guarda los resultados como nueva línea base")
+    args = parser.parse_args(argv)
+
+    resultados = {"meta": _meta(args.repeticiones, args.semilla), "resultados": {},
+                  "memoria_mb": {}}
+    for tam in args.tamanos:
+        n = parse_size(tam)
+        print(f"\n== {tam} ({n:,} transacciones) ==".replace(",", "."))
+        memoria = resultados["memoria_mb"][tam] = {}
+        resultados["resultados"][tam] = bench_size(n, args.repeticiones, args.semilla,
+                                                   memoria=memoria)
+
+    destino = args.base if args.guardar_base else args.salida
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {destino}")
+    if args.guardar_base:
+        return 0
+
+    if not os.path.exists(args.base):
+        print(f"Sin línea base en {args.base}: nada que comparar.")
+        return 0
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    regresiones = compare(resultados, base, args.umbral)
+    if regresiones:
+        print(f"\nRegresiones (> {args.umbral:.0%} sobre la base de {base['meta']['fecha']}):")
+        for linea in regresiones:
+            print("  " + linea)
+        return 1
+    print(f"\nSin regresiones respecto a la base de {base['meta']['fecha']}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# ===========================================================================================
+# benchmarks/ledger.py
+# -------------------------------------------------------------------------------------------
+# Generador de usuarios sintéticos para las mediciones de rendimiento:
+# - Salario mensual con subida anual, primas en junio y diciembre y regalías trimestrales.
+# - Facturas recurrentes (servicios públicos, internet, celular, suscripciones) y
+#   recarga semanal de transporte.
+# - Gasto aleatorio (Alimentos, Transporte, Ocio) con más movimiento en diciembre.
+# Usa solo las categorías de DEFAULT_CATEGORIES y el mismo formato de registro que la
+# app ({fecha, descripcion, monto, tipo, categoria}), con keys de push cronológicas.
+# Con la misma semilla el resultado es idéntico, para comparar contra la línea base.
+# ===========================================================================================
+
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Tuple
+
+from constants import DEFAULT_CATEGORIES
+
+# Último día del historial generado (fijo, para que las mediciones sean comparables)
+END_DATE = date(2025, 6, 30)
+
+TIPOS = {c["nombre"]: c["tipo"] for c in DEFAULT_CATEGORIES}
+
+# (día del mes, descripción, categoría, monto base, variación relativa)
+RECURRENTES = [
+    (5,  "Factura de energía",   "Servicios", 165_000, 0.25),
+    (10, "Acueducto y aseo",     "Servicios",  88_000, 0.20),
+    (12, "Internet hogar",       "Servicios",  95_000, 0.0),
+    (15, "Plan celular",         "Servicios",  55_000, 0.0),
+    (18, "Gas natural",          "Servicios",  32_000, 0.30),
+    (8,  "Netflix",              "Ocio",       38_900, 0.0),
+    (20, "Spotify",              "Ocio",       16_900, 0.0),
+]
+
+# categoría: (peso, mediana del monto, dispersión lognormal, descripciones)
+ALEATORIOS = {
+    "Alimentos":  (0.55, 35_000, 0.8, ("Mercado Éxito", "Supermercado D1", "Almuerzo",
+                                       "Panadería", "Domicilio Rappi", "Café", "Carnicería",
+                                       "Fruver", "Tienda de barrio")),
+    "Transporte": (0.25, 12_000, 0.6, ("Taxi", "Uber", "Gasolina", "Parqueadero", "Peaje")),
+    "Ocio":       (0.20, 60_000, 0.7, ("Cine", "Restaurante", "Concierto", "Libros",
+                                       "Videojuego", "Bar")),
+}
+
+# Más gasto en diciembre (fiestas) y menos en enero
+ESTACIONALIDAD = {12: 1.4, 1: 0.8, 6: 1.1}
+
+_PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+def parse_size(texto: str) -> int:
+    """'1k' → 1000, '1m' → 1000000, '2500' → 2500."""
+    t = texto.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(t[-1:], 1)
+    return int(float(t[:-1] if mult > 1 else t) * mult)
+
+
+def span_days(n: int) -> int:
+    """Días de historial: unas 8 transacciones diarias, entre 4 meses y 10 años."""
+    return max(120, min(n // 8, 3650))
+
+
+def _push_id(ms: int, seq: int) -> str:
+    """Key de 20 caracteres con el formato de Firebase: ordena por fecha y luego por seq."""
+    ts = []
+    for _ in range(8):
+        ts.append(_PUSH_CHARS[ms % 64])
+        ms //= 64
+    tail = []
+    for _ in range(12):
+        tail.append(_PUSH_CHARS[seq % 64])
+        seq //= 64
+    return "".join(reversed(ts)) + "".join(reversed(tail))
+
+
+def _ts(rng: random.Random, dia: date, h0: int = 7, h1: int = 22) -> int:
+    """Marca de tiempo (segundos) de una hora aleatoria del día."""
+    base = datetime.combine(dia, time()).timestamp()
+    return int(base + rng.randrange(h0 * 3600, h1 * 3600))
+
+
+def _recurrentes(rng: random.Random, d0: date, d1: date) -> List[Tuple[int, str, float, str]]:
+    """Ingresos y facturas periódicas entre d0 y d1: (fecha, descripción, monto, categoría)."""
+    filas = []
+    salario = 4_200_000.0
+    anio = d0.year
+    mes = date(d0.year, d0.month, 1)
+    while mes <= d1:
+        if mes.year != anio:        # Subida anual en enero
+            salario = round(salario * 1.05, -3)
+            anio = mes.year
+        pago = mes.replace(day=25)
+        if d0 <= pago <= d1:
+            filas.append((_ts(rng, pago, 6, 8), "Pago de nómina", salario, "Salario"))
+        if mes.month in (6, 12):
+            prima = mes.replace(day=20)
+            if d0 <= prima <= d1:
+                filas.append((_ts(rng, prima, 6, 8), "Prima de servicios", salario / 2, "Salario"))
+        if mes.month in (1, 4, 7, 10):
+            dia = mes.replace(day=15)
+            if d0 <= dia <= d1:
+                filas.append((_ts(rng, dia), "Regalías trimestrales",
+                              round(rng.uniform(300_000, 1_200_000), -2), "Regalías"))
+        for dia_mes, desc, cat, base, var in RECURRENTES:
+            dia = mes.replace(day=dia_mes)
+            if d0 <= dia <= d1:
+                monto = base * (1 + rng.uniform(-var, var)) if var else base
+                filas.append((_ts(rng, dia), desc, round(monto, -2), cat))
+        mes = (mes + timedelta(days=32)).replace(day=1)
+
+    # Recarga de transporte cada lunes
+    dia = d0 + timedelta(days=(7 - d0.weekday()) % 7)
+    while dia <= d1:
+        filas.append((_ts(rng, dia, 6, 9), "Recarga tarjeta transporte", 50_000.0, "Transporte"))
+        dia += timedelta(days=7)
+    return filas
+
+
+def generate_ledger(n: int, seed: int = 42, end: date = END_DATE) -> Dict[str, Dict]:
+    """
+    Genera {key: transacción} con exactamente 'n' transacciones hasta 'end',
+    como las devolvería firebase_service.get_transactions.
+    """
+    rng = random.Random(seed)
+    d0 = end - timedelta(days=span_days(n) - 1)
+    filas = _recurrentes(rng, d0, end)
+    if len(filas) > n:
+        filas = rng.sample(filas, n)
+
+    # Gasto aleatorio repartido por día según la estacionalidad
+    restantes = n - len(filas)
+    dias = [d0 + timedelta(days=i) for i in range((end - d0).days + 1)]
+    pesos = [ESTACIONALIDAD.get(d.month, 1.0) * (1.3 if d.weekday() >= 4 else 1.0) for d in dias]
+    cats = list(ALEATORIOS)
+    elegidos_dia = rng.choices(dias, weights=pesos, k=restantes)
+    elegidas_cat = rng.choices(cats, weights=[ALEATORIOS[c][0] for c in cats], k=restantes)
+    for dia, cat in zip(elegidos_dia, elegidas_cat):
+        _, mediana, sigma, descs = ALEATORIOS[cat]
+        monto = max(1_000, round(mediana * rng.lognormvariate(0, sigma), -2))
+        filas.append((_ts(rng, dia), rng.choice(descs), monto, cat))
+
+    # Keys cronológicas, como las que genera push()
+    filas.sort(key=lambda f: f[0])
+    ledger = {}
+    for seq, (ts, desc, monto, cat) in enumerate(filas):
+        ledger[_push_id(ts * 1000, seq)] = {
+            "fecha": ts,
+            "descripcion": desc,
+            "monto": float(monto),
+            "tipo": TIPOS[cat],
+            "categoria": cat,
+        }
+    return ledger
@@ -0,0 +1,166 @@
+# ===========================================================================================
+# aggregates.py
+# -------------------------------------------------------------------------------------------
+# Agregados de Reportes a partir de "buckets" diarios:
+# - Las transacciones se agrupan UNA vez por versión de datos en totales por día
+#   (ingresos, gastos y gastos por categoría).
+# - Cualquier ventana de fechas (filtro, zoom o desplazamiento) se calcula sumando
+#   solo los días visibles, sin volver a recorrer ni convertir todas las transacciones.
+# - Los buckets se calculan sobre las columnas de columnar.Ledger (numéricas y
+#   categóricas), sin armar un DataFrame de objetos con un dict por transacción.
+# No depende de Tk, por lo que también puede usarse fuera de la interfaz.
+# ===========================================================================================
+
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Hashable, Union
+
+import pandas as pd
+
+from columnar import Ledger
+
+
+class DailyBuckets:
+    """
+    Totales diarios de un conjunto de transacciones {key: {...}} (o de su Ledger).
+    - daily: DataFrame indexado por día con columnas 'ingreso' y 'gasto'.
+    - gasto_cat: DataFrame día × categoría con el gasto de cada día.
+    """
+
+    def __init__(self, raw: Union[Dict, Ledger]):
+        if not isinstance(raw, Ledger):
+            raw = Ledger.from_raw(raw)
+        df = raw.to_dataframe()
+        if df.empty:
+            idx = pd.DatetimeIndex([], name="dia")
+            self.daily = pd.DataFrame({"ingreso": [], "gasto": []}, index=idx, dtype=float)
+            self.gasto_cat = pd.DataFrame(index=idx, dtype=float)
+            return
+
+        df["dia"] = pd.to_datetime(df["fecha"], unit="s").dt.normalize()
+        es_ing = df["tipo"] == "Ingreso"
+        es_gas = df["tipo"] == "Gasto"
+        self.daily = pd.DataFrame({
+            "ingreso": df[es_ing].groupby("dia")["monto"].sum(),
+            "gasto":   df[es_gas].groupby("dia")["monto"].sum(),
+        }).fillna(0.0).sort_index()
+        gasto_cat = df[es_gas].pivot_table(index="dia", columns="categoria", values="monto",
+                                           aggfunc="sum", fill_value=0.0, observed=True)
+        # Columnas como texto, en orden alfabético (no como Categorical)
+        gasto_cat.columns = gasto_cat.columns.astype(str)
+        self.gasto_cat = gasto_cat.sort_index().sort_index(axis=1)
+
+    def window(self, d0: date, d1: date) -> Dict:
+        """
+        Agregados de Reportes para los días [d0, d1] (ambos incluidos):
+        - ingresos, gastos, saldo: totales del periodo.
+        - gastos_cat: gasto por categoría (Serie).
+        - top5: las 5 categorías con más gasto (Serie, descendente).
+        - saldo_acum: saldo acumulado diario (Serie), desde el primer hasta el
+          último día con movimientos de la ventana.
+        """
+        a, b = pd.Timestamp(d0), pd.Timestamp(d1)
+        daily = self.daily.loc[a:b]
+        ingresos = float(daily["ingreso"].sum())
+        gastos = float(daily["gasto"].sum())
+
+        cat = self.gasto_cat.loc[a:b].sum()
+        cat = cat[cat != 0]
+        cat.index.name = "categoria"
+
+        neto = daily["ingreso"] - daily["gasto"]
+        saldo_acum = neto.cumsum()
+        if not saldo_acum.empty:
+            saldo_acum = saldo_acum.asfreq("D").ffill()
+
+        return {
+            "ingresos": ingresos,
+            "gastos": gastos,
+            "saldo": ingresos - gastos,
+            "gastos_cat": cat,
+            "top5": cat.sort_values(ascending=False).head(5),
+            "saldo_acum": saldo_acum,
+        }
+
+    def table(self, d0: date, d1: date) -> pd.DataFrame:
+        """
+        Tabla diaria de [d0, d1] para exportar: ingresos, gastos, neto,
+        saldo acumulado y una columna de gasto por categoría.
+        Solo incluye días con movimientos.
+        """
+        a, b = pd.Timestamp(d0), pd.Timestamp(d1)
+        daily = self.daily.loc[a:b]
+        t = pd.DataFrame({
+            "ingresos": daily["ingreso"],
+            "gastos": daily["gasto"],
+            "neto": daily["ingreso"] - daily["gasto"],
+        })
+        t["saldo_acumulado"] = t["neto"].cumsum()
+        cat = self.gasto_cat.loc[a:b]
+        cat = cat.loc[:, (cat != 0).any()]
+        t = t.join(cat.add_prefix("gasto_"), how="left").fillna(0.0)
+        t.index = t.index.strftime("%Y-%m-%d")
+        t.index.name = "dia"
+        return t
+
+
+# Series de Reportes: clave -> título (en el orden de la rejilla 2x2)
+REPORT_SERIES = {
+    'g1': 'Gastos x Categoría',
+    'g2': 'Ingresos vs Gastos',
+    'g3': 'Saldo Acumulado',
+    'g4': 'Top 5 Categorías',
+}
+
+
+def report_panels(w: Dict, selected=tuple(REPORT_SERIES)) -> list:
+    """
+    Paneles (título, x, y, tipo) de los gráficos de Reportes para la ventana 'w'
+    (resultado de DailyBuckets.window) y las series elegidas.
+    Lista vacía si la ventana no tiene movimientos.
+    """
+    ingresos, gastos = w['ingresos'], w['gastos']
+    panels = []
+    if w['saldo_acum'].empty and not ingresos and not gastos:
+        return panels
+
+    # Pie chart: Gastos por Categoría
+    if 'g1' in selected:
+        g1 = w['gastos_cat']
+        panels.append((REPORT_SERIES['g1'], list(g1.index), g1.to_numpy(), 'pie'))
+
+    # Bar chart: Ingresos vs Gastos
+    if 'g2' in selected:
+        panels.append((REPORT_SERIES['g2'], ['Ingresos', 'Gastos'], [ingresos, gastos], 'bar'))
+
+    # Line chart: Saldo Acumulado diario
+    if 'g3' in selected:
+        acum = w['saldo_acum']
+        panels.append((REPORT_SERIES['g3'], acum.index.to_numpy(), acum.to_numpy(), 'line'))
+
+    # Barh chart: Top 5 categorías de Gasto
+    if 'g4' in selected:
+        g4 = w['top5']
+        panels.append((REPORT_SERIES['g4'], list(g4.index), g4.to_numpy(), 'barh'))
+    return panels
+
+
+# Caché de buckets por (uid, versión de datos): basta con los más recientes.
+_buckets: "OrderedDict[Hashable, DailyBuckets]" = OrderedDict()
+_MAX_BUCKETS = 4
+
+
+def buckets_for(key: Hashable, raw: Union[Dict, Ledger]) -> DailyBuckets:
+    """
+    Devuelve los buckets diarios de 'raw', construyéndolos solo si 'key'
+    (por ejemplo (uid, versión)) no se ha visto antes.
+    """
+    b = _buckets.get(key)
+    if b is None:
+        b = DailyBuckets(raw)
+        _buckets[key] = b
+        while len(_buckets) > _MAX_BUCKETS:
+            _buckets.popitem(last=False)
+    else:
+        _buckets.move_to_end(key)
+    return b
@@ -0,0 +1,143 @@
+# ===========================================================================================
+# autocomplete.py
+# -------------------------------------------------------------------------------------------
+# Autocompletado de descripciones en el modal de transacciones:
+# - Trie de prefijos sobre las descripciones ya usadas, ordenado por frecuencia.
+# - Para cada descripción recuerda qué categoría y tipo se usaron más veces,
+#   de modo que elegir "Netflix" pre-selecciona "Ocio" / "Gasto".
+# - Se construye una vez por versión de datos y se actualiza de forma incremental.
+# ===========================================================================================
+
+import heapq
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from search_index import normalize
+
+
+class _Node:
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.entry: Optional["_Entry"] = None
+
+
+class _Entry:
+    """Datos de una descripción completa (normalizada)."""
+    __slots__ = ("count", "forms", "labels")
+
+    def __init__(self):
+        self.count = 0
+        self.forms: Counter = Counter()    # Escrituras originales ("Netflix", "NETFLIX")
+        self.labels: Counter = Counter()   # (categoria, tipo) -> veces usadas
+
+
+class DescriptionTrie:
+    """
+    Trie de descripciones con frecuencia de uso.
+    - version: versión de datos con la que se construyó (ver firebase_service).
+    """
+
+    def __init__(self, data: Optional[Dict] = None, version: int = 0):
+        self.version = version
+        self._root = _Node()
+        for rec in (data or {}).values():
+            self.add(rec)
+
+    def _find(self, key: str, create: bool = False) -> Optional[_Node]:
+        node = self._root
+        for ch in key:
+            nxt = node.children.get(ch)
+            if nxt is None:
+                if not create:
+                    return None
+                nxt = node.children[ch] = _Node()
+            node = nxt
+        return node
+
+    def add(self, record: Dict) -> None:
+        """Registra un uso de la descripción de 'record'."""
+        desc = str(record.get("descripcion", "")).strip()
+        key = normalize(desc)
+        if not key:
+            return
+        node = self._find(key, create=True)
+        if node.entry is None:
+            node.entry = _Entry()
+        e = node.entry
+        e.count += 1
+        e.forms[desc] += 1
+        e.labels[(record.get("categoria", ""), record.get("tipo", ""))] += 1
+
+    def remove(self, record: Dict) -> None:
+        """Descuenta un uso (al editar o eliminar una transacción)."""
+        desc = str(record.get("descripcion", "")).strip()
+        node = self._find(normalize(desc))
+        if node is None or node.entry is None:
+            return
+        e = node.entry
+        e.count -= 1
+        e.forms[desc] -= 1
+        e.labels[(record.get("categoria", ""), record.get("tipo", ""))] -= 1
+        e.forms += Counter()    # Elimina contadores en cero
+        e.labels += Counter()
+        if e.count <= 0:
+            node.entry = None
+
+    def complete(self, prefix: str, limit: int = 6) -> List[str]:
+        """
+        Devuelve hasta 'limit' descripciones que empiezan por 'prefix',
+        de la más usada a la menos usada (con su escritura más frecuente).
+        """
+        key = normalize(prefix.strip())
+        if not key:
+            return []
+        node = self._find(key)
+        if node is None:
+            return []
+        found: List[Tuple[int, str]] = []
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.entry is not None and n.entry.count > 0:
+                found.append((n.entry.count, n.entry.forms.most_common(1)[0][0]))
+            stack.extend(n.children.values())
+        return [form for _, form in heapq.nlargest(limit, found)]
+
+    def suggest(self, descripcion: str) -> Optional[Tuple[str, str]]:
+        """(categoria, tipo) más usados con esta descripción exacta, o None."""
+        node = self._find(normalize(descripcion.strip()))
+        if node is None or node.entry is None or not node.entry.labels:
+            return None
+        return node.entry.labels.most_common(1)[0][0]
+
+
+# Un trie por usuario; se reconstruye solo si cambió la versión de datos.
+_tries: Dict[str, DescriptionTrie] = {}
+
+
+def trie_for(uid: str, version: int, data: Dict) -> DescriptionTrie:
+    """Devuelve el trie de 'uid', construyéndolo solo si la versión cambió."""
+    t = _tries.get(uid)
+    if t is None or t.version != version:
+        t = _tries[uid] = DescriptionTrie(data, version)
+    return t
+
+
+def apply_change(uid: str, old_version: int, new_version: int,
+                 old_record: Optional[Dict] = None,
+                 new_record: Optional[Dict] = None) -> None:
+    """
+    Aplica al trie de 'uid' una escritura local ya confirmada
+    (old_record: valor previo si se editó/eliminó; new_record: valor nuevo).
+    Si el trie no estaba al día, se deja que trie_for lo reconstruya.
+    """
+    t = _tries.get(uid)
+    if t is None or t.version != old_version:
+        return
+    if old_record:
+        t.remove(old_record)
+    if new_record:
+        t.add(new_record)
+    t.version = new_version
@@ -0,0 +1,187 @@
+# ===========================================================================================
+# batch_reports.py
+# -------------------------------------------------------------------------------------------
+# Generación masiva de reportes sin interfaz (por ejemplo, el cierre de cada mes):
+# - Para una lista de usuarios (--uids) o para todos (--all, vía Admin SDK), descarga
+#   sus transacciones y calcula los mismos agregados que la vista de Reportes.
+# - Escribe el PDF (report_pdf.py) y/o la tabla diaria en CSV (exporter.py) sin Tk.
+# - Reparte los usuarios en un ProcessPoolExecutor (un proceso por núcleo por defecto)
+#   con un número acotado de tareas en vuelo.
+#
+# Uso:
+#   python batch_reports.py --all --mes 2025-06 --formato pdf csv --salida reportes
+#   python batch_reports.py --uids UID1 UID2 --desde 2025-01-01 --hasta 2025-06-30
+# ===========================================================================================
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+FORMATOS = ("pdf", "csv")
+CHART_SIZE = (1000, 640)   # Píxeles de la rejilla de gráficos en el PDF
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Trabajo por usuario (se ejecuta en los procesos hijos)
+# -------------------------------------------------------------------------------------------
+
+def _init_worker() -> None:
+    # Cada proceso inicializa Firebase una sola vez al importar el servicio
+    import firebase_service  # noqa: F401
+
+
+def report_user(uid: str, d0: date, d1: date,
+                formatos: Sequence[str], salida: str) -> Tuple[str, List[str], Optional[str]]:
+    """
+    Genera los archivos de 'uid' para el periodo [d0, d1] en 'salida'.
+    Retorna (uid, rutas_generadas, error).
+    """
+    import aggregates as agg
+    import firebase_service as fb
+
+    try:
+        raw, err = fb.get_transactions(uid)
+        if err:
+            return uid, [], err
+        buckets = agg.DailyBuckets(raw)
+        rutas = []
+        base = os.path.join(salida, uid)
+
+        if "csv" in formatos:
+            import exporter
+            ruta = base + ".csv"
+            exporter.export_frame(ruta, buckets.table(d0, d1))
+            rutas.append(ruta)
+
+        if "pdf" in formatos:
+            import report_pdf
+            from chart_render import render_figure
+
+            w = buckets.window(d0, d1)
+            panels = agg.report_panels(w)
+            charts = [render_figure(panels, CHART_SIZE, (2, 2))] if panels else []
+            perfil, _ = fb.get_profile(uid)
+            ruta = base + ".pdf"
+            report_pdf.build_report(
+                ruta, d0, d1,
+                {"ingresos": w["ingresos"], "gastos": w["gastos"], "saldo": w["saldo"]},
+                charts=charts,
+                gastos_cat={str(k): float(v) for k, v in w["gastos_cat"].items()},
+                usuario=perfil.get("nombre") or perfil.get("email", ""))
+            rutas.append(ruta)
+        return uid, rutas, None
+    except Exception as e:
+        return uid, [], f"{type(e).__name__}: {e}"
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Reparto en procesos
+# -------------------------------------------------------------------------------------------
+
+def run_batch(uids: Sequence[str], d0: date, d1: date, formatos: Sequence[str],
+              salida: str, procesos: int, log=print) -> int:
+    """
+    Genera los reportes de 'uids' con hasta 'procesos' procesos en paralelo.
+    Como mucho 2 × procesos usuarios están encolados a la vez, así la memoria
+    no depende del tamaño de la lista. Retorna el número de usuarios con error.
+    """
+    os.makedirs(salida, exist_ok=True)
+    total = len(uids)
+    fallos = 0
+    hechos = 0
+    inicio = time.perf_counter()
+    pendientes = iter(uids)
+    en_vuelo = {}       # {future: uid}, para saber de quién era un proceso que murió
+    # "spawn": procesos limpios, sin heredar hilos ni conexiones del padre
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=ctx,
+                             initializer=_init_worker) as pool:
+        while True:
+            while len(en_vuelo) < 2 * procesos:
+                uid = next(pendientes, None)
+                if uid is None:
+                    break
+                en_vuelo[pool.submit(report_user, uid, d0, d1, formatos, salida)] = uid
+            if not en_vuelo:
+                break
+            listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for fut in listos:
+                hechos += 1
+                uid = en_vuelo.pop(fut)
+                try:
+                    uid, rutas, err = fut.result()
+                except Exception as e:      # El proceso hijo murió
+                    rutas, err = [], str(e)
+                if err:
+                    fallos += 1
+                    log(f"[{hechos}/{total}] {uid}: ERROR {err}")
+                else:
+                    log(f"[{hechos}/{total}] {uid}: {', '.join(os.path.basename(r) for r in rutas)}")
+    log(f"Listo: {total - fallos} de {total} usuarios en {time.perf_counter() - inicio:.1f} s "
+        f"({procesos} procesos).")
+    return fallos
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Línea de comandos
+# -------------------------------------------------------------------------------------------
+
+def _periodo(args) -> Tuple[date, date]:
+    """Periodo pedido: --mes, o --desde/--hasta, o por defecto el mes anterior."""
+    if args.mes:
+        d0 = datetime.strptime(args.mes, "%Y-%m").date()
+    elif args.desde or args.hasta:
+        d0 = datetime.strptime(args.desde, "%Y-%m-%d").date() if args.desde else date(1970, 1, 1)
+        d1 = datetime.strptime(args.hasta, "%Y-%m-%d").date() if args.hasta else date.today()
+        return d0, d1
+    else:
+        d0 = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+    d1 = (d0.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return d0, d1
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Genera reportes de Klarity (PDF/CSV) para varios usuarios sin interfaz.")
+    quienes = parser.add_mutually_exclusive_group(required=True)
+    quienes.add_argument("--uids", nargs="+", metavar="UID", help="uid de los usuarios")
+    quienes.add_argument("--all", action="store_true",
+                         help="todos los usuarios registrados (Admin SDK)")
+    parser.add_argument("--mes", metavar="AAAA-MM", help="mes a reportar (por defecto, el anterior)")
+    parser.add_argument("--desde", metavar="AAAA-MM-DD", help="inicio del periodo")
+    parser.add_argument("--hasta", metavar="AAAA-MM-DD", help="fin del periodo")
+    parser.add_argument("--formato", nargs="+", choices=FORMATOS, default=["pdf"],
+                        help="archivos a generar (pdf, csv)")
+    parser.add_argument("--salida", default="reportes",
+                        help="carpeta de salida (se crea una subcarpeta por periodo)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="procesos en paralelo (por defecto, uno por núcleo)")
+    args = parser.parse_args(argv)
+
+    d0, d1 = _periodo(args)
+    if args.all:
+        import firebase_service as fb
+        uids, err = fb.list_user_ids()
+        if err:
+            print(f"No se pudo listar usuarios: {err}", file=sys.stderr)
+            return 2
+    else:
+        uids = args.uids
+    if not uids:
+        print("No hay usuarios para procesar.")
+        return 0
+
+    salida = os.path.join(args.salida, f"{d0:%Y%m%d}_{d1:%Y%m%d}")
+    procesos = max(1, min(args.procesos, len(uids)))
+    print(f"Periodo {d0} a {d1}: {len(uids)} usuarios → {salida}")
+    fallos = run_batch(uids, d0, d1, args.formato, salida, procesos)
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+# ===========================================================================================
+# chart_render.py
+# -------------------------------------------------------------------------------------------
+# Renderizado de gráficos fuera del hilo de Tk:
+# - Los gráficos se dibujan con el backend Agg (sin Tk) en un hilo de trabajo
+#   y se entregan como imágenes RGBA (PIL).
+# - Un caché LRU guarda las imágenes por clave (tipo de gráfico, rango de fechas,
+#   versión de datos, tamaño...), de modo que volver a un periodo o re-activar
+#   un checkbox muestra la imagen al instante.
+# - ChartView es un Label de Tk que muestra el resultado cuando está listo.
+# - Las series de línea se reducen al ancho del eje en píxeles (ver lod.py).
+# ===========================================================================================
+
+import contextvars
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image, ImageTk
+
+from constants import COLOR_FONDO_GRIS, COLOR_TEXTO_GRIS, FONT_NORMAL
+from lod import downsample
+import tracing
+
+DPI = 100  # Píxeles por pulgada de las figuras (tamaño en px = pulgadas * DPI)
+
+# Un panel es (título, etiquetas/eje x, valores, tipo) con tipo en
+# "bar", "barh", "pie" o "line".
+Panel = Tuple[str, Sequence, Sequence, str]
+
+# Matplotlib no es seguro entre hilos: un único hilo de trabajo dibuja todo.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="klarity-charts")
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Caché LRU de imágenes renderizadas
+# -------------------------------------------------------------------------------------------
+
+class ChartCache:
+    """
+    Caché LRU (menos usado recientemente) de imágenes PIL por clave.
+    Se accede desde el hilo de Tk y desde el hilo de renderizado, por eso usa un lock.
+    """
+
+    def __init__(self, maxsize: int = 48):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Image.Image]:
+        with self._lock:
+            img = self._items.get(key)
+            if img is not None:
+                self._items.move_to_end(key)
+            return img
+
+    def put(self, key: Hashable, img: Image.Image) -> None:
+        with self._lock:
+            self._items[key] = img
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+chart_cache = ChartCache()
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Dibujo con Agg (se ejecuta en el hilo de trabajo)
+# -------------------------------------------------------------------------------------------
+
+def _draw_panel(ax, title: str, x: Sequence, y: Sequence, kind: str) -> None:
+    """Dibuja un panel sobre 'ax' según su tipo."""
+    y = np.asarray(y, dtype=float)
+    if y.size == 0:
+        ax.text(0.5, 0.5, "Sin datos", ha="center", va="center", transform=ax.transAxes)
+        ax.set_axis_off()
+        ax.set_title(title, fontweight="bold")
+        return
+
+    if kind == "pie":
+        ax.pie(y, labels=list(x), autopct="%1.0f%%", startangle=90)
+    elif kind == "bar":
+        ax.bar(list(x), y)
+        ax.set_ylabel("$ COP")
+    elif kind == "barh":
+        ax.barh(list(x), y)
+        ax.invert_yaxis()
+    elif kind == "line":
+        # Nivel de detalle: no más puntos que píxeles tiene el eje
+        fig = ax.figure
+        width_px = ax.get_position().width * fig.get_figwidth() * fig.dpi
+        x, y = downsample(x, y, width_px)
+        ax.plot(x, y, linewidth=2)
+        ax.axhline(0, linestyle="--", linewidth=0.7)
+        ax.fill_between(x, y, where=y >= 0, alpha=0.15)
+        ax.fill_between(x, y, where=y < 0, alpha=0.15)
+        ax.set_ylabel("$ COP")
+        if np.issubdtype(np.asarray(x).dtype, np.datetime64):
+            # Fechas compactas ("2025", "Mar", "15") en lugar de etiquetas encimadas
+            locator = mdates.AutoDateLocator()
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+    ax.set_title(title, fontweight="bold")
+    if kind != "pie":
+        ax.grid(axis="y", linestyle="--", alpha=0.3)
+
+
+@tracing.traced("chart_render.render_figure", cat="render")
+def render_figure(panels: List[Panel],
+                  size: Tuple[int, int],
+                  layout: Tuple[int, int] = (1, 1)) -> Image.Image:
+    """
+    Dibuja 'panels' en una figura Agg de 'size' píxeles y la devuelve como imagen RGBA.
+    - layout: (filas, columnas) de la rejilla de subplots.
+    No usa pyplot ni Tk, por lo que puede ejecutarse en cualquier hilo.
+    """
+    w, h = size
+    fig = Figure(figsize=(w / DPI, h / DPI), dpi=DPI)
+    canvas = FigureCanvasAgg(fig)
+    rows, cols = layout
+    axes = []
+    for idx, (title, x, y, kind) in enumerate(panels):
+        ax = fig.add_subplot(rows, cols, idx + 1)
+        _draw_panel(ax, title, x, y, kind)
+        axes.append((title, kind, ax))
+
+    if layout == (1, 1):
+        fig.tight_layout()
+    else:
+        fig.subplots_adjust(hspace=0.4, wspace=0.4)
+
+    canvas.draw()
+    rgba = np.asarray(canvas.buffer_rgba())
+    img = Image.fromarray(rgba.copy())
+
+    # Geometría de cada eje en píxeles de la imagen (origen arriba a la izquierda)
+    # y sus límites en x, para traducir clics y rueda del ratón a datos.
+    img.info["axes"] = []
+    for title, kind, ax in axes:
+        bb = ax.get_window_extent()
+        img.info["axes"].append({
+            "title": title,
+            "kind": kind,
+            "bbox": (bb.x0, h - bb.y1, bb.x1, h - bb.y0),
+            "xlim": tuple(ax.get_xlim()),
+        })
+    return img
+
+
+def render_async(key: Hashable,
+                 panels: List[Panel],
+                 size: Tuple[int, int],
+                 layout: Tuple[int, int] = (1, 1)):
+    """
+    Encola el dibujo de 'panels' en el hilo de trabajo y devuelve el Future.
+    El resultado se guarda en chart_cache bajo 'key' aunque nadie lo espere.
+    """
+    # El dibujo queda en la traza de quien lo pidió (ver tracing.py)
+    fut = _executor.submit(contextvars.copy_context().run, render_figure, panels, size, layout)
+    fut.add_done_callback(
+        lambda f: f.cancelled() or f.exception() or chart_cache.put(key, f.result())
+    )
+    return fut
+
+
+def render_cached(key: Hashable,
+                  build_panels: Callable[[], List[Panel]],
+                  size: Tuple[int, int],
+                  layout: Tuple[int, int] = (1, 1)) -> Image.Image:
+    """
+    Devuelve la imagen de 'key' desde el caché o la dibuja (bloqueando hasta tenerla).
+    Pensado para hilos de trabajo (p. ej. exportar a PDF), nunca para el hilo de Tk.
+    """
+    img = chart_cache.get(key)
+    if img is None:
+        img = render_async(key, build_panels(), size, layout).result()
+    return img
+
+
+# -------------------------------------------------------------------------------------------
+# 3) ChartView: widget que muestra un gráfico renderizado en segundo plano
+# -------------------------------------------------------------------------------------------
+
+class ChartView:
+    """
+    Envuelve un tk.Label que muestra un gráfico cacheado o renderizado en el hilo de trabajo.
+
+    Uso típico:
+        view = ChartView(parent)
+        view.widget.grid(...)
+        view.show(key, (500, 300), lambda: [("Ingresos vs Gastos", labels, values, "bar")])
+    """
+
+    POLL_MS = 15  # Frecuencia con que Tk revisa si el renderizado terminó
+
+    def __init__(self, master: tk.Misc, **label_opts):
+        opts = dict(bg=COLOR_FONDO_GRIS, fg=COLOR_TEXTO_GRIS, font=FONT_NORMAL,
+                    bd=0, highlightthickness=0)
+        opts.update(label_opts)
+        self.widget = tk.Label(master, **opts)
+        self.image: Optional[Image.Image] = None   # Última imagen PIL mostrada
+        self._photo = None
+        self._future = None
+        self._token = 0
+
+    def show(self,
+             key: Hashable,
+             size: Tuple[int, int],
+             build_panels: Callable[[], List[Panel]],
+             layout: Tuple[int, int] = (1, 1)) -> None:
+        """
+        Muestra el gráfico identificado por 'key'.
+        - Si está en caché se muestra de inmediato y build_panels no se llama.
+        - Si no, build_panels() prepara los datos en el hilo de Tk y el dibujo
+          se hace en el hilo de trabajo; una petición posterior reemplaza a esta.
+        """
+        self.cancel()
+        token = self._token
+
+        img = chart_cache.get(key)
+        if img is not None:
+            self._set(img)
+            return
+
+        panels = build_panels()
+        if self._photo is None:
+            # Primera vez: texto provisional. Si ya hay imagen, se conserva hasta el reemplazo.
+            self.widget.configure(text="Cargando gráfico…", image="")
+        # El resultado se cachea aunque la petición haya sido reemplazada
+        fut = render_async(key, panels, size, layout)
+        self._future = fut
+        self.widget.after(self.POLL_MS, lambda: self._poll(token, fut))
+
+    def locate(self, x: int, y: int) -> Optional[Tuple[Dict, float]]:
+        """
+        Traduce una posición del ratón sobre el widget al panel bajo el cursor.
+        Retorna (info_del_eje, fx) con fx en [0, 1] a lo ancho del eje, o None.
+        """
+        if self.image is None:
+            return None
+        # El Label centra la imagen si es más pequeña que el widget
+        ox = (self.widget.winfo_width() - self.image.width) // 2
+        oy = (self.widget.winfo_height() - self.image.height) // 2
+        px, py = x - ox, y - oy
+        for info in self.image.info.get("axes", []):
+            x0, y0, x1, y1 = info["bbox"]
+            if x0 <= px <= x1 and y0 <= py <= y1 and x1 > x0:
+                return info, (px - x0) / (x1 - x0)
+        return None
+
+    def cancel(self) -> None:
+        """Descarta la petición en curso (si aún no empezó, no se dibuja)."""
+        self._token += 1
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _poll(self, token: int, fut) -> None:
+        try:
+            if token != self._token or not self.widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        if not fut.done():
+            self.widget.after(self.POLL_MS, lambda: self._poll(token, fut))
+            return
+        self._future = None
+        try:
+            img = fut.result()
+        except Exception as e:
+            self.widget.configure(text=f"[Error al dibujar: {e}]", image="")
+            return
+        self._set(img)
+
+    def _set(self, img: Image.Image) -> None:
+        # El PhotoImage se crea aquí porque solo el hilo de Tk puede tocar widgets.
+        self.image = img
+        self._photo = ImageTk.PhotoImage(img)
+        self.widget.configure(image=self._photo, text="")
@@ -0,0 +1,471 @@
+# ===========================================================================================
+# columnar.py
+# -------------------------------------------------------------------------------------------
+# Representación compacta de las transacciones de un usuario:
+# - Transaccion: registro tipado con __slots__ (sin el dict por instancia).
+# - Ledger: contenedor por columnas. fecha (int64, segundos), monto (float64) y tipo
+#   (int8) son arreglos NumPy sobre buffers de 'array'; categoria y tipo van
+#   codificados por diccionario (código -> texto); las descripciones y las keys se
+#   guardan como bytes UTF-8 contiguos en vez de un objeto str por fila.
+# - to_dataframe() arma el DataFrame sobre las mismas columnas (sin copiarlas) con
+#   categoria/tipo como Categorical, en lugar de pd.DataFrame(list(raw.values())).
+# - ledger_for(uid, versión, raw): un Ledger por usuario, reconstruido solo si cambia
+#   la versión de datos (compartido por Home, Transacciones y Reportes). Las escrituras
+#   locales se aplican con apply_changes, copiando columnas en vez de recorrer 'raw'.
+#   Cada Ledger nuevo se sincroniza en segundo plano con la caché en disco (ledger_store.py).
+# Solo se guardan los campos que escribe la app (fecha, descripcion, monto, tipo,
+# categoria). No depende de Tk.
+# ===========================================================================================
+
+import hashlib
+import json
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TIPOS = ("Gasto", "Ingreso")        # Códigos 0 y 1; otros valores se agregan al final
+CAMPOS = ("fecha", "descripcion", "monto", "tipo", "categoria")
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Registro
+# -------------------------------------------------------------------------------------------
+
+class Transaccion:
+    """Una transacción con sus campos como atributos (p. ej. t.monto, t.categoria)."""
+
+    __slots__ = ("key", "fecha", "descripcion", "monto", "tipo", "categoria")
+
+    def __init__(self, key: str, fecha: int, descripcion: str, monto: float,
+                 tipo: Optional[str], categoria: Optional[str]):
+        self.key = key
+        self.fecha = fecha
+        self.descripcion = descripcion
+        self.monto = monto
+        self.tipo = tipo
+        self.categoria = categoria
+
+    @classmethod
+    def from_dict(cls, key: str, v: Dict) -> "Transaccion":
+        return cls(key, int(v.get("fecha") or 0), v.get("descripcion") or "",
+                   float(v.get("monto") or 0), v.get("tipo"), v.get("categoria"))
+
+    def to_dict(self) -> Dict:
+        """Registro como lo guarda Firebase (sin la key; fecha como timestamp float)."""
+        d = {"fecha": float(self.fecha), "descripcion": self.descripcion, "monto": self.monto}
+        if self.tipo is not None:
+            d["tipo"] = self.tipo
+        if self.categoria is not None:
+            d["categoria"] = self.categoria
+        return d
+
+    def __repr__(self) -> str:
+        return (f"Transaccion({self.key!r}, fecha={self.fecha}, monto={self.monto}, "
+                f"tipo={self.tipo!r}, categoria={self.categoria!r})")
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Contenedor por columnas
+# -------------------------------------------------------------------------------------------
+
+def _keys_array(keys: List[str]) -> np.ndarray:
+    """Keys como bytes de ancho fijo ('S'); las no ASCII se codifican en UTF-8."""
+    if not keys:
+        return np.empty(0, dtype="S1")
+    try:
+        return np.array(keys, dtype=bytes)
+    except UnicodeEncodeError:
+        return np.array([k.encode("utf-8") for k in keys], dtype=bytes)
+
+
+def as_u8(blob) -> np.ndarray:
+    """Blob de descripciones (bytes, bytearray o arreglo uint8) como arreglo uint8."""
+    return blob if isinstance(blob, np.ndarray) else np.frombuffer(blob, dtype=np.uint8)
+
+
+def _sort_categories(categorias: List[str], codigos: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """
+    Ordena las categorías alfabéticamente y recodifica 'codigos' (el -1 se conserva):
+    así agrupar por el Categorical da el mismo orden que agrupar por texto.
+    """
+    orden = sorted(range(len(categorias)), key=categorias.__getitem__)
+    if orden == list(range(len(categorias))):
+        return list(categorias), codigos
+    nuevo = np.empty(len(categorias) + 1, dtype=np.int32)
+    nuevo[-1] = -1
+    nuevo[orden] = np.arange(len(categorias), dtype=np.int32)
+    return [categorias[i] for i in orden], nuevo[codigos]
+
+
+def _prune_categories(categorias: List[str], codigos: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """Quita las categorías sin filas (como si el Ledger saliera de from_raw) y las ordena."""
+    presentes = np.unique(codigos[codigos >= 0])
+    if len(presentes) < len(categorias):
+        mapa = np.full(len(categorias) + 1, -1, dtype=np.int32)
+        mapa[presentes] = np.arange(len(presentes), dtype=np.int32)
+        categorias, codigos = [categorias[i] for i in presentes], mapa[codigos]
+    return _sort_categories(categorias, codigos)
+
+
+def _fit_keys(keys: np.ndarray) -> np.ndarray:
+    """Keys con el ancho justo (el de la más larga), como las deja _keys_array."""
+    if not len(keys):
+        return np.empty(0, dtype="S1")
+    ancho = max(int(np.char.str_len(keys).max()), 1)
+    return keys if keys.dtype.itemsize == ancho else keys.astype(f"S{ancho}")
+
+
+def gather_bytes(blob: np.ndarray, offsets: np.ndarray, filas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bytes de las 'filas' de un blob con offsets, uno tras otro, y el largo de cada una
+    (vectorizado: sin un slice por fila).
+    """
+    inicio = offsets[filas]
+    largos = offsets[filas + 1] - inicio
+    destino = np.cumsum(largos) - largos
+    idx = np.repeat(inicio - destino, largos) + np.arange(int(largos.sum()), dtype=np.int64)
+    return as_u8(blob)[idx], largos
+
+
+class Ledger:
+    """
+    Transacciones {key: {...}} guardadas por columnas (fila i = i-ésima de 'raw').
+    - fecha: int64 (segundos), monto: float64.
+    - tipo: int8 y cat: int32, códigos en 'tipos' / 'categorias' (-1 = sin valor).
+    - keys: bytes de ancho fijo ('S'); descripciones: blob UTF-8 con sus offsets
+      (la i-ésima es desc_blob[desc_off[i]:desc_off[i + 1]]).
+    """
+
+    __slots__ = ("keys", "fecha", "monto", "tipo", "cat", "tipos", "categorias",
+                 "desc_off", "desc_blob", "version", "_orden", "_ordenes", "_huella")
+
+    def __init__(self, keys: np.ndarray, fecha: np.ndarray, monto: np.ndarray,
+                 tipo: np.ndarray, cat: np.ndarray, tipos: List[str], categorias: List[str],
+                 desc_off: np.ndarray, desc_blob, version: int = 0):
+        self.keys = keys
+        self.fecha = fecha
+        self.monto = monto
+        self.tipo = tipo
+        self.cat = cat
+        self.tipos = tipos
+        self.categorias = categorias
+        self.desc_off = desc_off
+        self.desc_blob = desc_blob
+        self.version = version
+        self._orden: Optional[np.ndarray] = None    # argsort de keys (para positions)
+        self._ordenes: Dict[Tuple[str, bool], np.ndarray] = {}   # Ver order()
+        self._huella: Optional[str] = None          # Ver fingerprint()
+
+    @classmethod
+    def from_raw(cls, raw: Optional[Dict], version: int = 0) -> "Ledger":
+        """Construye el Ledger recorriendo 'raw' una sola vez."""
+        raw = raw or {}
+        fecha, monto, tipo, cat = array("q"), array("d"), array("b"), array("i")
+        desc_off, desc_blob = array("q", [0]), bytearray()
+        keys = list(raw)                # Las mismas str del dict, sin copias
+        tipo_idx = {t: i for i, t in enumerate(TIPOS)}
+        cat_idx: Dict[str, int] = {}
+        for v in raw.values():
+            fecha.append(int(v.get("fecha") or 0))
+            monto.append(float(v.get("monto") or 0))
+            t = v.get("tipo")
+            tipo.append(-1 if t is None else tipo_idx.setdefault(t, len(tipo_idx)))
+            c = v.get("categoria")
+            cat.append(-1 if c is None else cat_idx.setdefault(c, len(cat_idx)))
+            desc_blob += (v.get("descripcion") or "").encode("utf-8")
+            desc_off.append(len(desc_blob))
+
+        categorias, codigos = _sort_categories(list(cat_idx), np.frombuffer(cat, dtype=np.int32))
+        return cls(_keys_array(keys),
+                   np.frombuffer(fecha, dtype=np.int64),
+                   np.frombuffer(monto, dtype=np.float64),
+                   np.frombuffer(tipo, dtype=np.int8),
+                   codigos, list(tipo_idx), categorias,
+                   np.frombuffer(desc_off, dtype=np.int64), desc_blob, version)
+
+    @classmethod
+    def concat(cls, partes: List["Ledger"], version: int = 0) -> "Ledger":
+        """
+        Une Ledgers que comparten los códigos de tipo y categoría (los de la última
+        parte, que pueden extender los de las anteriores). Con una sola parte la
+        devuelve tal cual, sin copiar sus columnas.
+        """
+        ultima = partes[-1]
+        if len(partes) == 1:
+            led = ultima
+        else:
+            offsets, base = [partes[0].desc_off], partes[0].desc_off[-1]
+            for p in partes[1:]:
+                offsets.append(p.desc_off[1:] + base)
+                base += p.desc_off[-1]
+            led = cls(np.concatenate([p.keys for p in partes]),
+                      np.concatenate([p.fecha for p in partes]),
+                      np.concatenate([p.monto for p in partes]),
+                      np.concatenate([p.tipo for p in partes]),
+                      np.concatenate([p.cat for p in partes]),
+                      list(ultima.tipos), list(ultima.categorias),
+                      np.concatenate(offsets),
+                      np.concatenate([as_u8(p.desc_blob) for p in partes]))
+        led.categorias, led.cat = _sort_categories(led.categorias, led.cat)
+        led.version = version
+        return led
+
+    def take(self, filas: Iterable[int], version: int = 0) -> "Ledger":
+        """Nuevo Ledger con las 'filas' dadas, en ese orden (columnas copiadas)."""
+        filas = np.asarray(filas, dtype=np.intp)
+        blob, largos = gather_bytes(self.desc_blob, self.desc_off, filas)
+        categorias, cat = _prune_categories(list(self.categorias), self.cat[filas])
+        return Ledger(_fit_keys(self.keys[filas]), self.fecha[filas], self.monto[filas],
+                      self.tipo[filas], cat, list(self.tipos), categorias,
+                      np.concatenate(([0], np.cumsum(largos))).astype(np.int64), blob,
+                      version)
+
+    def with_changes(self, cambios: Dict[str, Optional[Dict]], version: int = 0) -> "Ledger":
+        """
+        Nuevo Ledger con escrituras aplicadas ({key: registro}, None = borrado) igual
+        que sobre el dict: la fila editada queda en su lugar, la borrada se quita y las
+        keys nuevas van al final en el orden de 'cambios'. Copia cada columna una vez
+        en lugar de recorrer todas las filas como from_raw.
+        """
+        pos = self._index_of(list(cambios))
+        tipos, categorias = list(self.tipos), list(self.categorias)
+        tipo_idx = {t: i for i, t in enumerate(tipos)}
+        cat_idx = {c: i for i, c in enumerate(categorias)}
+
+        def codigos(v: Dict) -> Tuple[int, int]:
+            t, c = v.get("tipo"), v.get("categoria")
+            return (-1 if t is None else tipo_idx.setdefault(t, len(tipo_idx)),
+                    -1 if c is None else cat_idx.setdefault(c, len(cat_idx)))
+
+        fecha, monto = self.fecha.copy(), self.monto.copy()
+        tipo, cat = self.tipo.copy(), self.cat.copy()
+        largos = np.diff(self.desc_off)
+        borradas, descripciones, nuevas = [], {}, []
+        for (key, v), p in zip(cambios.items(), pos.tolist()):
+            if p < 0:
+                if v is not None:
+                    nuevas.append((key, v))
+                continue
+            if v is None:
+                borradas.append(p)
+                continue
+            fecha[p] = int(v.get("fecha") or 0)
+            monto[p] = float(v.get("monto") or 0)
+            tipo[p], cat[p] = codigos(v)
+            desc = (v.get("descripcion") or "").encode("utf-8")
+            if desc != self.desc_blob_at(p):
+                descripciones[p] = desc
+                largos[p] = len(desc)
+
+        # Descripciones: tramos sin cambios del blob + las editadas, luego las nuevas
+        blob, partes, desde = as_u8(self.desc_blob), [], 0
+        for p in sorted(set(borradas) | set(descripciones)):
+            partes.append(blob[desde:self.desc_off[p]])
+            if p in descripciones and p not in borradas:
+                partes.append(np.frombuffer(descripciones[p], dtype=np.uint8))
+            desde = int(self.desc_off[p + 1])
+        partes.append(blob[desde:])
+
+        vivas = np.ones(len(self), dtype=bool)
+        vivas[borradas] = False
+        nuevo = Ledger.from_raw(dict(nuevas))
+        codigos_nuevos = [codigos(v) for _, v in nuevas]
+        partes.append(as_u8(nuevo.desc_blob))
+        largos = np.concatenate((largos[vivas], np.diff(nuevo.desc_off)))
+        categorias, cat = _prune_categories(
+            list(cat_idx), np.concatenate((cat[vivas], np.array([c for _, c in codigos_nuevos],
+                                                                 dtype=np.int32))))
+        return Ledger(_fit_keys(np.concatenate((self.keys[vivas], nuevo.keys))),
+                      np.concatenate((fecha[vivas], nuevo.fecha)),
+                      np.concatenate((monto[vivas], nuevo.monto)),
+                      np.concatenate((tipo[vivas], np.array([t for t, _ in codigos_nuevos],
+                                                            dtype=np.int8))),
+                      cat, list(tipo_idx), categorias,
+                      np.concatenate(([0], np.cumsum(largos))).astype(np.int64),
+                      np.concatenate(partes), version)
+
+    def __len__(self) -> int:
+        return len(self.fecha)
+
+    # --- Acceso por fila ---
+
+    def key(self, i: int) -> str:
+        return self.keys[i].decode("utf-8")
+
+    def desc_blob_at(self, i: int) -> bytes:
+        return bytes(self.desc_blob[self.desc_off[i]:self.desc_off[i + 1]])
+
+    def descripcion(self, i: int) -> str:
+        return self.desc_blob_at(i).decode("utf-8")
+
+    def tipo_de(self, i: int) -> Optional[str]:
+        c = self.tipo[i]
+        return self.tipos[c] if c >= 0 else None
+
+    def categoria(self, i: int) -> Optional[str]:
+        c = self.cat[i]
+        return self.categorias[c] if c >= 0 else None
+
+    def record(self, i: int) -> Transaccion:
+        return Transaccion(self.key(i), int(self.fecha[i]), self.descripcion(i),
+                           float(self.monto[i]), self.tipo_de(i), self.categoria(i))
+
+    def __iter__(self) -> Iterator[Transaccion]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def to_raw(self) -> Dict[str, Dict]:
+        """Vuelve al formato {key: {...}} de Firebase."""
+        return {t.key: t.to_dict() for t in self}
+
+    def fingerprint(self) -> str:
+        """
+        Huella (hash) del contenido: igual para los mismos datos aunque se lean en otro
+        arranque o salgan de la caché en disco. Se calcula una vez por Ledger.
+        """
+        if self._huella is None:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(json.dumps([len(self), self.tipos, self.categorias]).encode("utf-8"))
+            for col in (self.keys, self.fecha, self.monto, self.tipo, self.cat, self.desc_off,
+                        as_u8(self.desc_blob)):
+                h.update(np.ascontiguousarray(col).data)
+            self._huella = h.hexdigest()
+        return self._huella
+
+    # --- Selección ---
+
+    def between(self, t0: float, t1: float) -> np.ndarray:
+        """Posiciones (en orden de fila) con t0 <= fecha < t1."""
+        return np.flatnonzero((self.fecha >= t0) & (self.fecha < t1))
+
+    def rango(self) -> Optional[Tuple[int, int]]:
+        """(fecha mínima, fecha máxima) de las filas con fecha, o None si no hay ninguna."""
+        fechas = self.fecha[self.fecha > 0]
+        if not len(fechas):
+            return None
+        return int(fechas.min()), int(fechas.max())
+
+    def positions(self, keys: Iterable[str]) -> np.ndarray:
+        """Posiciones (ordenadas) de las 'keys' que están en el Ledger."""
+        buscadas = np.array([k.encode("utf-8") for k in keys], dtype=bytes)
+        if not len(buscadas) or not len(self):
+            return np.empty(0, dtype=np.intp)
+        if self._orden is None:
+            self._orden = np.argsort(self.keys, kind="stable")
+        ordenadas = self.keys[self._orden]
+        j = np.searchsorted(ordenadas, buscadas)
+        dentro = j < len(ordenadas)
+        j, buscadas = j[dentro], buscadas[dentro]
+        j = j[ordenadas[j] == buscadas]
+        return np.sort(self._orden[j])
+
+    def order(self, campo: str, reverse: bool = False) -> np.ndarray:
+        """
+        Posiciones de todas las filas ordenadas por 'campo' ("fecha", "monto" o uno de
+        texto, sin distinguir mayúsculas), estable también en reversa como list.sort.
+        Se calcula una vez por Ledger, campo y dirección.
+        """
+        orden = self._ordenes.get((campo, reverse))
+        if orden is None:
+            if campo in ("fecha", "monto"):
+                valores = getattr(self, campo)
+                orden = np.argsort(-valores if reverse else valores, kind="stable")
+            else:
+                textos = [t.lower() for t in self.texts(campo, range(len(self)))]
+                orden = np.array(sorted(range(len(textos)), key=textos.__getitem__,
+                                        reverse=reverse), dtype=np.intp)
+            self._ordenes[(campo, reverse)] = orden
+        return orden
+
+    def _index_of(self, keys: List[str]) -> np.ndarray:
+        """Posición de cada una de 'keys' (en ese orden), -1 si no está."""
+        if not keys or not len(self):
+            return np.full(len(keys), -1, dtype=np.intp)
+        buscadas = np.array([k.encode("utf-8") for k in keys], dtype=bytes)
+        if self._orden is None:
+            self._orden = np.argsort(self.keys, kind="stable")
+        ordenadas = self.keys[self._orden]
+        j = np.minimum(np.searchsorted(ordenadas, buscadas), len(ordenadas) - 1)
+        return np.where(ordenadas[j] == buscadas, self._orden[j], -1)
+
+    def keys_at(self, pos: Iterable[int]) -> List[str]:
+        return [k.decode("utf-8") for k in self.keys[np.asarray(pos, dtype=np.intp)]]
+
+    def texts(self, campo: str, pos: Iterable[int]) -> List[str]:
+        """Valores de texto ('descripcion', 'tipo' o 'categoria') en las posiciones dadas."""
+        if campo == "descripcion":
+            return [self.descripcion(i) for i in pos]
+        if campo == "tipo":
+            return [self.tipo_de(i) or "" for i in pos]
+        if campo == "categoria":
+            return [self.categoria(i) or "" for i in pos]
+        raise KeyError(campo)
+
+    # --- DataFrame ---
+
+    def to_dataframe(self, fechas: bool = False, descripcion: bool = False) -> pd.DataFrame:
+        """
+        DataFrame con columnas fecha, monto, tipo y categoria sobre los mismos arreglos
+        (sin copiarlos); tipo y categoria son Categorical con los códigos del Ledger.
+        - fechas=True convierte la fecha a datetime (como pd.to_datetime(unit="s")).
+        - descripcion=True agrega la columna de texto (esa sí crea un str por fila).
+        """
+        cols = {
+            "fecha": pd.to_datetime(self.fecha, unit="s") if fechas else self.fecha,
+            "monto": self.monto,
+            "tipo": pd.Categorical.from_codes(self.tipo, self.tipos),
+            "categoria": pd.Categorical.from_codes(self.cat, self.categorias),
+        }
+        if descripcion:
+            cols["descripcion"] = self.texts("descripcion", range(len(self)))
+        return pd.DataFrame(cols, copy=False)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes de las columnas (sin contar las listas de códigos)."""
+        return (self.keys.nbytes + self.fecha.nbytes + self.monto.nbytes + self.tipo.nbytes
+                + self.cat.nbytes + self.desc_off.nbytes + len(self.desc_blob))
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Caché por usuario
+# -------------------------------------------------------------------------------------------
+
+# Un Ledger por usuario y versión de datos. Todas las vistas pasan, para una versión,
+# el mismo contenido (el snapshot de get_transactions o su copia con las escrituras
+# locales ya aplicadas), así que cambiar de vista no reconstruye nada.
+_ledgers: Dict[str, Ledger] = {}
+
+
+def ledger_for(uid: str, version: int, raw: Dict) -> Ledger:
+    """
+    Devuelve el Ledger de 'uid' para la versión 'version' de sus datos,
+    construyéndolo desde 'raw' solo si cambió la versión (o, por seguridad, si
+    'raw' no tiene las mismas filas que el Ledger guardado).
+    """
+    previo = _ledgers.get(uid)
+    if previo is not None and previo.version == version and len(previo) == len(raw):
+        return previo
+    led = Ledger.from_raw(raw, version)
+    _ledgers[uid] = led
+    import ledger_store             # Diferido: ledger_store importa este módulo
+    ledger_store.save_async(uid, led)
+    return led
+
+
+def apply_changes(uid: str, old_version: int, new_version: int,
+                  cambios: Dict[str, Optional[Dict]]) -> None:
+    """
+    Aplica al Ledger de 'uid' escrituras locales ya confirmadas ({key: registro},
+    None = borrado) sin reconstruirlo desde 'raw'. Solo si estaba al día
+    (old_version); en otro caso ledger_for lo reconstruye en la próxima consulta.
+    """
+    previo = _ledgers.get(uid)
+    if previo is None or previo.version != old_version:
+        return
+    led = previo.with_changes(cambios, new_version)
+    _ledgers[uid] = led
+    import ledger_store
+    ledger_store.save_async(uid, led)
@@ -0,0 +1,155 @@
+# ===========================================================================================
+# exporter.py
+# -------------------------------------------------------------------------------------------
+# Exportación de transacciones y agregados a CSV o Parquet:
+# - Las filas se generan por bloques desde los datos ya cargados en memoria
+#   (sin armar cadenas ni DataFrames gigantes), y cada bloque se escribe de inmediato.
+# - CSV siempre disponible (UTF-8 con BOM para que Excel respete las tildes).
+# - Parquet solo si pyarrow está instalado (dependencia opcional).
+# - Admite progreso y cancelación, pensado para ejecutarse en un hilo de trabajo
+#   (ver utils.run_with_progress). No depende de Tk.
+# ===========================================================================================
+
+import csv
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:     # Parquet es opcional
+    pa = pq = None
+
+# Columnas exportadas para cada transacción
+TX_COLUMNS = ("fecha", "descripcion", "monto", "tipo", "categoria")
+
+CHUNK_ROWS = 5000
+
+
+def parquet_available() -> bool:
+    """True si pyarrow está instalado y se puede exportar a Parquet."""
+    return pq is not None
+
+
+def filetypes() -> List[Tuple[str, str]]:
+    """Tipos de archivo para el diálogo "Guardar como" según lo disponible."""
+    tipos = [("CSV", "*.csv")]
+    if parquet_available():
+        tipos.append(("Parquet", "*.parquet"))
+    return tipos
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Fuentes de filas (generadores)
+# -------------------------------------------------------------------------------------------
+
+def transaction_rows(data: Dict, keys: Iterable[str]) -> Iterator[tuple]:
+    """
+    Genera (fecha ISO, descripción, monto, tipo, categoría) para cada key de 'keys'
+    presente en 'data', en el mismo orden (p. ej. el de la tabla filtrada).
+    """
+    for k in keys:
+        t = data.get(k)
+        if not t:
+            continue
+        try:
+            fecha = datetime.fromtimestamp(t["fecha"]).strftime("%Y-%m-%d")
+        except (KeyError, TypeError, ValueError, OSError):
+            fecha = ""
+        yield (fecha, t.get("descripcion", ""), t.get("monto", 0),
+               t.get("tipo", ""), t.get("categoria", ""))
+
+
+def frame_rows(df) -> Iterator[tuple]:
+    """Genera las filas de un DataFrame (índice incluido) sin copiarlo entero."""
+    return df.itertuples(index=True, name=None)
+
+
+def frame_columns(df) -> List[str]:
+    """Encabezados de un DataFrame, empezando por el nombre del índice."""
+    return [df.index.name or "indice"] + [str(c) for c in df.columns]
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Escritura por bloques
+# -------------------------------------------------------------------------------------------
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    it = iter(rows)
+    while True:
+        bloque = list(islice(it, size))
+        if not bloque:
+            return
+        yield bloque
+
+
+def write_rows(path: str,
+               columns: Sequence[str],
+               rows: Iterable[tuple],
+               total: Optional[int] = None,
+               report: Optional[Callable[[float, str], None]] = None,
+               cancelled: Optional[Callable[[], bool]] = None,
+               chunk_rows: int = CHUNK_ROWS) -> int:
+    """
+    Escribe 'rows' en 'path' por bloques de 'chunk_rows' filas.
+    - El formato depende de la extensión: .parquet (requiere pyarrow) o CSV.
+    - total: número de filas esperado, para calcular el progreso.
+    - report(fraccion, texto) se llama tras cada bloque; cancelled() lo interrumpe
+      (el archivo parcial se elimina).
+    Retorna el número de filas escritas.
+    """
+    parquet = path.lower().endswith(".parquet")
+    if parquet and not parquet_available():
+        raise RuntimeError("Para exportar a Parquet instala pyarrow.")
+
+    escritas = 0
+    writer = None
+    ok = False
+    f = None
+    try:
+        if not parquet:
+            f = open(path, "w", newline="", encoding="utf-8-sig")
+            writer = csv.writer(f)
+            writer.writerow(columns)
+        for bloque in _chunks(rows, chunk_rows):
+            if cancelled is not None and cancelled():
+                raise InterruptedError("Exportación cancelada.")
+            if parquet:
+                cols = list(zip(*bloque))
+                table = pa.table({c: list(v) for c, v in zip(columns, cols)})
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            else:
+                writer.writerows(bloque)
+            escritas += len(bloque)
+            if report is not None:
+                fr = escritas / total if total else 0.0
+                report(min(fr, 1.0), f"{escritas:,} filas".replace(",", "."))
+        if parquet and writer is None:
+            # Sin filas: archivo con el esquema vacío
+            pq.write_table(pa.table({c: [] for c in columns}), path)
+        ok = True
+    finally:
+        if parquet and writer is not None:
+            writer.close()
+        if f is not None:
+            f.close()
+        if not ok and os.path.exists(path):
+            os.remove(path)
+    return escritas
+
+
+def export_transactions(path: str, data: Dict, keys: Sequence[str],
+                        report=None, cancelled=None) -> int:
+    """Exporta las transacciones 'keys' (en ese orden) de 'data' a 'path'."""
+    return write_rows(path, TX_COLUMNS, transaction_rows(data, keys),
+                      total=len(keys), report=report, cancelled=cancelled)
+
+
+def export_frame(path: str, df, report=None, cancelled=None) -> int:
+    """Exporta un DataFrame (p. ej. aggregates.DailyBuckets.table) a 'path'."""
+    return write_rows(path, frame_columns(df), frame_rows(df),
+                      total=len(df), report=report, cancelled=cancelled)
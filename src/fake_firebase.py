@@ -0,0 +1,564 @@
+# ===========================================================================================
+# fake_firebase.py
+# -------------------------------------------------------------------------------------------
+# Sustituto local (en proceso) de Firebase para pruebas y mediciones sin conexión:
+# - Misma forma de uso que Pyrebase: firebase.database().child(...).get/push/update/
+#   set/remove, generate_key(), stream(), y consultas order_by_child / order_by_key /
+#   start_at / end_at / equal_to / limit_to_first / limit_to_last / shallow.
+# - Auth de correo y contraseña (registro, login, refresh) y un admin_auth mínimo
+#   (list_users, update_user), con los mismos mensajes de error que Firebase.
+# - Datos en memoria, opcionalmente persistidos en un archivo JSON (las escrituras se
+#   agrupan: el archivo se reescribe como mucho una vez por SAVE_DELAY y al salir).
+# - Latencia y tasa de fallos configurables (con semilla) para medir de forma
+#   reproducible cómo se comporta la app con una red lenta o inestable.
+# firebase_service.py lo usa cuando KLARITY_BACKEND=fake (ver from_env()).
+# ===========================================================================================
+
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import random
+import secrets
+import string
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class FakeFirebaseError(Exception):
+    """Error simulado (fallo inyectado o error de Auth), como el HTTPError de Pyrebase."""
+
+
+def _clone(value):
+    # Copia profunda rápida: como en la red real, nadie comparte objetos con la "base"
+    return pickle.loads(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _split(path: str) -> List[str]:
+    return [p for p in str(path).split("/") if p]
+
+
+# -------------------------------------------------------------------------------------------
+# 1) IDs de push (mismo formato que Firebase: 20 caracteres ordenados por tiempo)
+# -------------------------------------------------------------------------------------------
+
+_PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+class PushIdGenerator:
+    """Genera keys cronológicas y únicas incluso dentro del mismo milisegundo."""
+
+    def __init__(self, rng: random.Random):
+        self._rng = rng
+        self._last_ms = 0
+        self._last_rand = [0] * 12
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            now = int(time.time() * 1000)
+            if now == self._last_ms:
+                # Mismo milisegundo: se incrementa la parte aleatoria
+                i = 11
+                while i >= 0 and self._last_rand[i] == 63:
+                    self._last_rand[i] = 0
+                    i -= 1
+                self._last_rand[i] += 1
+            else:
+                self._last_ms = now
+                self._last_rand = [self._rng.randrange(64) for _ in range(12)]
+            ts = []
+            for _ in range(8):
+                ts.append(_PUSH_CHARS[now % 64])
+                now //= 64
+            return "".join(reversed(ts)) + "".join(_PUSH_CHARS[i] for i in self._last_rand)
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Almacenamiento (árbol JSON en memoria) con latencia/fallos inyectados
+# -------------------------------------------------------------------------------------------
+
+SAVE_DELAY = 1.0            # Segundos en que se agrupan escrituras antes de reescribir el JSON
+
+
+class FakeStore:
+    """
+    Árbol de datos compartido por la base y Auth.
+    - path: archivo JSON donde persistir (None = solo memoria).
+    - latency: segundos por petición, o (mín, máx) para una latencia variable.
+    - failure_rate: probabilidad (0..1) de que una petición falle.
+    - seed: semilla para que latencias, fallos y keys sean reproducibles.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency=0.0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.path = path
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.RLock()
+        self.data: Dict = {}
+        self.users: Dict[str, Dict] = {}     # email -> cuenta
+        self.tokens: Dict[str, str] = {}     # refreshToken -> email (sobrevive al reinicio)
+        self.requests = 0                    # Peticiones atendidas (para mediciones)
+        self.push_ids = PushIdGenerator(random.Random(self.rng.random()))
+        self._streams: List["FakeStream"] = []
+        self._save_timer: Optional[threading.Timer] = None
+        if path:
+            atexit.register(self.flush)
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self.data = saved.get("db") or {}
+            self.users = saved.get("auth") or {}
+            self.tokens = saved.get("tokens") or {}
+
+    # ─── Simulación de red ─────────────────────────────────────────────
+
+    def request(self, op: str) -> None:
+        """Aplica la latencia y el fallo inyectados a una petición."""
+        with self.lock:
+            self.requests += 1
+            if isinstance(self.latency, (tuple, list)):
+                delay = self.rng.uniform(*self.latency)
+            else:
+                delay = float(self.latency or 0)
+            falla = self.failure_rate and self.rng.random() < self.failure_rate
+        if delay > 0:
+            time.sleep(delay)
+        if falla:
+            raise FakeFirebaseError(f"[Errno 503] Service Unavailable (simulado en {op})")
+
+    # ─── Árbol ─────────────────────────────────────────────────────────
+
+    def read(self, parts: List[str]):
+        node = self.data
+        for p in parts:
+            if not isinstance(node, dict) or p not in node:
+                return None
+            node = node[p]
+        return node
+
+    def write(self, parts: List[str], value) -> None:
+        """Escribe 'value' en la ruta (None borra y poda los nodos vacíos)."""
+        if not parts:
+            self.data = value if isinstance(value, dict) else {}
+            return
+        node = self.data
+        camino = []
+        for p in parts[:-1]:
+            nxt = node.get(p)
+            if not isinstance(nxt, dict):
+                if value is None:
+                    return
+                nxt = node[p] = {}
+            camino.append((node, p))
+            node = nxt
+        if value is None or value == {}:
+            node.pop(parts[-1], None)
+            # Firebase no guarda nodos vacíos
+            for padre, p in reversed(camino):
+                if padre[p]:
+                    break
+                del padre[p]
+        else:
+            node[parts[-1]] = value
+
+    def changed(self, parts: List[str]) -> None:
+        """Persiste y avisa a los streams cuya ruta se cruza con la escrita."""
+        self.save()
+        for s in list(self._streams):
+            n = min(len(s.parts), len(parts))
+            if s.parts[:n] == parts[:n]:
+                s.notify()
+
+    def save(self) -> None:
+        """
+        Programa la escritura del archivo. Reescribir todo el JSON en cada escritura haría
+        que cada push cueste O(n): se agrupan las de SAVE_DELAY segundos (y flush al salir).
+        """
+        if not self.path:
+            return
+        with self.lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SAVE_DELAY, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self) -> None:
+        """Escribe ya el archivo con el estado actual (si hay cambios pendientes)."""
+        if not self.path:
+            return
+        with self.lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"db": self.data, "auth": self.users, "tokens": self.tokens}, f,
+                          ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Base de datos (API de Pyrebase)
+# -------------------------------------------------------------------------------------------
+
+class FakeResponse:
+    """Equivalente a PyreResponse: val(), key() y each()."""
+
+    def __init__(self, value, key: Optional[str]):
+        self._value = value
+        self._key = key
+
+    def val(self):
+        return self._value
+
+    def key(self):
+        return self._key
+
+    def each(self):
+        if not isinstance(self._value, dict):
+            return None
+        return [FakeResponse(v, k) for k, v in self._value.items()]
+
+
+def _sort_key(value) -> Tuple[int, Any]:
+    # Orden de Firebase: null < false < true < números < textos < objetos
+    if value is None:
+        return (0, 0)
+    if value is False:
+        return (1, 0)
+    if value is True:
+        return (2, 0)
+    if isinstance(value, (int, float)):
+        return (3, value)
+    if isinstance(value, str):
+        return (4, value)
+    return (5, 0)
+
+
+class FakeStream:
+    """Suscripción creada por Query.stream(); close() la cancela."""
+
+    def __init__(self, store: FakeStore, parts: List[str], handler: Callable):
+        self.store = store
+        self.parts = parts
+        self.handler = handler
+
+    def notify(self) -> None:
+        # Se envía el estado completo de la ruta suscrita (la app solo lo usa para invalidar)
+        self.handler({"event": "put", "path": "/", "data": _clone(self.store.read(self.parts))})
+
+    def close(self) -> None:
+        with self.store.lock:
+            if self in self.store._streams:
+                self.store._streams.remove(self)
+
+
+class Query:
+    """
+    Referencia a una ruta más parámetros de consulta. A diferencia de Pyrebase,
+    cada child()/order_by_...() devuelve una referencia nueva (no muta la anterior).
+    """
+
+    def __init__(self, store: FakeStore, parts: List[str], params: Optional[Dict] = None):
+        self._store = store
+        self._parts = parts
+        self._params = params or {}
+
+    def _with(self, **params) -> "Query":
+        return Query(self._store, self._parts, {**self._params, **params})
+
+    # ─── Navegación y consulta ────────────────────────────────────────
+
+    def child(self, *args) -> "Query":
+        parts = list(self._parts)
+        for a in args:
+            parts.extend(_split(a))
+        return Query(self._store, parts, {})
+
+    def order_by_child(self, name: str) -> "Query":
+        return self._with(order_by=("child", name))
+
+    def order_by_key(self) -> "Query":
+        return self._with(order_by=("key", None))
+
+    def order_by_value(self) -> "Query":
+        return self._with(order_by=("value", None))
+
+    def start_at(self, value) -> "Query":
+        return self._with(start_at=value)
+
+    def end_at(self, value) -> "Query":
+        return self._with(end_at=value)
+
+    def equal_to(self, value) -> "Query":
+        return self._with(start_at=value, end_at=value)
+
+    def limit_to_first(self, n: int) -> "Query":
+        return self._with(limit=("first", int(n)))
+
+    def limit_to_last(self, n: int) -> "Query":
+        return self._with(limit=("last", int(n)))
+
+    def shallow(self) -> "Query":
+        return self._with(shallow=True)
+
+    def generate_key(self) -> str:
+        return self._store.push_ids()
+
+    def _apply(self, node):
+        p = self._params
+        if not isinstance(node, dict):
+            return node
+        if p.get("shallow"):
+            return {k: True for k in node}
+        order = p.get("order_by")
+        if order is None:
+            return node
+        tipo, name = order
+        if tipo == "key":
+            valor = lambda kv: kv[0]
+        elif tipo == "value":
+            valor = lambda kv: kv[1]
+        else:
+            valor = lambda kv: kv[1].get(name) if isinstance(kv[1], dict) else None
+        items = sorted(node.items(), key=lambda kv: (_sort_key(valor(kv)), kv[0]))
+        if "start_at" in p:
+            lo = _sort_key(p["start_at"])
+            items = [kv for kv in items if _sort_key(valor(kv)) >= lo]
+        if "end_at" in p:
+            hi = _sort_key(p["end_at"])
+            items = [kv for kv in items if _sort_key(valor(kv)) <= hi]
+        limit = p.get("limit")
+        if limit:
+            lado, n = limit
+            items = items[:n] if lado == "first" else items[-n:] if n else []
+        return OrderedDict(items)
+
+    # ─── Lectura ──────────────────────────────────────────────────────
+
+    def get(self, token: Optional[str] = None) -> FakeResponse:
+        self._store.request("get")
+        with self._store.lock:
+            node = self._apply(self._store.read(self._parts))
+            node = _clone(node) if node is not None else None
+        if isinstance(node, dict) and not node:
+            node = None
+        return FakeResponse(node, self._parts[-1] if self._parts else None)
+
+    def stream(self, handler: Callable, token: Optional[str] = None,
+               stream_id: Optional[str] = None) -> FakeStream:
+        s = FakeStream(self._store, list(self._parts), handler)
+        with self._store.lock:
+            self._store._streams.append(s)
+            data = _clone(self._store.read(self._parts))
+        handler({"event": "put", "path": "/", "data": data})   # Estado inicial, como Firebase
+        return s
+
+    # ─── Escritura ────────────────────────────────────────────────────
+
+    def set(self, data, token: Optional[str] = None):
+        self._store.request("set")
+        with self._store.lock:
+            self._store.write(self._parts, _clone(data))
+            self._store.changed(self._parts)
+        return data
+
+    def push(self, data, token: Optional[str] = None) -> Dict[str, str]:
+        self._store.request("push")
+        key = self._store.push_ids()
+        with self._store.lock:
+            self._store.write(self._parts + [key], _clone(data))
+            self._store.changed(self._parts + [key])
+        return {"name": key}
+
+    def update(self, data: Dict, token: Optional[str] = None):
+        """Actualización multi-ruta: cada clave puede ser 'a/b/c'; None borra."""
+        self._store.request("update")
+        with self._store.lock:
+            for k, v in data.items():
+                self._store.write(self._parts + _split(k), _clone(v))
+            self._store.changed(self._parts)
+        return data
+
+    def remove(self, token: Optional[str] = None) -> None:
+        self._store.request("remove")
+        with self._store.lock:
+            self._store.write(self._parts, None)
+            self._store.changed(self._parts)
+
+
+# -------------------------------------------------------------------------------------------
+# 4) Auth (API de Pyrebase) y admin_auth (API mínima de firebase_admin.auth)
+# -------------------------------------------------------------------------------------------
+
+def _hash(password: str, salt: str) -> str:
+    return hashlib.sha256((salt + password).encode()).hexdigest()
+
+
+def _error(msg: str) -> FakeFirebaseError:
+    # Mismo cuerpo que devuelve la API REST de Firebase Auth
+    return FakeFirebaseError(json.dumps({"error": {"code": 400, "message": msg}}))
+
+
+class FakeAuth:
+    """Registro y login con correo y contraseña."""
+
+    def __init__(self, store: FakeStore):
+        self._store = store
+        self._tokens = store.tokens           # refreshToken -> email
+        self._id_tokens: Dict[str, str] = {}  # idToken -> email
+
+    def _session(self, cuenta: Dict) -> Dict:
+        refresh = secrets.token_urlsafe(32)
+        id_token = secrets.token_urlsafe(48)
+        self._tokens[refresh] = cuenta["email"]
+        self._id_tokens[id_token] = cuenta["email"]
+        self._store.save()
+        return {
+            "kind": "identitytoolkit#VerifyPasswordResponse",
+            "localId": cuenta["localId"],
+            "email": cuenta["email"],
+            "displayName": cuenta.get("displayName", ""),
+            "idToken": id_token,
+            "refreshToken": refresh,
+            "expiresIn": "3600",
+            "registered": True,
+        }
+
+    def create_user_with_email_and_password(self, email: str, password: str) -> Dict:
+        self._store.request("auth.signUp")
+        with self._store.lock:
+            if email in self._store.users:
+                raise _error("EMAIL_EXISTS")
+            if len(password or "") < 6:
+                raise _error("WEAK_PASSWORD : Password should be at least 6 characters")
+            salt = secrets.token_hex(8)
+            uid = "".join(self._store.rng.choice(string.ascii_letters + string.digits)
+                          for _ in range(28))
+            cuenta = {"localId": uid, "email": email, "salt": salt,
+                      "password": _hash(password, salt)}
+            self._store.users[email] = cuenta
+            self._store.save()
+            return self._session(cuenta)
+
+    def sign_in_with_email_and_password(self, email: str, password: str) -> Dict:
+        self._store.request("auth.signIn")
+        with self._store.lock:
+            cuenta = self._store.users.get(email)
+            if cuenta is None or cuenta["password"] != _hash(password, cuenta["salt"]):
+                raise _error("INVALID_LOGIN_CREDENTIALS")
+            return self._session(cuenta)
+
+    def refresh(self, refresh_token: str) -> Dict:
+        self._store.request("auth.refresh")
+        with self._store.lock:
+            email = self._tokens.get(refresh_token)
+            if email is None:
+                raise _error("INVALID_REFRESH_TOKEN")
+            cuenta = self._store.users.get(email)
+            if cuenta is None:
+                raise _error("USER_NOT_FOUND")
+            # Como Firebase: ID token nuevo, el mismo refresh token
+            id_token = secrets.token_urlsafe(48)
+            self._id_tokens[id_token] = email
+        return {"userId": cuenta["localId"], "idToken": id_token, "refreshToken": refresh_token}
+
+    def get_account_info(self, id_token: str) -> Dict:
+        self._store.request("auth.lookup")
+        with self._store.lock:
+            cuenta = self._store.users.get(self._id_tokens.get(id_token))
+            if cuenta is None:
+                raise _error("INVALID_ID_TOKEN")
+            return {"users": [{k: v for k, v in cuenta.items() if k not in ("password", "salt")}]}
+
+
+class _UserRecord:
+    def __init__(self, cuenta: Dict):
+        self.uid = cuenta["localId"]
+        self.email = cuenta["email"]
+        self.display_name = cuenta.get("displayName")
+
+
+class _UsersPage:
+    def __init__(self, users: List[_UserRecord]):
+        self.users = users
+
+    def iterate_all(self):
+        return iter(self.users)
+
+
+class FakeAdminAuth:
+    """Subconjunto de firebase_admin.auth usado por la app."""
+
+    def __init__(self, store: FakeStore):
+        self._store = store
+
+    def list_users(self) -> _UsersPage:
+        with self._store.lock:
+            return _UsersPage([_UserRecord(c) for c in self._store.users.values()])
+
+    def update_user(self, uid: str, password: Optional[str] = None, **_):
+        with self._store.lock:
+            for cuenta in self._store.users.values():
+                if cuenta["localId"] == uid:
+                    if password is not None:
+                        if len(password) < 6:
+                            raise _error("WEAK_PASSWORD")
+                        cuenta["password"] = _hash(password, cuenta["salt"])
+                        # Cambiar la contraseña revoca las sesiones (refresh tokens) previas
+                        for token, email in list(self._store.tokens.items()):
+                            if email == cuenta["email"]:
+                                del self._store.tokens[token]
+                    self._store.save()
+                    return _UserRecord(cuenta)
+        raise _error("USER_NOT_FOUND")
+
+
+# -------------------------------------------------------------------------------------------
+# 5) App (como el objeto de pyrebase.initialize_app)
+# -------------------------------------------------------------------------------------------
+
+class FakeFirebase:
+    """Punto de entrada: .database(), .auth() y .admin_auth() sobre un mismo FakeStore."""
+
+    def __init__(self, store: Optional[FakeStore] = None, **store_opts):
+        self.store = store or FakeStore(**store_opts)
+
+    def database(self) -> Query:
+        return Query(self.store, [])
+
+    def auth(self) -> FakeAuth:
+        return FakeAuth(self.store)
+
+    def admin_auth(self) -> FakeAdminAuth:
+        return FakeAdminAuth(self.store)
+
+
+def from_env() -> FakeFirebase:
+    """
+    Crea el backend falso a partir de variables de entorno:
+    - KLARITY_FAKE_DB: archivo JSON de datos (vacío = solo memoria).
+    - KLARITY_FAKE_LATENCY_MS: latencia por petición, "50" o "20-120" (rango).
+    - KLARITY_FAKE_FAILURE_RATE: probabilidad de fallo por petición (0..1).
+    - KLARITY_FAKE_SEED: semilla para resultados reproducibles.
+    """
+    lat = os.environ.get("KLARITY_FAKE_LATENCY_MS", "").strip()
+    if "-" in lat:
+        lo, hi = lat.split("-", 1)
+        latency = (float(lo) / 1000, float(hi) / 1000)
+    else:
+        latency = float(lat or 0) / 1000
+    seed = os.environ.get("KLARITY_FAKE_SEED")
+    return FakeFirebase(
+        path=os.environ.get("KLARITY_FAKE_DB") or None,
+        latency=latency,
+        failure_rate=float(os.environ.get("KLARITY_FAKE_FAILURE_RATE") or 0),
+        seed=int(seed) if seed else None,
+    )
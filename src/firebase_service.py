@@ -2,7 +2,10 @@
 # firebase_service.py
 # -------------------------------------------------------------------------------------------
 # Módulo encargado de:
-# - Inicializar la conexión con Firebase (cliente Pyrebase + Admin SDK).
+# - Inicializar la conexión con Firebase (cliente Pyrebase + Admin SDK), o con el
+#   sustituto local fake_firebase.py si KLARITY_BACKEND=fake (pruebas sin conexión).
+# - Medir cada llamada con @instrumented (ver metrics.py) y reintentar las lecturas
+#   ante errores transitorios de red.
 # - Proveer funciones CRUD para:
 #     • Usuarios (registro, login).
 #     • Perfil (nombre, foto).
@@ -10,16 +13,24 @@
 #     • Transacciones.
 #     • Sugerencias generadas por IA.
 #     • Cambio de contraseña seguro.
+# - Mantener la sesión: renovar el ID token antes de que expire (auth.refresh), guardar el
+#   refresh token (session_store.py) y reanudar la sesión al abrir la app sin contraseña.
+# - Precargar en paralelo, apenas hay sesión, lo que piden las vistas al abrir (prefetch).
 # ===========================================================================================
 
+import contextvars
+import json
 import os
 import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Tuple, Optional, Dict
 
-import pyrebase                      # Cliente Python para Firebase (Auth + Realtime DB).
-import firebase_admin                # SDK de administrador para Firebase.
-from firebase_admin import credentials, auth as admin_auth
+import metrics                       # Latencia, bytes, errores y reintentos por operación
+import session_store                 # Refresh token guardado entre ejecuciones
+from metrics import instrumented
+import profiling                     # Hito "firebase_listo" del modo de perfilado
 
 # -------------------------------------------------------------------------------------------
 # 1) Configuración del path para importar archivos en 'config/'
@@ -29,26 +40,75 @@ config_dir = os.path.join(current_dir, '..', 'config')
 if config_dir not in sys.path:
     sys.path.append(config_dir)      # Añade la carpeta config al path
 
-from firebase_config import FIREBASE_CONFIG, SERVICE_ACCOUNT_KEY_PATH
-
 # -------------------------------------------------------------------------------------------
-# 2) Inicialización de Firebase
+# 2) Inicialización del backend
 # -------------------------------------------------------------------------------------------
-# Pyrebase4: para que el usuario "normal" haga login, registro y CRUD en DB.
-firebase = pyrebase.initialize_app(FIREBASE_CONFIG)
-auth = firebase.auth()               # Módulo de autenticación (email/password, etc.).
-db = firebase.database()             # Cliente para Realtime Database.
-
-# Admin SDK: para operaciones que requieren privilegios elevados,
-# como cambiar contraseñas directamente desde el servidor.
-if not firebase_admin._apps:
-    cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
-    firebase_admin.initialize_app(cred)
+# Todo el módulo usa solo tres objetos: 'auth' y 'db' (API de Pyrebase) y 'admin_auth'
+# (API de firebase_admin.auth). Cualquier backend que los provea es intercambiable;
+# se elige con la variable de entorno KLARITY_BACKEND ("firebase" por defecto).
+
+class _DatabasePerThread:
+    """
+    El Database de Pyrebase arma la ruta mutándose (child() la acumula y cada petición
+    la reinicia), así que compartirlo entre hilos (lecturas en segundo plano, precarga)
+    mezcla rutas. Este envoltorio da a cada hilo su propio Database.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        database = getattr(self._local, "db", None)
+        if database is None:
+            database = self._local.db = self._factory()
+        return getattr(database, name)
+
+def _firebase_backend():
+    """Firebase real: Pyrebase para el usuario + Admin SDK para operaciones privilegiadas."""
+    import pyrebase                      # Cliente Python para Firebase (Auth + Realtime DB).
+    import firebase_admin                # SDK de administrador para Firebase.
+    from firebase_admin import credentials, auth as admin_auth
+    from firebase_config import FIREBASE_CONFIG, SERVICE_ACCOUNT_KEY_PATH
+
+    firebase = pyrebase.initialize_app(FIREBASE_CONFIG)
+    # Admin SDK: para operaciones que requieren privilegios elevados,
+    # como cambiar contraseñas directamente desde el servidor.
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
+        firebase_admin.initialize_app(cred)
+    return firebase.auth(), _DatabasePerThread(firebase.database), admin_auth
+
+def _fake_backend():
+    """Base y Auth en memoria (o archivo JSON), sin red ni credenciales."""
+    import fake_firebase
+    firebase = fake_firebase.from_env()
+    return firebase.auth(), firebase.database(), firebase.admin_auth()
+
+BACKENDS = {
+    "firebase": _firebase_backend,
+    "fake": _fake_backend,
+}
+BACKEND = os.environ.get("KLARITY_BACKEND", "firebase").strip().lower() or "firebase"
+if BACKEND not in BACKENDS:
+    raise RuntimeError(f"KLARITY_BACKEND desconocido: {BACKEND!r} (opciones: {', '.join(BACKENDS)})")
+
+auth, db, admin_auth = BACKENDS[BACKEND]()   # Auth de usuario, Realtime DB y Admin SDK
+profiling.mark_once("firebase_listo")
+
+def _fail(e: Exception) -> str:
+    """
+    Mensaje de error que devuelven las funciones de este módulo. Antes anota la
+    excepción para metrics.py (clase del error y decisión de reintentar).
+    """
+    metrics.note_error(e)
+    return str(e)
 
 # -------------------------------------------------------------------------------------------
 # 3) FUNCIONES DE AUTENTICACIÓN
 # -------------------------------------------------------------------------------------------
 
+@instrumented()
 def register_user(email: str, password: str) -> Tuple[Optional[Dict], Optional[str]]:
     """
     Crea un usuario nuevo en Firebase Authentication.
@@ -60,8 +120,9 @@ def register_user(email: str, password: str) -> Tuple[Optional[Dict], Optional[s
         user = auth.create_user_with_email_and_password(email, password)
         return user, None
     except Exception as e:
-        return None, str(e)
+        return None, _fail(e)
 
+@instrumented()
 def login_user(email: str, password: str) -> Tuple[Optional[Dict], Optional[str]]:
     """
     Inicia sesión con email y password.
@@ -70,8 +131,10 @@ def login_user(email: str, password: str) -> Tuple[Optional[Dict], Optional[str]
     """
     try:
         user = auth.sign_in_with_email_and_password(email, password)
+        _start_session(user)
         return user, None
     except Exception as e:
+        metrics.note_error(e)
         msg = str(e)
         # Interceptamos errores comunes y devolvemos mensajes en español
         if "INVALID_LOGIN_CREDENTIALS" in msg or "Invalid password" in msg:
@@ -80,10 +143,218 @@ def login_user(email: str, password: str) -> Tuple[Optional[Dict], Optional[str]
             friendly = "Error al iniciar sesión. Por favor, inténtalo de nuevo."
         return None, friendly
 
+@instrumented(retries=2)
+def list_user_ids() -> Tuple[list, Optional[str]]:
+    """
+    Devuelve los uid de todos los usuarios registrados (Admin SDK, paginado).
+    Lo usan procesos sin interfaz, como batch_reports.py.
+    """
+    try:
+        return [u.uid for u in admin_auth.list_users().iterate_all()], None
+    except Exception as e:
+        return [], _fail(e)
+
+# ─── Sesión: ID token vigente y reanudación ────────────────────────────
+# El dict 'user' del login es la sesión actual: se actualiza en sitio al renovar el ID
+# token (así quien lo tenga, como DashboardWindow, ve siempre el vigente). Un hilo lo
+# renueva REFRESCO_ANTES segundos antes de expirar y _token() lo renueva al momento si
+# ya venció (p. ej. tras suspender el equipo), así ninguna petición sale con uno vencido.
+# La llamada de red (auth.refresh) va fuera de _session_lock. Si el refresh token dejó de
+# valer (revocado, contraseña cambiada, usuario deshabilitado) no se reintenta: la sesión
+# se cierra y session_lost() lo informa para que la interfaz vuelva al login.
+
+REFRESCO_ANTES = 300        # Segundos antes del vencimiento en que se renueva el ID token
+REFRESCO_REINTENTO = 60     # Espera antes de reintentar una renovación fallida
+
+_session: Dict = {}
+_session_lock = threading.RLock()
+_refresh_lock = threading.Lock()      # Una sola renovación por vencimiento en _token()
+_refresh_timer: Optional[threading.Timer] = None
+_session_lost: Optional[str] = None   # Motivo si la sesión se cerró por un token inválido
+
+# Códigos de la API REST de Firebase Auth con los que el refresh token ya no sirve
+# (revocado o vencido, usuario eliminado o deshabilitado): se olvida la sesión
+SESION_INVALIDA = {"TOKEN_EXPIRED", "INVALID_REFRESH_TOKEN", "USER_DISABLED", "USER_NOT_FOUND"}
+
+def _auth_error_code(msg: str) -> Optional[str]:
+    """
+    Código de error ("error.message") del cuerpo JSON de la API REST de Firebase Auth que
+    trae 'msg' (Pyrebase lo incluye en el texto de la excepción), o None si no lo trae.
+    """
+    inicio, fin = msg.find("{"), msg.rfind("}")
+    if inicio < 0 or fin < inicio:
+        return None
+    try:
+        codigo = json.loads(msg[inicio:fin + 1])["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    # A veces viene con detalle: "TOO_MANY_ATTEMPTS_TRY_LATER : ..."
+    return codigo.split(":")[0].strip() if isinstance(codigo, str) else None
+
+def _token_invalido(msg: str) -> bool:
+    """True si el error de auth es definitivo (ver SESION_INVALIDA)."""
+    return _auth_error_code(msg) in SESION_INVALIDA
+
+def _start_session(user: Dict) -> None:
+    """Adopta 'user' como sesión actual, guarda su refresh token y programa la renovación."""
+    global _session, _session_lost
+    with _session_lock:
+        user["expira"] = time.time() + int(user.get("expiresIn") or 3600)
+        _session = user
+        _session_lost = None
+        session_store.save({"email": user.get("email"), "localId": user["localId"],
+                            "refreshToken": user["refreshToken"]})
+    _schedule_refresh()
+
+def _schedule_refresh(delay: Optional[float] = None) -> None:
+    global _refresh_timer
+    with _session_lock:
+        if _refresh_timer is not None:
+            _refresh_timer.cancel()
+            _refresh_timer = None
+        if not _session:
+            return
+        if delay is None:
+            delay = max(_session["expira"] - time.time() - REFRESCO_ANTES, 0)
+        _refresh_timer = threading.Timer(delay, _refresh_tick)
+        _refresh_timer.daemon = True
+        _refresh_timer.start()
+
+def _refresh_tick() -> None:
+    _, err = refresh_session()
+    if err and _session:
+        _schedule_refresh(REFRESCO_REINTENTO)
+
+def _token() -> Optional[str]:
+    """ID token vigente de la sesión (renovándolo si ya venció), o None si no hay sesión."""
+    user = _session
+    if not user:
+        return None
+    if time.time() >= user.get("expira", 0) - 30:
+        with _refresh_lock:
+            # Otro hilo pudo renovarlo (o cerrar la sesión) mientras se esperaba
+            if user is _session and time.time() >= user.get("expira", 0) - 30:
+                refresh_session()
+    return _session.get("idToken")
+
+def _adopt_tokens(user: Dict, nuevo: Dict) -> bool:
+    """Copia los tokens de 'nuevo' en 'user' si sigue siendo la sesión actual, y los guarda."""
+    with _session_lock:
+        if user is not _session:
+            return False            # Se cerró sesión (o se inició otra) durante la llamada
+        user.update(idToken=nuevo["idToken"], refreshToken=nuevo["refreshToken"],
+                    expira=time.time() + int(nuevo.get("expiresIn") or 3600))
+        session_store.save({"email": user.get("email"), "localId": user["localId"],
+                            "refreshToken": user["refreshToken"]})
+    _schedule_refresh()
+    _reopen_watches()               # Los streams abiertos con el token anterior vencerán
+    return True
+
+def _lose_session(user: Dict, msg: str) -> None:
+    """Cierra la sesión 'user' (si sigue siendo la actual) porque su refresh token ya no vale."""
+    global _session_lost
+    with _session_lock:
+        if user is not _session:
+            return
+        end_session()
+        _session_lost = msg
+    print(f"[firebase] Sesión cerrada: {msg}")
+
+def session_lost() -> Optional[str]:
+    """
+    Motivo por el que se cerró la sesión sin que el usuario saliera (token revocado,
+    contraseña cambiada en otro lugar...), o None. Lo consulta DashboardWindow.
+    """
+    return _session_lost
+
+@instrumented(retries=2)
+def refresh_session() -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Renueva el ID token de la sesión actual con su refresh token (auth.refresh).
+    Retorna (user_dict, None) si OK, o (None, error_msg) si falla.
+    """
+    with _session_lock:
+        user = _session
+        if not user:
+            return None, "No hay sesión iniciada."
+        refresh_token = user["refreshToken"]
+    try:
+        nuevo = auth.refresh(refresh_token)
+    except Exception as e:
+        msg = _fail(e)
+        if _token_invalido(msg):
+            _lose_session(user, msg)
+        return None, msg
+    if not _adopt_tokens(user, nuevo):
+        return None, "No hay sesión iniciada."
+    return user, None
+
+@instrumented()
+def renew_session(email: str, password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Vuelve a autenticar la sesión actual con 'password', sin cambiar su dict. Se usa tras
+    cambiar la contraseña, que revoca los refresh tokens emitidos hasta entonces.
+    Retorna (True, None) si OK, o (False, error_msg) si falla.
+    """
+    user = _session
+    if not user:
+        return False, "No hay sesión iniciada."
+    try:
+        nuevo = auth.sign_in_with_email_and_password(email, password)
+    except Exception as e:
+        return False, _fail(e)
+    if not _adopt_tokens(user, nuevo):
+        return False, "No hay sesión iniciada."
+    return True, None
+
+@instrumented()
+def resume_session() -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Reanuda la última sesión guardada sin pedir contraseña: canjea su refresh token por
+    un ID token nuevo. Retorna (user_dict, None), o (None, motivo) si no hay sesión
+    guardada o no se pudo renovar (si el token ya no es válido, se olvida).
+    """
+    guardada = session_store.load()
+    if not guardada:
+        return None, "No hay sesión guardada."
+    try:
+        nuevo = auth.refresh(guardada["refreshToken"])
+    except Exception as e:
+        msg = _fail(e)
+        if _token_invalido(msg):
+            session_store.clear()
+        return None, msg
+    user = {"localId": nuevo.get("userId") or guardada["localId"],
+            "email": guardada.get("email") or "", "idToken": nuevo["idToken"],
+            "refreshToken": nuevo["refreshToken"], "expiresIn": "3600"}
+    _start_session(user)
+    return user, None
+
+def resume_session_async() -> Future:
+    """
+    resume_session() en un hilo aparte (p. ej. mientras se anima el splash). Si la
+    sesión se reanuda, lanza también la precarga. El Future entrega el user_dict o None.
+    """
+    def trabajo():
+        user, _ = resume_session()
+        if user:
+            prefetch(user["localId"])
+        return user
+    return _prefetch_pool.submit(contextvars.copy_context().run, trabajo)
+
+def end_session() -> None:
+    """Cierra la sesión: deja de renovar el token y olvida el refresh token guardado."""
+    global _session
+    with _session_lock:
+        _session = {}
+    _schedule_refresh()
+    session_store.clear()
+
 # -------------------------------------------------------------------------------------------
 # 4) FUNCIONES DE PERFIL
 # -------------------------------------------------------------------------------------------
 
+@instrumented(payload_arg=1)
 def create_or_update_profile(uid: str, data: dict) -> Tuple[bool, Optional[str]]:
     """
     Guarda o actualiza los datos del perfil de usuario en Realtime DB.
@@ -92,156 +363,488 @@ def create_or_update_profile(uid: str, data: dict) -> Tuple[bool, Optional[str]]
     Retorna (True, None) si OK, o (False, error_msg) si falla.
     """
     try:
-        db.child("usuarios").child(uid).update(data)
+        db.child("usuarios").child(uid).update(data, _token())
         return True, None
     except Exception as e:
-        return False, str(e)
+        return False, _fail(e)
 
+@instrumented(retries=2)
 def get_profile(uid: str) -> Tuple[Dict, Optional[str]]:
     """
     Recupera el perfil completo de un usuario.
     - Retorna ({...campos...}, None) si OK, o ({}, error_msg) si falla.
     """
+    pre = _prefetched("perfil", uid)
+    if pre is not None:
+        return pre
     try:
-        snap = db.child("usuarios").child(uid).get()
+        snap = db.child("usuarios").child(uid).get(_token())
         return snap.val() or {}, None
     except Exception as e:
-        return {}, str(e)
+        return {}, _fail(e)
 
 # -------------------------------------------------------------------------------------------
 # 5) CRUD DE CATEGORÍAS
 # -------------------------------------------------------------------------------------------
 
+@instrumented(payload_arg=1)
 def add_category(uid: str, data: dict) -> Tuple[Optional[str], Optional[str]]:
     """
     Agrega una nueva categoría (por ejemplo, "Alimentos", tipo "Gasto").
     Retorna (new_key, None) si OK, o (None, error_msg) si falla.
     """
     try:
-        key = db.child("categorias").child(uid).push(data)["name"]
+        key = db.child("categorias").child(uid).push(data, _token())["name"]
+        invalidate_categories(uid)
         return key, None
     except Exception as e:
-        return None, str(e)
+        return None, _fail(e)
 
+@instrumented(retries=2)
 def get_categories(uid: str) -> Tuple[Dict, Optional[str]]:
     """
     Obtiene todas las categorías de un usuario, en formato {key: datos}.
     """
     try:
-        snap = db.child("categorias").child(uid).get()
+        snap = db.child("categorias").child(uid).get(_token())
         return snap.val() or {}, None
     except Exception as e:
-        return {}, str(e)
+        return {}, _fail(e)
 
+@instrumented(payload_arg=2)
 def update_category(uid: str, key: str, updates: dict) -> Tuple[bool, Optional[str]]:
     """
     Actualiza una categoría específica (por ejemplo, renombrar).
     """
     try:
-        db.child("categorias").child(uid).child(key).update(updates)
+        db.child("categorias").child(uid).child(key).update(updates, _token())
+        invalidate_categories(uid)
         return True, None
     except Exception as e:
-        return False, str(e)
+        return False, _fail(e)
 
+@instrumented()
 def delete_category(uid: str, key: str) -> Tuple[bool, Optional[str]]:
     """
     Elimina una categoría por su key.
     """
     try:
-        db.child("categorias").child(uid).child(key).remove()
+        db.child("categorias").child(uid).child(key).remove(_token())
+        invalidate_categories(uid)
         return True, None
     except Exception as e:
-        return False, str(e)
+        return False, _fail(e)
+
+# ─── Caché de categorías ───────────────────────────────────────────────
+# Las vistas consultan un CategoryIndex en memoria; solo se vuelve a Firebase
+# cuando add/update/delete_category (o una notificación de cambio) lo invalidan.
+
+class CategoryIndex:
+    """
+    Índices en memoria sobre las categorías de un usuario:
+    - by_key:  {key: {"nombre":..., "tipo":...}}
+    - by_name: {nombre: key}
+    - by_tipo: {"Ingreso"/"Gasto": [key, ...]}
+    """
+
+    def __init__(self, cats: Dict):
+        self.by_key: Dict[str, Dict] = dict(cats or {})
+        self.by_name: Dict[str, str] = {}
+        self.by_tipo: Dict[str, list] = {}
+        for key, cat in self.by_key.items():
+            self.by_name[cat.get("nombre", "")] = key
+            self.by_tipo.setdefault(cat.get("tipo", ""), []).append(key)
+
+    def names(self, tipo: Optional[str] = None) -> list:
+        """Nombres de categorías (opcionalmente solo de un tipo)."""
+        keys = self.by_key if tipo is None else self.by_tipo.get(tipo, [])
+        return [self.by_key[k]["nombre"] for k in keys]
+
+    def tipo_of(self, nombre: str) -> Optional[str]:
+        """Tipo ("Ingreso"/"Gasto") de la categoría con ese nombre, o None."""
+        key = self.by_name.get(nombre)
+        return self.by_key[key].get("tipo") if key else None
+
+
+_cat_cache: Dict[str, CategoryIndex] = {}
+
+def get_category_index(uid: str) -> Tuple[CategoryIndex, Optional[str]]:
+    """
+    Devuelve el índice de categorías de 'uid', leyendo Firebase solo si no
+    está en caché. Si la lectura falla, retorna un índice vacío (sin cachear).
+    """
+    # Primero la precarga: mientras crea las categorías por defecto, la caché puede
+    # tener un índice vacío transitorio
+    pre = _prefetched("categorias", uid)
+    if pre is not None:
+        return pre
+    idx = _cat_cache.get(uid)
+    if idx is not None:
+        return idx, None
+    cats, err = get_categories(uid)
+    if err:
+        return CategoryIndex({}), err
+    idx = _cat_cache[uid] = CategoryIndex(cats)
+    return idx, None
+
+def invalidate_categories(uid: str) -> None:
+    """Descarta la caché de categorías de 'uid' (la próxima consulta relee Firebase)."""
+    _cat_cache.pop(uid, None)
+
+class _Watch:
+    """
+    Stream de Realtime DB que se reabre con el ID token nuevo cada vez que se renueva:
+    RTDB revoca el stream cuando vence el token con que se abrió (~1 h).
+    """
+
+    def __init__(self, parts: Tuple[str, ...], handler):
+        self._parts = parts
+        self._handler = handler
+        self._lock = threading.Lock()
+        self._stream = None
+        self._closed = False
+        self.reopen()
+        _watches.add(self)
+
+    def reopen(self) -> None:
+        """Cierra el stream actual y abre otro con el token vigente (reenvía el estado)."""
+        with self._lock:
+            if self._closed:
+                return
+            viejo, self._stream = self._stream, None
+            if viejo is not None:
+                try:
+                    viejo.close()
+                except Exception:
+                    pass
+            ref = db
+            for parte in self._parts:
+                ref = ref.child(parte)
+            self._stream = ref.stream(self._handler, _token())
+
+    def close(self) -> None:
+        _watches.discard(self)
+        with self._lock:
+            self._closed = True
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+
+_watches: set = set()
+
+def _reopen_watches() -> None:
+    """Reabre los streams abiertos tras renovar el ID token (ver _adopt_tokens)."""
+    for w in list(_watches):
+        try:
+            w.reopen()
+        except Exception as e:
+            metrics.note_error(e)
+            print(f"[firebase] No se pudo reabrir un stream: {e}")
+
+def watch_categories(uid: str):
+    """
+    Se suscribe a cambios de /categorias/{uid} (por ejemplo, desde otro equipo)
+    e invalida la caché en cada notificación. El stream se reabre solo al renovarse
+    el ID token. Retorna la suscripción (para .close()) o None si no se pudo abrir.
+    """
+    try:
+        return _Watch(("categorias", uid), lambda _msg: invalidate_categories(uid))
+    except Exception:
+        return None
 
 # -------------------------------------------------------------------------------------------
 # 6) CRUD DE TRANSACCIONES
 # -------------------------------------------------------------------------------------------
 
+# Versión local de los datos de cada usuario. Cambia cuando se escribe una transacción
+# o cuando una lectura trae algo distinto a la anterior; las vistas la usan como parte
+# de las claves de caché (p. ej. gráficos ya renderizados).
+_tx_versions: Dict[str, int] = {}
+_tx_snapshots: Dict[str, Dict] = {}
+
+def transactions_version(uid: str) -> int:
+    """
+    Devuelve la versión actual de las transacciones de 'uid' (0 si nunca se leyeron).
+    """
+    return _tx_versions.get(uid, 0)
+
+def _bump_transactions(uid: str, changes: Optional[Dict[str, Optional[Dict]]] = None) -> None:
+    """
+    Marca las transacciones de 'uid' como modificadas.
+    'changes' ({key: valor}, con valor None para borrados) ajusta el snapshot local
+    a las escrituras hechas, así la siguiente lectura no cuenta como un cambio nuevo.
+    """
+    _tx_versions[uid] = _tx_versions.get(uid, 0) + 1
+    _discard_prefetch("transacciones", uid)   # Una precarga pendiente ya no es la última
+    snap = _tx_snapshots.get(uid)
+    if changes and snap is not None:
+        snap = dict(snap)   # Copia: no alteramos dicts ya entregados a las vistas
+        for key, value in changes.items():
+            if value is None:
+                snap.pop(key, None)
+            else:
+                snap[key] = value
+        _tx_snapshots[uid] = snap
+
+@instrumented(payload_arg=1)
 def add_transaction(uid: str, data: dict) -> Tuple[Optional[str], Optional[str]]:
     """
     Inserta una nueva transacción (ej. 2025-07-13, monto 15000, tipo "Gasto").
     Retorna (trans_key, None) o (None, error_msg).
     """
     try:
-        key = db.child("transacciones").child(uid).push(data)["name"]
+        key = db.child("transacciones").child(uid).push(data, _token())["name"]
+        _bump_transactions(uid, {key: data})
         return key, None
     except Exception as e:
-        return None, str(e)
+        return None, _fail(e)
 
+@instrumented(retries=2)
 def get_transactions(uid: str) -> Tuple[Dict, Optional[str]]:
     """
     Recupera todas las transacciones de un usuario.
     """
+    pre = _prefetched("transacciones", uid)
+    if pre is not None:
+        return pre
     try:
-        snap = db.child("transacciones").child(uid).get()
-        return snap.val() or {}, None
+        snap = db.child("transacciones").child(uid).get(_token())
+        data = snap.val() or {}
+        if data != _tx_snapshots.get(uid):
+            _tx_snapshots[uid] = data
+            _bump_transactions(uid)
+        return data, None
     except Exception as e:
-        return {}, str(e)
+        return {}, _fail(e)
 
+@instrumented(retries=2)
 def get_single_transaction(uid: str, key: str) -> Tuple[Optional[Dict], Optional[str]]:
     """
     Recupera una única transacción por su key.
     """
     try:
-        snap = db.child("transacciones").child(uid).child(key).get()
+        snap = db.child("transacciones").child(uid).child(key).get(_token())
         return snap.val() or None, None
     except Exception as e:
-        return None, str(e)
+        return None, _fail(e)
 
+@instrumented(payload_arg=2)
 def update_transaction(uid: str, key: str, updates: dict) -> Tuple[bool, Optional[str]]:
     """
     Modifica campos de una transacción existente.
     """
     try:
-        db.child("transacciones").child(uid).child(key).update(updates)
+        db.child("transacciones").child(uid).child(key).update(updates, _token())
+        previo = _tx_snapshots.get(uid, {}).get(key, {})
+        _bump_transactions(uid, {key: {**previo, **updates}})
         return True, None
     except Exception as e:
-        return False, str(e)
+        return False, _fail(e)
 
+@instrumented()
 def delete_transaction(uid: str, key: str) -> Tuple[bool, Optional[str]]:
     """
     Elimina una transacción por su key.
     """
     try:
-        db.child("transacciones").child(uid).child(key).remove()
+        db.child("transacciones").child(uid).child(key).remove(_token())
+        _bump_transactions(uid, {key: None})
         return True, None
     except Exception as e:
-        return False, str(e)
+        return False, _fail(e)
+
+@instrumented(payload_arg=1)
+def bulk_add_transactions(uid: str, records) -> Tuple[Dict[str, Dict], Optional[str]]:
+    """
+    Inserta varias transacciones en una sola escritura multi-ruta.
+    Las keys se generan localmente (mismo formato que push()), así no hace falta
+    una petición por registro. Retorna ({key: registro}, None) o ({}, error_msg).
+    """
+    nuevos = {db.generate_key(): rec for rec in records}
+    if not nuevos:
+        return {}, None
+    try:
+        db.child("transacciones").child(uid).update(nuevos, _token())
+        _bump_transactions(uid, nuevos)
+        return nuevos, None
+    except Exception as e:
+        return {}, _fail(e)
+
+@instrumented(payload_arg=1)
+def bulk_update_transactions(uid: str,
+                             updates: Dict[str, dict]) -> Tuple[Dict[str, Dict], Optional[str]]:
+    """
+    Modifica varias transacciones en una sola escritura multi-ruta:
+    updates = {key: {"categoria": "Ocio"}, ...}.
+    Retorna ({key: registro_resultante}, None) o ({}, error_msg).
+    """
+    if not updates:
+        return {}, None
+    try:
+        paths = {f"{key}/{campo}": valor
+                 for key, campos in updates.items()
+                 for campo, valor in campos.items()}
+        db.child("transacciones").child(uid).update(paths, _token())
+        snap = _tx_snapshots.get(uid, {})
+        nuevos = {key: {**snap.get(key, {}), **campos} for key, campos in updates.items()}
+        _bump_transactions(uid, nuevos)
+        return nuevos, None
+    except Exception as e:
+        return {}, _fail(e)
+
+@instrumented(payload_arg=1)
+def bulk_delete_transactions(uid: str, keys) -> Tuple[bool, Optional[str]]:
+    """
+    Elimina varias transacciones en una sola escritura multi-ruta
+    (cada key se actualiza a None, que Firebase interpreta como borrado).
+    """
+    keys = list(keys)
+    if not keys:
+        return True, None
+    try:
+        db.child("transacciones").child(uid).update({key: None for key in keys}, _token())
+        _bump_transactions(uid, {key: None for key in keys})
+        return True, None
+    except Exception as e:
+        return False, _fail(e)
 
 # -------------------------------------------------------------------------------------------
 # 7) SUGERENCIAS DE IA (historial)
 # -------------------------------------------------------------------------------------------
 
-def save_ai_suggestion(uid: str, text: str) -> None:
+# Cada sugerencia se guarda en dos lugares, en una sola escritura multi-ruta:
+#   /ai_sugerencias/{uid}/{ts}      {"texto", "ts"}            el cuerpo completo
+#   /ai_sugerencias_idx/{uid}/{ts}  {"ts", "titulo", "largo"}  cabecera para el historial
+# El historial lista cabeceras por páginas (limitToLast) y solo baja el cuerpo de la
+# sugerencia que se abre (con caché en memoria). Las sugerencias de antes del índice
+# se indexan una vez por sesión (ver _index_legacy_suggestions).
+
+PAGINA_SUGERENCIAS = 50     # Cabeceras por página del historial
+TITULO_MAX = 120            # Caracteres del título (primer renglón) en la cabecera
+
+_ai_bodies: Dict[Tuple[str, str], str] = {}   # (uid, ts) -> texto ya descargado
+_ai_indexed: set = set()                      # uids cuyo historial antiguo ya se indexó
+
+def suggestion_header(ts: int, text: str) -> Dict:
+    """Cabecera de una sugerencia: timestamp, primer renglón (recortado) y largo."""
+    titulo = text.strip().split("\n", 1)[0].strip()
+    if len(titulo) > TITULO_MAX:
+        titulo = titulo[:TITULO_MAX - 1] + "…"
+    return {"ts": ts, "titulo": titulo, "largo": len(text)}
+
+@instrumented(payload_arg=1)
+def save_ai_suggestion(uid: str, text: str) -> Dict:
     """
-    Guarda el texto generado por Gemini en /ai_sugerencias/{uid}/{timestamp}.
-    Esto permite llevar un historial de todas las recomendaciones.
+    Guarda el texto generado por Gemini en /ai_sugerencias/{uid}/{timestamp} y su
+    cabecera en /ai_sugerencias_idx/{uid}/{timestamp}. Esto permite llevar un historial
+    de todas las recomendaciones. Retorna la cabecera (para agregarla al historial).
     """
     ts = int(time.time())  # timestamp en segundos
-    db.child("ai_sugerencias").child(uid).child(str(ts)).set({
-        "texto": text,
-        "ts": ts
-    })
-
+    _discard_prefetch("sugerencias", uid)
+    cabecera = suggestion_header(ts, text)
+    db.update({
+        f"ai_sugerencias/{uid}/{ts}": {"texto": text, "ts": ts},
+        f"ai_sugerencias_idx/{uid}/{ts}": cabecera,
+    }, _token())
+    _ai_bodies[(uid, str(ts))] = text
+    return cabecera
+
+@instrumented(retries=2)
 def get_ai_suggestions(uid: str) -> Tuple[Dict, Optional[str]]:
     """
-    Recupera todas las sugerencias guardadas del usuario.
+    Recupera todas las sugerencias guardadas del usuario (cuerpos completos).
+    Para el historial, usar get_ai_suggestion_headers + get_ai_suggestion.
     """
     try:
-        snap = db.child("ai_sugerencias").child(uid).get()
+        snap = db.child("ai_sugerencias").child(uid).get(_token())
         return snap.val() or {}, None
     except Exception as e:
-        return {}, str(e)
+        return {}, _fail(e)
+
+def _index_legacy_suggestions(uid: str) -> None:
+    """
+    Crea las cabeceras que falten (sugerencias guardadas antes de existir el índice).
+    Compara solo las keys de ambos nodos (consultas 'shallow'); baja los cuerpos
+    únicamente si hay algo que indexar. Se hace una vez por usuario y sesión.
+    """
+    if uid in _ai_indexed:
+        return
+    cuerpos = db.child("ai_sugerencias").child(uid).shallow().get(_token()).val() or {}
+    indice = db.child("ai_sugerencias_idx").child(uid).shallow().get(_token()).val() or {}
+    faltan = set(cuerpos) - set(indice)
+    if faltan:
+        todas = db.child("ai_sugerencias").child(uid).get(_token()).val() or {}
+        nuevas = {}
+        for ts in faltan:
+            texto = (todas.get(ts) or {}).get("texto", "")
+            try:
+                nuevas[ts] = suggestion_header(int(ts), texto)
+            except ValueError:          # Key que no es un timestamp: se muestra tal cual
+                nuevas[ts] = {"ts": ts, "titulo": texto.split("\n", 1)[0][:TITULO_MAX],
+                              "largo": len(texto)}
+            _ai_bodies[(uid, ts)] = texto
+        db.child("ai_sugerencias_idx").child(uid).update(nuevas, _token())
+    _ai_indexed.add(uid)
+
+@instrumented(retries=2)
+def get_ai_suggestion_headers(uid: str, antes: Optional[str] = None,
+                              limite: int = PAGINA_SUGERENCIAS) -> Tuple[Dict, Optional[str]]:
+    """
+    Página del historial: hasta 'limite' cabeceras {ts: {"ts", "titulo", "largo"}}, de
+    la más reciente a la más antigua. 'antes' (un ts ya mostrado) pide la página
+    siguiente, con las anteriores a él.
+    """
+    if antes is None and limite == PAGINA_SUGERENCIAS:
+        pre = _prefetched("sugerencias", uid)
+        if pre is not None:
+            return pre
+    try:
+        _index_legacy_suggestions(uid)
+        consulta = db.child("ai_sugerencias_idx").child(uid).order_by_key()
+        if antes is not None:
+            # limitToLast(n + 1) hasta 'antes' inclusive; luego se descarta 'antes'
+            consulta = consulta.end_at(str(antes)).limit_to_last(limite + 1)
+        else:
+            consulta = consulta.limit_to_last(limite)
+        pagina = consulta.get(_token()).val() or {}
+        cabeceras = {str(ts): cab for ts, cab in pagina.items() if str(ts) != str(antes)}
+        return dict(sorted(cabeceras.items(), reverse=True)), None
+    except Exception as e:
+        return {}, _fail(e)
+
+@instrumented(retries=2)
+def get_ai_suggestion(uid: str, ts) -> Tuple[str, Optional[str]]:
+    """
+    Texto completo de una sugerencia. Se descarga solo la primera vez; después sale
+    de la caché en memoria.
+    """
+    clave = (uid, str(ts))
+    if clave in _ai_bodies:
+        return _ai_bodies[clave], None
+    try:
+        rec = db.child("ai_sugerencias").child(uid).child(str(ts)).get(_token()).val() or {}
+        texto = rec.get("texto", "")
+        _ai_bodies[clave] = texto
+        return texto, None
+    except Exception as e:
+        return "", _fail(e)
 
+@instrumented()
 def delete_ai_suggestion(uid: str, ts: int) -> Tuple[bool, Optional[str]]:
     """
-    Elimina una sugerencia específica usando su timestamp (clave).
+    Elimina una sugerencia específica (cuerpo y cabecera) usando su timestamp (clave).
     """
+    _discard_prefetch("sugerencias", uid)
     try:
-        db.child("ai_sugerencias").child(uid).child(str(ts)).remove()
+        db.update({
+            f"ai_sugerencias/{uid}/{ts}": None,
+            f"ai_sugerencias_idx/{uid}/{ts}": None,
+        }, _token())
+        _ai_bodies.pop((uid, str(ts)), None)
         return True, None
     except Exception as e:
-        return False, str(e)
+        return False, _fail(e)
 
 # -------------------------------------------------------------------------------------------
 # 8) CATEGORÍAS POR DEFECTO AL REGISTRAR USUARIO
@@ -253,16 +856,22 @@ def ensure_default_categories(uid: str) -> None:
     Revisa si el usuario ya tiene categorías; si no, crea las definidas en DEFAULT_CATEGORIES.
     Esto se llama al hacer login por primera vez tras un registro.
     """
-    cats, _ = get_categories(uid)
-    if cats:
+    idx, err = get_category_index(uid)
+    if idx.by_key or err:
         return
-    for cat in DEFAULT_CATEGORIES:
-        add_category(uid, cat)
+    # Una sola escritura multi-ruta (keys generadas localmente) en vez de un push por categoría
+    nuevas = {db.generate_key(): dict(cat) for cat in DEFAULT_CATEGORIES}
+    try:
+        db.child("categorias").child(uid).update(nuevas, _token())
+    except Exception as e:
+        _fail(e)
+    invalidate_categories(uid)
 
 # -------------------------------------------------------------------------------------------
 # 9) CAMBIO DE CONTRASEÑA SEGURO
 # -------------------------------------------------------------------------------------------
 
+@instrumented()
 def reauthenticate_user(email: str, password: str) -> Tuple[bool, Optional[str]]:
     """
     Antes de cambiar la contraseña, reautentica con la contraseña actual.
@@ -272,11 +881,13 @@ def reauthenticate_user(email: str, password: str) -> Tuple[bool, Optional[str]]
         auth.sign_in_with_email_and_password(email, password)
         return True, None
     except Exception as e:
+        metrics.note_error(e)
         msg = str(e)
         if "INVALID_LOGIN_CREDENTIALS" in msg or "Invalid password" in msg:
             return False, "Contraseña actual incorrecta."
         return False, "Error de autenticación."
 
+@instrumented()
 def update_password(user_or_uid, new_password: str) -> Tuple[bool, Optional[str]]:
     """
     Cambia la contraseña del usuario utilizando Firebase Admin SDK.
@@ -289,4 +900,79 @@ def update_password(user_or_uid, new_password: str) -> Tuple[bool, Optional[str]
         admin_auth.update_user(uid, password=new_password)
         return True, None
     except Exception as e:
-        return False, str(e)
+        return False, _fail(e)
+
+# -------------------------------------------------------------------------------------------
+# 10) PRECARGA AL INICIAR SESIÓN
+# -------------------------------------------------------------------------------------------
+# Tras el login, prefetch(uid) lanza a la vez (un hilo por lectura) perfil, categorías
+# (creando las por defecto si faltan), transacciones y la primera página del historial
+# de IA (solo cabeceras). Las funciones de lectura de arriba toman su resultado la primera
+# vez que se llaman (esperándolo si aún está en camino), así el Dashboard abre en ~1
+# viaje de red en lugar de 5 o 6.
+# Una precarga no usada en PRECARGA_VIGENCIA segundos, o invalidada por una escritura,
+# se descarta y la lectura vuelve a Firebase.
+
+PRECARGA_VIGENCIA = 60.0    # Segundos durante los que se usa un resultado precargado
+PRECARGA_ESPERA = 30.0      # Máximo que una vista espera una precarga en curso
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="klarity-precarga")
+_prefetch_lock = threading.Lock()
+_prefetches: Dict[Tuple[str, str], Tuple[float, Future]] = {}
+_prefetch_local = threading.local()   # Marca los hilos de precarga (no consumen precargas)
+
+def _run_prefetch(fn, *args):
+    _prefetch_local.activo = True
+    try:
+        return fn(*args)
+    finally:
+        _prefetch_local.activo = False
+
+def _prefetched(kind: str, uid: str):
+    """
+    Resultado precargado de 'kind' para 'uid' (se entrega una sola vez), esperándolo si
+    aún está en curso. None si no hay precarga vigente o si falló.
+    """
+    if getattr(_prefetch_local, "activo", False):
+        return None
+    with _prefetch_lock:
+        inicio, fut = _prefetches.pop((kind, uid), (0.0, None))
+    if fut is None or time.monotonic() - inicio > PRECARGA_VIGENCIA:
+        return None
+    try:
+        res = fut.result(timeout=PRECARGA_ESPERA)
+    except Exception:
+        return None
+    if isinstance(res, tuple) and res[1]:
+        return None     # Falló: quien llama reintenta con su propia lectura
+    return res
+
+def _discard_prefetch(kind: str, uid: str) -> None:
+    """Olvida la precarga de 'kind' (p. ej. tras una escritura que la deja vieja)."""
+    if getattr(_prefetch_local, "activo", False):
+        return
+    with _prefetch_lock:
+        _prefetches.pop((kind, uid), None)
+
+def _prefetch_categories(uid: str) -> Tuple[CategoryIndex, Optional[str]]:
+    ensure_default_categories(uid)
+    return get_category_index(uid)
+
+def prefetch(uid: str) -> None:
+    """
+    Lanza en paralelo las lecturas que hacen las vistas al abrir el Dashboard. No
+    bloquea: cada lectura posterior de lo mismo toma el resultado (ver _prefetched).
+    """
+    tareas = {
+        "perfil": (get_profile, uid),
+        "categorias": (_prefetch_categories, uid),
+        "transacciones": (get_transactions, uid),
+        "sugerencias": (get_ai_suggestion_headers, uid),
+    }
+    inicio = time.monotonic()
+    with _prefetch_lock:
+        for kind, (fn, *args) in tareas.items():
+            ctx = contextvars.copy_context()    # Los spans de tracing siguen al hilo
+            fut = _prefetch_pool.submit(ctx.run, _run_prefetch, fn, *args)
+            _prefetches[(kind, uid)] = (inicio, fut)
+
@@ -0,0 +1,90 @@
+# ===========================================================================================
+# image_cache.py
+# -------------------------------------------------------------------------------------------
+# Caché de imágenes de la interfaz (logo y foto de perfil):
+# - Cada imagen se decodifica y redimensiona una sola vez por (ruta, mtime, tamaño, máscara).
+# - Los PhotoImage listos se guardan en memoria y se reutilizan entre ventanas.
+# - Las miniaturas derivadas se guardan como PNG en la caché local, de modo que
+#   sobreviven a reinicios y no hay que volver a abrir una foto de varios megas.
+# ===========================================================================================
+
+import os
+import hashlib
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageTk, ImageDraw
+
+from utils import cache_dir
+
+# Máscaras soportadas: None (imagen tal cual) o "circle" (avatar circular).
+MASK_CIRCLE = "circle"
+
+# (ruta absoluta, mtime_ns, (ancho, alto), máscara) -> PhotoImage listo para Tk
+_photos: Dict[Tuple, ImageTk.PhotoImage] = {}
+
+
+def _key(path: str, size: Tuple[int, int], mask: Optional[str]) -> Tuple:
+    """
+    Construye la clave de caché. os.stat lanza FileNotFoundError si la
+    ruta no existe, igual que lo haría Image.open.
+    """
+    full = os.path.abspath(path)
+    mtime = os.stat(full).st_mtime_ns
+    return (full, mtime, tuple(size), mask)
+
+
+def _thumb_path(key: Tuple) -> str:
+    """Ruta del PNG en disco que corresponde a una clave de caché."""
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir("img"), f"{digest}.png")
+
+
+def _render(path: str, size: Tuple[int, int], mask: Optional[str]) -> Image.Image:
+    """
+    Decodifica la imagen original, la redimensiona (LANCZOS) y aplica la máscara.
+    Para JPEG, draft() permite que el decodificador reduzca la imagen al vuelo,
+    lo que evita decodificar a resolución completa las fotos de cámara.
+    """
+    img = Image.open(path)
+    img.draft("RGB", size)
+    img = img.convert("RGBA").resize(size, Image.Resampling.LANCZOS)
+    if mask == MASK_CIRCLE:
+        alpha = Image.new("L", size, 0)
+        ImageDraw.Draw(alpha).ellipse((0, 0, size[0], size[1]), fill=255)
+        img.putalpha(alpha)
+    return img
+
+
+def get_photo(path: str,
+              size: Tuple[int, int],
+              mask: Optional[str] = None) -> ImageTk.PhotoImage:
+    """
+    Devuelve un PhotoImage de 'path' redimensionado a 'size' (y con máscara opcional).
+    - Primero busca en memoria; luego en la caché en disco; por último decodifica
+      el archivo original y guarda la miniatura para próximas ejecuciones.
+    - Lanza la misma excepción que Image.open si el archivo no existe o no es válido.
+    """
+    key = _key(path, size, mask)
+    photo = _photos.get(key)
+    if photo is not None:
+        return photo
+
+    thumb = _thumb_path(key)
+    img = None
+    if os.path.exists(thumb):
+        try:
+            img = Image.open(thumb)
+            img.load()
+        except Exception:
+            img = None  # Miniatura corrupta: la regeneramos
+
+    if img is None:
+        img = _render(path, tuple(size), mask)
+        try:
+            img.save(thumb, "PNG")
+        except OSError:
+            pass  # Sin permisos de escritura: seguimos solo con la caché en memoria
+
+    photo = ImageTk.PhotoImage(img)
+    _photos[key] = photo
+    return photo
@@ -0,0 +1,458 @@
+# ===========================================================================================
+# importer.py
+# -------------------------------------------------------------------------------------------
+# Importación de extractos bancarios (CSV u OFX) como transacciones:
+# - Los archivos se leen fila a fila con generadores (lectura → normalización →
+#   categorización → deduplicado → bloques), así la memoria no crece con el archivo.
+# - Las fechas se convierten al timestamp 'fecha' que usa la app (medianoche local).
+# - Las columnas del CSV se detectan por su nombre (fecha, descripción, monto...)
+#   y pueden ajustarse a mano.
+# - Las categorías se asignan con el historial del usuario (autocomplete.py).
+# - Se descartan duplicados por hash de (fecha, monto, descripción), tanto contra
+#   las transacciones existentes como dentro del mismo archivo.
+# - Los registros se escriben por bloques con una función externa (p. ej.
+#   firebase_service.bulk_add_transactions), de modo que este módulo no depende de Tk.
+# ===========================================================================================
+
+import codecs
+import csv
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from search_index import normalize
+
+# Campos de la app y nombres de columna con que suelen venir en los extractos
+# (comparados ya normalizados: sin tildes y en minúsculas).
+COLUMN_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "fecha":       ("fecha", "date", "fecha operacion", "fecha movimiento",
+                    "fecha transaccion", "dia", "posted date", "transaction date"),
+    "descripcion": ("descripcion", "description", "concepto", "detalle",
+                    "referencia", "memo", "name", "nombre", "payee"),
+    "monto":       ("monto", "amount", "valor", "importe", "cantidad", "total"),
+    "debito":      ("debito", "debit", "cargo", "retiro", "salida"),
+    "credito":     ("credito", "credit", "abono", "deposito", "entrada"),
+    "tipo":        ("tipo", "type", "naturaleza"),
+    "categoria":   ("categoria", "category"),
+}
+
+# Formatos de fecha aceptados en CSV (día antes que mes, como en Colombia)
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d",
+                "%d/%m/%y", "%d.%m.%Y", "%Y%m%d", "%Y-%m-%d %H:%M:%S",
+                "%d/%m/%Y %H:%M:%S")
+
+SIN_CATEGORIA = "—"
+
+
+@dataclass
+class ImportResult:
+    """Resumen de una importación."""
+    leidas: int = 0         # Filas leídas del archivo
+    importadas: int = 0     # Registros escritos
+    duplicadas: int = 0     # Descartadas por ya existir
+    invalidas: int = 0      # Sin fecha o monto interpretables
+    error: Optional[str] = None
+    nuevos: Dict[str, Dict] = field(default_factory=dict)   # {key: registro} escritos
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Lectura (generadores)
+# -------------------------------------------------------------------------------------------
+
+class _Progress:
+    """Cuenta los caracteres leídos para estimar el avance sobre el tamaño del archivo."""
+
+    def __init__(self, path: str):
+        self.total = max(os.path.getsize(path), 1)
+        self.leido = 0
+
+    @property
+    def fraction(self) -> float:
+        return min(self.leido / self.total, 1.0)
+
+
+def _lines(f, progress: Optional[_Progress]) -> Iterator[str]:
+    for line in f:
+        if progress is not None:
+            progress.leido += len(line)
+        yield line
+
+
+def csv_encoding(path: str) -> str:
+    """
+    Codificación de un CSV: UTF-8 con BOM, UTF-8 si todo el archivo decodifica como tal
+    (se revisa por bloques, sin cargarlo entero) o, si no, cp1252 (la de los extractos
+    exportados en Windows por los bancos colombianos).
+    """
+    with open(path, "rb") as f:
+        bloque = f.read(1 << 16)
+        if bloque.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            while bloque:
+                decoder.decode(bloque)
+                bloque = f.read(1 << 16)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return "cp1252"
+    return "utf-8"
+
+
+def read_csv(path: str, progress: Optional[_Progress] = None,
+             encoding: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """
+    Genera cada fila del CSV como dict {encabezado: texto}.
+    El separador (',', ';', tab o '|') se detecta con las primeras líneas y la
+    codificación, si no se indica, con csv_encoding. Un byte que no corresponda a la
+    codificación lanza UnicodeDecodeError en vez de reemplazarse en silencio.
+    """
+    with open(path, newline="", encoding=encoding or csv_encoding(path)) as f:
+        muestra = f.read(8192)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(muestra, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.DictReader(_lines(f, progress), dialect=dialect)
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+_XML_ENCODING = re.compile(rb"<\?xml[^>]*encoding=[\"']([A-Za-z0-9._-]+)[\"']", re.I)
+_OFX_HEADER = re.compile(rb"^\s*(ENCODING|CHARSET)\s*:\s*([A-Za-z0-9._-]+)", re.I | re.M)
+_OFX_CHARSETS = {"1252": "cp1252", "ISO-8859-1": "latin-1", "8859-1": "latin-1",
+                 "UTF-8": "utf-8"}
+
+
+def ofx_encoding(path: str) -> str:
+    """
+    Codificación de un OFX según su cabecera: la declaración XML (OFX 2.x, UTF-8 si no
+    la indica) o ENCODING/CHARSET (OFX 1.x). Sin indicación, cp1252 (la habitual de
+    los bancos en Windows).
+    """
+    with open(path, "rb") as f:
+        inicio = f.read(4096)
+    if inicio.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    candidato = None
+    m = _XML_ENCODING.search(inicio)
+    if m:
+        candidato = m.group(1).decode("ascii")
+    elif inicio.lstrip().startswith(b"<?xml") or b"<?OFX" in inicio:
+        candidato = "utf-8"
+    else:
+        cabecera = {k.decode("ascii").upper(): v.decode("ascii").upper()
+                    for k, v in _OFX_HEADER.findall(inicio)}
+        if cabecera.get("ENCODING") in ("UTF-8", "UTF8"):
+            candidato = "utf-8"
+        else:
+            candidato = _OFX_CHARSETS.get(cabecera.get("CHARSET", ""))
+    try:
+        return codecs.lookup(candidato).name if candidato else "cp1252"
+    except LookupError:
+        return "cp1252"
+
+
+def read_ofx(path: str, progress: Optional[_Progress] = None) -> Iterator[Dict[str, str]]:
+    """
+    Genera cada <STMTTRN> de un OFX (SGML 1.x o XML 2.x) como dict {ETIQUETA: valor}.
+    Solo se guarda en memoria la transacción que se está leyendo; la codificación sale
+    de la cabecera del archivo (ver ofx_encoding).
+    """
+    with open(path, encoding=ofx_encoding(path), errors="replace") as f:
+        actual: Optional[Dict[str, str]] = None
+        for line in _lines(f, progress):
+            for cierre, tag, valor in _OFX_TAG.findall(line):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    if cierre:
+                        if actual is not None:
+                            yield actual
+                        actual = None
+                    else:
+                        actual = {}
+                elif actual is not None and not cierre and valor.strip():
+                    actual[tag] = valor.strip()
+        if actual:
+            yield actual   # OFX truncado sin </STMTTRN>
+
+
+def ofx_columns() -> Dict[str, str]:
+    """Mapa de columnas para las filas que genera read_ofx."""
+    return {"fecha": "DTPOSTED", "monto": "TRNAMT", "descripcion": "NAME",
+            "memo": "MEMO", "tipo": "TRNTYPE"}
+
+
+def header_of(path: str, encoding: Optional[str] = None) -> List[str]:
+    """Encabezados del CSV (para proponer el mapa de columnas)."""
+    rows = read_csv(path, encoding=encoding)
+    try:
+        first = next(rows)
+    except StopIteration:
+        return []
+    finally:
+        rows.close()
+    return list(first.keys())
+
+
+def guess_columns(header: Iterable[str]) -> Dict[str, str]:
+    """
+    Propone {campo: encabezado} comparando los encabezados con COLUMN_ALIASES.
+    Primero coincidencias exactas y luego encabezados que contienen el alias.
+    """
+    norm = {h: normalize(h or "").strip() for h in header}
+    mapping: Dict[str, str] = {}
+    usados = set()
+    for exacto in (True, False):
+        for campo, aliases in COLUMN_ALIASES.items():
+            if campo in mapping:
+                continue
+            for h, n in norm.items():
+                if h in usados:
+                    continue
+                if any(n == a if exacto else a in n for a in aliases):
+                    mapping[campo] = h
+                    usados.add(h)
+                    break
+    return mapping
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Normalización
+# -------------------------------------------------------------------------------------------
+
+def parse_date(text: str) -> Optional[float]:
+    """
+    Convierte una fecha de extracto al timestamp 'fecha' (medianoche local),
+    igual que el modal de transacciones. Acepta también fechas OFX
+    ('20250713', '20250713120000[-5:COT]'). Retorna None si no se reconoce.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    if re.fullmatch(r"\d{8}(\d{4,6}(\.\d+)?)?(\[.*\])?", text):
+        text = text[:8]
+    for fmt in DATE_FORMATS:
+        try:
+            d = datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+        return datetime.combine(d, datetime.min.time()).timestamp()
+    return None
+
+
+_NO_NUM = re.compile(r"[^\d,.\-()]")
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    Interpreta montos como '1.234.567,89', '1,234.56', '-$ 15.000' o '(15000)'.
+    El separador decimal es el último '.' o ',' seguido de 1 o 2 dígitos;
+    cualquier otro se toma como separador de miles.
+    """
+    s = _NO_NUM.sub("", str(text or ""))
+    if not s:
+        return None
+    negativo = s.startswith("-") or s.endswith("-") or (s.startswith("(") and s.endswith(")"))
+    s = s.strip("-()")
+    sep = max(s.rfind(","), s.rfind("."))
+    if sep >= 0 and 1 <= len(s) - sep - 1 <= 2:
+        entero, decimales = s[:sep], s[sep + 1:]
+    else:
+        entero, decimales = s, ""
+    entero = re.sub(r"[.,]", "", entero)
+    if not entero and not decimales:
+        return None
+    try:
+        valor = float(f"{entero or 0}.{decimales or 0}")
+    except ValueError:
+        return None
+    return -valor if negativo else valor
+
+
+def _tipo_de(texto: str) -> Optional[str]:
+    n = normalize(texto or "")
+    if n.startswith(("ingreso", "credit", "abono", "dep", "int", "div")):
+        return "Ingreso"
+    if n.startswith(("gasto", "debit", "cargo", "retiro", "pago", "payment", "fee", "pos", "atm")):
+        return "Gasto"
+    return None
+
+
+def normalize_rows(rows: Iterable[Dict[str, str]],
+                   mapping: Dict[str, str],
+                   result: ImportResult) -> Iterator[Dict]:
+    """
+    Convierte filas crudas en registros {fecha, descripcion, monto, tipo, categoria}.
+    - El monto se guarda en positivo; el signo (o las columnas débito/crédito,
+      o la columna de tipo) decide si es Ingreso o Gasto.
+    - Las filas sin fecha o monto válidos se cuentan como inválidas.
+    """
+    col = mapping.get
+    for row in rows:
+        result.leidas += 1
+        fecha = parse_date(row.get(col("fecha"), "") if col("fecha") else "")
+        if col("monto"):
+            monto = parse_amount(row.get(col("monto"), ""))
+        else:
+            deb = parse_amount(row.get(col("debito"), "")) if col("debito") else None
+            cre = parse_amount(row.get(col("credito"), "")) if col("credito") else None
+            monto = (abs(cre) if cre else 0.0) - (abs(deb) if deb else 0.0) \
+                if (deb or cre) else None
+        if fecha is None or monto is None or monto == 0:
+            result.invalidas += 1
+            continue
+
+        desc = (row.get(col("descripcion"), "") if col("descripcion") else "").strip()
+        if not desc and col("memo"):
+            desc = (row.get(col("memo")) or "").strip()
+        tipo = _tipo_de(row.get(col("tipo"), "")) if col("tipo") else None
+        if tipo is None or (col("monto") and monto < 0):
+            tipo = "Gasto" if monto < 0 else "Ingreso"
+
+        yield {
+            "fecha": fecha,
+            "descripcion": " ".join(desc.split()),
+            "monto": round(abs(monto), 2),
+            "tipo": tipo,
+            "categoria": (row.get(col("categoria"), "") if col("categoria") else "").strip(),
+        }
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Categorías y duplicados
+# -------------------------------------------------------------------------------------------
+
+def categorize(records: Iterable[Dict], trie=None, cat_index=None) -> Iterator[Dict]:
+    """
+    Asigna categoría a cada registro:
+    - Si el archivo trae una categoría existente, se respeta.
+    - Si no, la más usada con esa descripción en el historial (trie).
+    - Si no, una categoría del mismo tipo cuyo nombre aparezca en la descripción.
+    - En último caso, SIN_CATEGORIA.
+    """
+    nombres = set(cat_index.names()) if cat_index is not None else set()
+    por_tipo = {t: [(normalize(n), n) for n in cat_index.names(t)]
+                for t in ("Ingreso", "Gasto")} if cat_index is not None else {}
+    for rec in records:
+        if rec["categoria"] in nombres:
+            yield rec
+            continue
+        categoria = None
+        sug = trie.suggest(rec["descripcion"]) if trie is not None else None
+        if sug and (not nombres or sug[0] in nombres):
+            categoria = sug[0]
+        else:
+            texto = normalize(rec["descripcion"])
+            categoria = next((n for nn, n in por_tipo.get(rec["tipo"], ()) if nn and nn in texto),
+                             None)
+        rec["categoria"] = categoria or rec["categoria"] or SIN_CATEGORIA
+        yield rec
+
+
+def record_hash(rec: Dict) -> str:
+    """Hash de (día, monto, descripción normalizada) para detectar duplicados."""
+    try:
+        dia = datetime.fromtimestamp(float(rec["fecha"])).strftime("%Y-%m-%d")
+        monto = f"{abs(float(rec.get('monto', 0))):.2f}"
+    except (KeyError, TypeError, ValueError):
+        return ""
+    desc = " ".join(normalize(str(rec.get("descripcion", ""))).split())
+    return hashlib.blake2b(f"{dia}|{monto}|{desc}".encode(), digest_size=12).hexdigest()
+
+
+def dedupe(records: Iterable[Dict], existing: Dict, result: ImportResult) -> Iterator[Dict]:
+    """
+    Deja pasar solo registros cuyo hash no está en 'existing' ({key: transacción})
+    ni apareció antes en el mismo archivo.
+    """
+    vistos = {record_hash(t) for t in (existing or {}).values()}
+    vistos.discard("")
+    for rec in records:
+        h = record_hash(rec)
+        if h in vistos:
+            result.duplicadas += 1
+            continue
+        vistos.add(h)
+        yield rec
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """Agrupa 'iterable' en listas de hasta 'size' elementos."""
+    it = iter(iterable)
+    while True:
+        bloque = list(islice(it, size))
+        if not bloque:
+            return
+        yield bloque
+
+
+# -------------------------------------------------------------------------------------------
+# 4) Importación completa
+# -------------------------------------------------------------------------------------------
+
+def _decode_error(encoding: Optional[str]) -> str:
+    return f"El archivo tiene caracteres que no son {encoding or 'texto válido'}."
+
+
+def run_import(path: str,
+               existing: Dict,
+               write_chunk: Callable[[List[Dict]], Tuple[Dict, Optional[str]]],
+               mapping: Optional[Dict[str, str]] = None,
+               trie=None,
+               cat_index=None,
+               chunk_size: int = 500,
+               progress: Optional[Callable[[float, ImportResult], None]] = None,
+               cancelled: Optional[Callable[[], bool]] = None,
+               encoding: Optional[str] = None) -> ImportResult:
+    """
+    Importa 'path' (CSV u OFX según la extensión) y escribe los registros nuevos
+    por bloques de 'chunk_size' con write_chunk(registros) -> ({key: reg}, error).
+    - mapping: {campo: encabezado}; si falta, se detecta (CSV) o es el de OFX.
+    - progress(fracción, resultado_parcial) se llama tras cada bloque.
+    - cancelled() permite detener la importación entre bloques.
+    - encoding: codificación del CSV; si falta, se detecta (ver csv_encoding).
+    Puede ejecutarse en un hilo de trabajo: no toca widgets.
+    """
+    result = ImportResult()
+    avance = _Progress(path)
+    if path.lower().endswith((".ofx", ".qfx")):
+        rows = read_ofx(path, avance)
+        mapping = mapping or ofx_columns()
+    else:
+        encoding = encoding or csv_encoding(path)
+        try:
+            mapping = mapping or guess_columns(header_of(path, encoding))
+        except UnicodeDecodeError:
+            result.error = _decode_error(encoding)
+            return result
+        rows = read_csv(path, avance, encoding)
+    if "fecha" not in mapping or not ({"monto", "debito", "credito"} & set(mapping)):
+        result.error = "No se encontraron columnas de fecha y monto."
+        return result
+
+    registros = dedupe(categorize(normalize_rows(rows, mapping, result), trie, cat_index),
+                       existing, result)
+    try:
+        for bloque in chunked(registros, chunk_size):
+            if cancelled is not None and cancelled():
+                result.error = "Importación cancelada."
+                break
+            nuevos, err = write_chunk(bloque)
+            if err:
+                result.error = err
+                break
+            result.importadas += len(nuevos)
+            result.nuevos.update(nuevos)
+            if progress is not None:
+                progress(avance.fraction, result)
+    except UnicodeDecodeError:
+        result.error = _decode_error(encoding)
+    rows.close()
+    if progress is not None and result.error is None:
+        progress(1.0, result)
+    return result
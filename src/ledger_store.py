@@ -0,0 +1,274 @@
+# ===========================================================================================
+# ledger_store.py
+# -------------------------------------------------------------------------------------------
+# Caché en disco de las transacciones de cada usuario, por columnas (columnar.Ledger):
+# - Cada columna es un archivo .npy (keys, fecha int64, monto float64, tipo int8,
+#   códigos de categoría, offsets de descripción y el blob UTF-8 de descripciones).
+# - load() abre las columnas con np.load(mmap_mode="r"): el Dashboard puede pintar
+#   agregados y gráficos al arrancar sin leer ni decodificar todas las transacciones,
+#   con un tiempo casi constante sea cual sea el tamaño del usuario.
+# - save() sincroniza con el Ledger actual: las filas nuevas y las editadas se escriben
+#   como un segmento más (una fila editada reemplaza, en su lugar, a la de igual key) y
+#   las keys borradas se anotan en meta.json. Solo cuando hay demasiados segmentos o
+#   cambios pendientes reescribe todo en una base nueva (compactación perezosa), así una
+#   edición suelta no reescribe la base.
+#
+# Estructura: <caché>/ledger/<uid>/
+#   meta.json          segmentos vigentes, filas, códigos de tipo y categoría, keys
+#                      borradas y la huella del contenido (Ledger.fingerprint), sin
+#                      tener que recalcularla
+#   b<n>/ , a<n>/      base compactada y segmentos agregados (una carpeta con los .npy)
+# Las escrituras van a carpetas/archivos temporales y se publican con os.replace, así
+# una lectura nunca ve un segmento a medio escribir. Las carpetas son privadas (0700) y
+# se borran al cerrar sesión (clear).
+# ===========================================================================================
+
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from columnar import Ledger, as_u8, gather_bytes
+from utils import cache_dir
+
+FORMATO = 2
+COLUMNAS = ("keys", "fecha", "monto", "tipo", "cat", "desc_off", "desc")
+MAX_SEGMENTOS = 8           # Segmentos agregados antes de compactar
+MAX_AGREGADAS = 0.10        # Fracción de filas agregadas o borradas (sobre la base) antes de compactar
+
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="klarity-ledger")
+
+
+def _carpeta(uid: str) -> str:
+    nombre = "".join(c if c.isalnum() or c in "-_" else "_" for c in uid)
+    return cache_dir("ledger", nombre, private=True)   # Montos y descripciones: 0700
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Lectura
+# -------------------------------------------------------------------------------------------
+
+def _read_meta(carpeta: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(carpeta, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("formato") == FORMATO else None
+
+
+def _load_column(ruta: str) -> np.ndarray:
+    try:
+        return np.load(ruta, mmap_mode="r")
+    except ValueError:          # Columna vacía: no hay nada que mapear
+        return np.load(ruta)
+
+
+def _merge(led: Ledger, borradas: List[str]) -> Ledger:
+    """
+    Resuelve los parches: de cada key queda su última fila (la más reciente) en el lugar
+    de la primera, y se quitan las keys borradas.
+    """
+    orden = np.argsort(led.keys, kind="stable")
+    ordenadas = led.keys[orden]
+    inicio = np.flatnonzero(np.concatenate(([True], ordenadas[1:] != ordenadas[:-1])))
+    primera = orden[inicio]
+    ultima = orden[np.append(inicio[1:], len(orden)) - 1]
+    if borradas:
+        vivas = ~np.isin(ordenadas[inicio], np.array([k.encode("utf-8") for k in borradas]))
+        primera, ultima = primera[vivas], ultima[vivas]
+    return led.take(ultima[np.argsort(primera)])
+
+
+def _open(carpeta: str, meta: Dict) -> Ledger:
+    partes = []
+    for seg in meta["segmentos"]:
+        c = {col: _load_column(os.path.join(carpeta, seg, col + ".npy")) for col in COLUMNAS}
+        partes.append(Ledger(c["keys"], c["fecha"], c["monto"], c["tipo"], c["cat"],
+                             list(meta["tipos"]), list(meta["categorias"]),
+                             c["desc_off"], c["desc"]))
+    led = Ledger.concat(partes)
+    if meta["reemplazos"] or meta["borradas"]:
+        led = _merge(led, meta["borradas"])
+    if len(led) != meta["filas"]:
+        raise ValueError("filas inconsistentes")
+    led._huella = meta.get("huella")     # La del Ledger que se guardó (ver save)
+    return led
+
+
+def load(uid: str) -> Optional[Ledger]:
+    """
+    Ledger guardado de 'uid' con sus columnas mapeadas en memoria (solo lectura),
+    o None si no hay caché o no se puede leer. Puede estar desactualizado: es lo
+    último que se sincronizó.
+    """
+    carpeta = _carpeta(uid)
+    meta = _read_meta(carpeta)
+    if not meta or not meta["segmentos"]:
+        return None
+    try:
+        return _open(carpeta, meta)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ledger_store] Caché ilegible para {uid}: {e}")
+        return None
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Escritura: agregar o compactar
+# -------------------------------------------------------------------------------------------
+
+def _write_meta(carpeta: str, meta: Dict) -> None:
+    tmp = os.path.join(carpeta, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(carpeta, "meta.json"))
+
+
+def _write_segment(carpeta: str, nombre: str, led: Ledger, tipo: np.ndarray,
+                   cat: np.ndarray) -> None:
+    tmp = os.path.join(carpeta, nombre + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    columnas = {"keys": led.keys, "fecha": led.fecha, "monto": led.monto, "tipo": tipo,
+                "cat": cat, "desc_off": led.desc_off, "desc": as_u8(led.desc_blob)}
+    for col, arr in columnas.items():
+        np.save(os.path.join(tmp, col + ".npy"), np.ascontiguousarray(arr))
+    os.replace(tmp, os.path.join(carpeta, nombre))
+
+
+def _recode(nombres: List[str], codigos: np.ndarray, destino: List[str]) -> np.ndarray:
+    """Códigos de 'nombres' traducidos a los de 'destino' (que se extiende si hace falta)."""
+    idx = {n: i for i, n in enumerate(destino)}
+    mapa = np.empty(len(nombres) + 1, dtype=np.int32)
+    mapa[-1] = -1
+    for i, n in enumerate(nombres):
+        if n not in idx:
+            idx[n] = len(destino)
+            destino.append(n)
+        mapa[i] = idx[n]
+    return mapa[codigos]
+
+
+def _diff(viejo: Ledger, nuevo: Ledger):
+    """
+    Si 'nuevo' es 'viejo' con filas editadas o borradas en su lugar y otras agregadas al
+    final (como lo dejan las escrituras locales o una relectura de Firebase), retorna
+    (posiciones de 'nuevo' que cambiaron o son nuevas, keys de 'viejo' borradas);
+    si el orden no calza, None.
+    """
+    if len(nuevo) >= len(viejo) and np.array_equal(viejo.keys, nuevo.keys[:len(viejo)]):
+        siguen = np.ones(len(viejo), dtype=bool)     # Sin borrados (lo habitual): sin isin
+    else:
+        siguen = np.isin(viejo.keys, nuevo.keys)
+    vk = np.flatnonzero(siguen)
+    n = len(vk)
+    if len(nuevo) < n or not np.array_equal(viejo.keys[vk], nuevo.keys[:n]):
+        return None
+    tipos, cats = list(nuevo.tipos), list(nuevo.categorias)
+    # Los códigos pueden diferir entre ambos: se comparan traducidos a los de 'nuevo'
+    cambiadas = ((viejo.fecha[vk] != nuevo.fecha[:n]) | (viejo.monto[vk] != nuevo.monto[:n])
+                 | (_recode(viejo.tipos, viejo.tipo, tipos)[vk] != nuevo.tipo[:n])
+                 | (_recode(viejo.categorias, viejo.cat, cats)[vk] != nuevo.cat[:n]))
+    # Descripciones: distinto largo, o mismo largo y algún byte distinto
+    lv, ln = np.diff(viejo.desc_off)[vk], np.diff(nuevo.desc_off)[:n]
+    cambiadas |= lv != ln
+    iguales = np.flatnonzero(lv == ln)
+    bv, _ = gather_bytes(viejo.desc_blob, viejo.desc_off, vk[iguales])
+    bn, largos = gather_bytes(nuevo.desc_blob, nuevo.desc_off, iguales)
+    distintos = np.flatnonzero(bv != bn)
+    cambiadas[iguales[np.searchsorted(np.cumsum(largos), distintos, side="right")]] = True
+    parche = np.concatenate((np.flatnonzero(cambiadas), np.arange(n, len(nuevo))))
+    borradas = [k.decode("utf-8") for k in viejo.keys[~siguen]]
+    return parche, borradas
+
+
+def _cleanup(carpeta: str, meta: Dict) -> None:
+    """Borra los segmentos que ya no están en meta.json (p. ej. tras compactar)."""
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        if os.path.isdir(ruta) and nombre not in meta["segmentos"]:
+            shutil.rmtree(ruta, ignore_errors=True)   # En Windows puede seguir mapeado
+
+
+def save(uid: str, led: Ledger) -> str:
+    """
+    Sincroniza la caché de 'uid' con 'led' (todas sus transacciones actuales).
+    Retorna "igual", "agregado" (filas nuevas o editadas en un segmento más, y borradas
+    anotadas) o "compactado" (se reescribió todo).
+    """
+    with _lock:
+        carpeta = _carpeta(uid)
+        meta = _read_meta(carpeta)
+        viejo = None
+        if meta and meta["segmentos"]:
+            try:
+                viejo = _open(carpeta, meta)
+            except (OSError, ValueError, KeyError):
+                viejo = None
+
+        diff = _diff(viejo, led) if viejo is not None else None
+        if diff is not None:
+            parche, borradas = diff
+            if not len(parche) and not borradas:
+                if meta.get("huella") != led.fingerprint():
+                    meta["huella"] = led.fingerprint()
+                    _write_meta(carpeta, meta)
+                return "igual"
+            agregados = len(meta["segmentos"]) - 1
+            pendientes = meta["pendientes"] + len(parche) + len(borradas)
+            if agregados < MAX_SEGMENTOS and \
+                    pendientes <= MAX_AGREGADAS * max(meta["base"], 1):
+                nuevo = led.take(parche)
+                tipos, cats = list(meta["tipos"]), list(meta["categorias"])
+                tipo = _recode(nuevo.tipos, nuevo.tipo, tipos).astype(np.int8)
+                cat = _recode(nuevo.categorias, nuevo.cat, cats)
+                # Hay ediciones si el parche incluye filas que ya estaban (van primero)
+                editadas = bool(len(parche)) and int(parche[0]) < len(viejo) - len(borradas)
+                nombre = f"a{time.time_ns()}"
+                _write_segment(carpeta, nombre, nuevo, tipo, cat)
+                meta.update(segmentos=meta["segmentos"] + [nombre], filas=len(led),
+                            tipos=tipos, categorias=cats, huella=led.fingerprint(),
+                            pendientes=pendientes, borradas=meta["borradas"] + borradas,
+                            reemplazos=meta["reemplazos"] or editadas)
+                _write_meta(carpeta, meta)
+                return "agregado"
+
+        # Compactación: una sola base con todas las filas
+        nombre = f"b{time.time_ns()}"
+        _write_segment(carpeta, nombre, led, led.tipo, led.cat)
+        meta = {"formato": FORMATO, "segmentos": [nombre], "filas": len(led), "base": len(led),
+                "tipos": list(led.tipos), "categorias": list(led.categorias),
+                "huella": led.fingerprint(), "pendientes": 0, "borradas": [],
+                "reemplazos": False}
+        _write_meta(carpeta, meta)
+        _cleanup(carpeta, meta)
+        return "compactado"
+
+
+def save_async(uid: str, led: Ledger) -> None:
+    """save() en el hilo de la caché (las escrituras se hacen en orden, de a una)."""
+    def trabajo():
+        try:
+            save(uid, led)
+        except Exception as e:
+            print(f"[ledger_store] No se pudo guardar la caché de {uid}: {e}")
+    _executor.submit(trabajo)
+
+
+def _clear(uid: str) -> None:
+    with _lock:
+        shutil.rmtree(_carpeta(uid), ignore_errors=True)
+
+
+def clear(uid: str) -> None:
+    """
+    Elimina la caché en disco de 'uid' (p. ej. al cerrar sesión). Se hace en el hilo
+    de la caché, después de los save_async pendientes, para que ninguno la vuelva a crear.
+    """
+    _executor.submit(_clear, uid).result()
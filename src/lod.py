@@ -0,0 +1,90 @@
+# ===========================================================================================
+# lod.py
+# -------------------------------------------------------------------------------------------
+# Nivel de detalle (LOD) para series largas, como el "Saldo Acumulado":
+# - LTTB (Largest-Triangle-Three-Buckets): conserva la forma visual con ~1 punto por píxel.
+# - Mín/máx por bucket: conserva exactamente los picos de cada columna de píxeles.
+# - downsample() elige cuántos puntos dibujar según el ancho del eje en píxeles,
+#   de modo que el costo de dibujar depende de la pantalla y no del historial.
+# ===========================================================================================
+
+from typing import Tuple
+
+import numpy as np
+
+
+def _as_float(x: np.ndarray) -> np.ndarray:
+    """Convierte el eje x (números o datetime64) a float para calcular áreas."""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb(x, y, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce (x, y) a 'n_out' puntos con el algoritmo Largest-Triangle-Three-Buckets.
+    - Siempre conserva el primer y el último punto.
+    - Si la serie ya tiene n_out puntos o menos, se devuelve sin cambios.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    xf = _as_float(x)
+    every = (n - 2) / (n_out - 2)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        # Bucket actual [start, end) y promedio del bucket siguiente
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        avg_x = xf[end:nxt_end].mean()
+        avg_y = y[end:nxt_end].mean()
+
+        # Punto del bucket que forma el triángulo de mayor área con 'a' y el promedio
+        area = np.abs((xf[a] - avg_x) * (y[start:end] - y[a])
+                      - (xf[a] - xf[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    idx[-1] = n - 1
+    return x[idx], y[idx]
+
+
+def minmax_buckets(x, y, n_buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Divide la serie en 'n_buckets' tramos y conserva el mínimo y el máximo de cada uno
+    (en su orden original). Devuelve como mucho 2 * n_buckets puntos.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2 * n_buckets or n_buckets < 1:
+        return x, y
+
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        seg = y[lo:hi]
+        i_min, i_max = lo + int(seg.argmin()), lo + int(seg.argmax())
+        keep.extend(sorted({i_min, i_max}))
+    idx = np.asarray(keep, dtype=np.int64)
+    return x[idx], y[idx]
+
+
+def downsample(x, y, width_px: float, method: str = "lttb") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce la serie a la resolución de un eje de 'width_px' píxeles.
+    - method="lttb": ~1 punto por píxel.
+    - method="minmax": mín. y máx. por píxel (2 puntos por píxel).
+    """
+    px = max(int(width_px), 3)
+    if method == "minmax":
+        return minmax_buckets(x, y, px)
+    return lttb(x, y, px)
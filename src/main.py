@@ -5,13 +5,24 @@
 # Gestiona:
 # 1. Inicialización de Tkinter (ventana raíz oculta).
 # 2. Mostrado de la pantalla de carga (SplashScreen).
-# 3. Tras la animación, invocación del módulo de login/registro.
+# 3. Tras la animación, invocación del módulo de login/registro (o directo al Dashboard si
+#    la sesión guardada se reanudó mientras tanto).
+# Opciones: --perfil [CARPETA] activa el modo de perfilado (ver profiling.py).
 # ===========================================================================================
 
+import sys
+import profiling                       # Modo de perfilado opcional (--perfil / KLARITY_PROFILE).
+profiling.configure(sys.argv)          # Antes del resto de imports, para poder medirlos.
+import tracing                         # Trazas opcionales de acciones (KLARITY_TRACE).
+tracing.configure()
+
 import tkinter as tk                   # Biblioteca estándar para GUIs en Python.
 from ui_splash import SplashScreen     # Clase que muestra el splash screen.
 import ui_login as login               # Módulo que maneja login y registro.
+import firebase_service as fb          # Reanudación de la sesión guardada.
+import stall_watchdog                  # Vigilante opcional de bloqueos (KLARITY_WATCHDOG=1).
 
+@profiling.profiled("main")
 def main():
     """
     - Crea la ventana raíz de Tkinter.
@@ -19,20 +30,27 @@ def main():
     - Define la función a ejecutar cuando termina el splash (after_splash).
     - Lanza el splash screen y arranca el loop principal de eventos.
     """
+    profiling.mark_once("imports")
     # 1. Creamos la ventana "root" que Tkinter usa internamente.
     root = tk.Tk()
     # 2. La ocultamos porque no queremos mostrar un frame vacío.
     root.withdraw()
+    # Si se pidió, vigila bloqueos del loop de eventos (antes de crear otras ventanas).
+    stall_watchdog.install(root)
+
+    # La sesión guardada (si hay) se reanuda en paralelo a la animación del splash.
+    reanudacion = fb.resume_session_async()
 
     # 3. Esta función se ejecutará una vez termine la animación del splash.
     def after_splash():
         # Llama al método `start` de ui_login, pasando la raíz para crear nuevas ventanas.
-        login.start(root)
+        login.start(root, reanudacion)
 
     # 4. Creamos y mostramos el splash screen.
     #    - Toma la ventana root como padre.
     #    - Recibe la función after_splash para llamarla al terminar.
     SplashScreen(root, after_splash).show()
+    root.after_idle(profiling.mark_once, "primer_pintado")
 
     # 5. Inicia el loop de eventos de Tkinter. Hasta que todas las ventanas se cierren,
     #    este bucle mantiene la aplicación viva y responde a clicks, timers, etc.
@@ -0,0 +1,370 @@
+# ===========================================================================================
+# metrics.py
+# -------------------------------------------------------------------------------------------
+# Instrumentación de las llamadas a Firebase (firebase_service.py):
+# - Decorador @instrumented: latencia, bytes del payload, registros, reintentos y clase
+#   de error de cada llamada, acumulados por operación en histogramas en memoria.
+# - Reintentos con espera creciente para lecturas idempotentes ante errores transitorios
+#   (red caída, tiempo agotado, 5xx/429).
+# - Exportación opcional: una línea JSON por llamada y/o un archivo de texto de
+#   Prometheus (para el textfile collector de node_exporter) reescrito cada cierto tiempo.
+# - snapshot() alimenta el panel oculto de diagnóstico del Dashboard (Ctrl+Shift+D).
+# - Con trazas activas (tracing.py), cada llamada es además un span "firebase.<op>".
+#
+# Se activa con variables de entorno (leídas al importar):
+#   KLARITY_METRICS=1               histogramas en memoria
+#   KLARITY_METRICS_JSONL=ruta      además, una línea JSON por llamada
+#   KLARITY_METRICS_PROM=ruta       además, archivo de texto de Prometheus
+# Desactivada, @instrumented devuelve la función original (costo cero); solo las
+# funciones con reintentos quedan envueltas.
+# ===========================================================================================
+
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+from itertools import islice
+from typing import Callable, Dict, List, Optional
+
+import tracing
+
+_TRUE = ("1", "true", "si", "sí", "yes", "on")
+
+JSONL_PATH = os.environ.get("KLARITY_METRICS_JSONL", "").strip() or None
+PROM_PATH = os.environ.get("KLARITY_METRICS_PROM", "").strip() or None
+ENABLED = (os.environ.get("KLARITY_METRICS", "").strip().lower() in _TRUE
+           or bool(JSONL_PATH or PROM_PATH))
+
+PROM_INTERVAL = 15.0            # Segundos entre escrituras del archivo de Prometheus
+RETRY_BACKOFF = (0.2, 0.5)      # Espera antes de cada reintento
+SAMPLE = 64                     # Registros muestreados para estimar el tamaño del payload
+
+# Clases de excepción y códigos HTTP que merecen un reintento
+TRANSIENT_CLASSES = {"ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout",
+                     "ChunkedEncodingError", "TimeoutError", "ConnectionResetError"}
+TRANSIENT_CODES = ("429", "500", "502", "503", "504")
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Histograma logarítmico
+# -------------------------------------------------------------------------------------------
+
+# Límites superiores (segundos): 4 cubetas por duplicación, de 0.25 ms a ~2 min
+BUCKETS: List[float] = [0.00025 * 2 ** (i / 4) for i in range(77)]
+
+
+class Histogram:
+    """
+    Conteo por cubetas logarítmicas: memoria fija y registro O(log n) sin guardar
+    cada valor. Los percentiles se estiman con un error relativo de ~±10 %.
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)     # La última cubeta es +Inf
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        i = _bucket_of(value)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Valor aproximado del percentil q (0..1), acotado por el mínimo y el máximo."""
+        if not self.count:
+            return 0.0
+        objetivo = q * self.count
+        acumulado = 0
+        for i, c in enumerate(self.counts):
+            acumulado += c
+            if acumulado >= objetivo and c:
+                if i >= len(BUCKETS):
+                    return self.max
+                # Punto medio geométrico de la cubeta
+                bajo = BUCKETS[i - 1] if i else 0.0
+                valor = math.sqrt(bajo * BUCKETS[i]) if bajo else BUCKETS[i] / 2
+                return min(max(valor, self.min), self.max)
+        return self.max
+
+
+def _bucket_of(value: float) -> int:
+    if value <= BUCKETS[0]:
+        return 0
+    i = int(math.ceil(4 * math.log2(value / BUCKETS[0])))
+    return min(i, len(BUCKETS))
+
+
+class OpStats:
+    """Acumulados de una operación (p. ej. "get_transactions")."""
+
+    __slots__ = ("latency", "calls", "bytes", "records", "retries", "errors")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.calls = 0
+        self.bytes = 0
+        self.records = 0
+        self.retries = 0
+        self.errors: Dict[str, int] = {}
+
+
+_stats: Dict[str, OpStats] = {}
+_lock = threading.Lock()
+_local = threading.local()          # Último error anotado en este hilo (ver note_error)
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Tamaño y registros del payload
+# -------------------------------------------------------------------------------------------
+
+def payload_size(obj) -> int:
+    """
+    Bytes aproximados de 'obj' serializado en JSON. En colecciones grandes se
+    serializa una muestra y se extrapola, para no duplicar el costo de la lectura.
+    """
+    if obj is None:
+        return 0
+    if isinstance(obj, (dict, list, tuple)) and len(obj) > SAMPLE:
+        paso = len(obj) // SAMPLE
+        items = obj.items() if isinstance(obj, dict) else obj
+        muestra = list(islice(items, 0, None, paso))[:SAMPLE]
+        tam = len(json.dumps(muestra, default=str, ensure_ascii=False).encode("utf-8"))
+        return int(tam * len(obj) / len(muestra))
+    try:
+        return len(json.dumps(obj, default=str, ensure_ascii=False).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def record_count(obj) -> int:
+    """Registros en 'obj': elementos de una colección de registros, o 1 si es uno solo."""
+    if obj is None or obj is False:
+        return 0
+    if isinstance(obj, (list, tuple, set)):
+        return len(obj)
+    if isinstance(obj, dict):
+        if obj and isinstance(next(iter(obj.values())), dict):
+            return len(obj)
+        return 1 if obj else 0
+    return 1
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Errores y reintentos
+# -------------------------------------------------------------------------------------------
+
+def note_error(e: BaseException) -> None:
+    """
+    Anota el error de la llamada en curso de este hilo. firebase_service devuelve los
+    errores como texto, así que lo llama en sus 'except' para conservar la clase.
+    """
+    _local.error = e
+
+
+def is_transient(e: Optional[BaseException]) -> bool:
+    """True si el error parece pasajero (red, tiempo agotado, 5xx/429)."""
+    if e is None:
+        return False
+    if type(e).__name__ in TRANSIENT_CLASSES:
+        return True
+    msg = str(e)
+    return any(code in msg for code in TRANSIENT_CODES)
+
+
+# -------------------------------------------------------------------------------------------
+# 4) Decorador
+# -------------------------------------------------------------------------------------------
+
+def instrumented(op: Optional[str] = None, payload_arg: Optional[int] = None,
+                 retries: int = 0) -> Callable:
+    """
+    Decora una función de firebase_service que retorna (valor, error):
+    - op: nombre de la operación (por defecto, el de la función).
+    - payload_arg: posición del argumento que se envía (escrituras); si es None se
+      mide el valor recibido (lecturas).
+    - retries: reintentos ante errores transitorios (solo para operaciones idempotentes).
+    """
+    def deco(fn: Callable) -> Callable:
+        nombre = op or fn.__name__
+        # Con trazas activas, cada intento es un span hijo de la acción que lo originó
+        fn = tracing.traced(f"firebase.{nombre}", cat="firebase")(fn)
+        if not ENABLED and not retries:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            intento = 0
+            while True:
+                _local.error = None
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    if ENABLED:
+                        _record(nombre, time.perf_counter() - t0, None, intento, e)
+                    raise
+                error = _local.error
+                if (error is not None and intento < retries
+                        and isinstance(result, tuple) and result[-1] and is_transient(error)):
+                    time.sleep(RETRY_BACKOFF[min(intento, len(RETRY_BACKOFF) - 1)])
+                    intento += 1
+                    continue
+                break
+            if ENABLED:
+                if payload_arg is not None and len(args) > payload_arg:
+                    carga = args[payload_arg]
+                else:
+                    carga = result[0] if isinstance(result, tuple) else result
+                fallo = error if isinstance(result, tuple) and result[-1] else None
+                _record(nombre, time.perf_counter() - t0, None if fallo else carga,
+                        intento, fallo)
+            return result
+        return wrapper
+    return deco
+
+
+def _record(op: str, elapsed: float, carga, reintentos: int,
+            error: Optional[BaseException]) -> None:
+    tam = payload_size(carga)
+    regs = record_count(carga)
+    clase = type(error).__name__ if error is not None else None
+    with _lock:
+        st = _stats.get(op)
+        if st is None:
+            st = _stats[op] = OpStats()
+        st.latency.add(elapsed)
+        st.calls += 1
+        st.bytes += tam
+        st.records += regs
+        st.retries += reintentos
+        if clase:
+            st.errors[clase] = st.errors.get(clase, 0) + 1
+    if JSONL_PATH:
+        _write_jsonl({"ts": round(time.time(), 3), "op": op, "ms": round(elapsed * 1000, 3),
+                      "bytes": tam, "registros": regs, "reintentos": reintentos,
+                      "error": clase})
+
+
+# -------------------------------------------------------------------------------------------
+# 5) Consulta (panel de diagnóstico)
+# -------------------------------------------------------------------------------------------
+
+def snapshot() -> List[Dict]:
+    """
+    Resumen por operación, ordenado por tiempo total descendente:
+    [{op, llamadas, errores, reintentos, p50, p95, p99, max, total, bytes, registros}]
+    (tiempos en segundos).
+    """
+    with _lock:
+        filas = []
+        for op, st in _stats.items():
+            h = st.latency
+            filas.append({
+                "op": op, "llamadas": st.calls, "errores": dict(st.errors),
+                "reintentos": st.retries,
+                "p50": h.quantile(0.50), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                "max": h.max, "total": h.total, "bytes": st.bytes, "registros": st.records,
+            })
+    filas.sort(key=lambda f: f["total"], reverse=True)
+    return filas
+
+
+def reset() -> None:
+    """Descarta todo lo acumulado."""
+    with _lock:
+        _stats.clear()
+
+
+# -------------------------------------------------------------------------------------------
+# 6) Exportadores
+# -------------------------------------------------------------------------------------------
+
+_jsonl_lock = threading.Lock()
+_jsonl_file = None
+
+
+def _write_jsonl(evento: Dict) -> None:
+    global _jsonl_file
+    linea = json.dumps(evento, ensure_ascii=False) + "\n"
+    with _jsonl_lock:
+        if _jsonl_file is None:
+            _jsonl_file = open(JSONL_PATH, "a", encoding="utf-8", buffering=1)
+        _jsonl_file.write(linea)
+
+
+def _esc(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    """Métricas acumuladas en el formato de texto de Prometheus."""
+    pfx = "klarity_firebase"
+    out = [f"# HELP {pfx}_call_duration_seconds Latencia de las llamadas a Firebase.",
+           f"# TYPE {pfx}_call_duration_seconds histogram"]
+    with _lock:
+        stats = sorted(_stats.items())
+        for op, st in stats:
+            acumulado = 0
+            for i, c in enumerate(st.latency.counts[:-1]):
+                acumulado += c
+                if i % 4 == 3:      # Una cota por duplicación basta para Prometheus
+                    out.append(f'{pfx}_call_duration_seconds_bucket{{op="{_esc(op)}",'
+                               f'le="{BUCKETS[i]:.6g}"}} {acumulado}')
+            out.append(f'{pfx}_call_duration_seconds_bucket{{op="{_esc(op)}",le="+Inf"}} '
+                       f'{st.latency.count}')
+            out.append(f'{pfx}_call_duration_seconds_sum{{op="{_esc(op)}"}} {st.latency.total:.6f}')
+            out.append(f'{pfx}_call_duration_seconds_count{{op="{_esc(op)}"}} {st.latency.count}')
+        for nombre, campo, ayuda in (("payload_bytes_total", "bytes", "Bytes aproximados enviados o recibidos."),
+                                     ("records_total", "records", "Registros enviados o recibidos."),
+                                     ("retries_total", "retries", "Reintentos por errores transitorios.")):
+            out.append(f"# HELP {pfx}_{nombre} {ayuda}")
+            out.append(f"# TYPE {pfx}_{nombre} counter")
+            for op, st in stats:
+                out.append(f'{pfx}_{nombre}{{op="{_esc(op)}"}} {getattr(st, campo)}')
+        out.append(f"# HELP {pfx}_errors_total Llamadas fallidas por clase de error.")
+        out.append(f"# TYPE {pfx}_errors_total counter")
+        for op, st in stats:
+            for clase, n in sorted(st.errors.items()):
+                out.append(f'{pfx}_errors_total{{op="{_esc(op)}",class="{_esc(clase)}"}} {n}')
+    return "\n".join(out) + "\n"
+
+
+def write_prometheus(path: Optional[str] = None) -> None:
+    """Escribe el archivo de Prometheus de forma atómica (temporal + rename)."""
+    path = path or PROM_PATH
+    if not path:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+def _write_prometheus_safe() -> None:
+    try:
+        write_prometheus()
+    except OSError as e:
+        print(f"[metrics] No se pudo escribir {PROM_PATH}: {e}")
+
+
+def _prom_loop() -> None:
+    while True:
+        time.sleep(PROM_INTERVAL)
+        _write_prometheus_safe()
+
+
+if PROM_PATH:
+    threading.Thread(target=_prom_loop, name="metrics-prom", daemon=True).start()
+    atexit.register(_write_prometheus_safe)
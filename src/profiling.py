@@ -0,0 +1,198 @@
+# ===========================================================================================
+# profiling.py
+# -------------------------------------------------------------------------------------------
+# Modo de perfilado para perseguir regresiones de arranque sin instrumentar a mano:
+# - Fases (@profiled / with phase(...)): main(), login.start, DashboardWindow._build_ui,
+#   _home y el build() de cada sección. Cada fase mide su duración con perf_counter y
+#   guarda un archivo pstats de cProfile con su propio tiempo (las fases anidadas
+#   tienen su propio archivo y no se cuentan dos veces).
+# - Hitos del arranque: fin de imports, inicialización de Firebase, primera lectura de
+#   datos y primer pintado (del splash y del Dashboard).
+# - Desglose del tiempo de import de pandas, matplotlib, genai, firebase_admin, etc.
+# - Al salir escribe resumen.txt / resumen.json y los .prof en la carpeta de salida.
+#
+# Se activa con la opción --perfil [CARPETA] de main.py o con KLARITY_PROFILE=1 (o una
+# carpeta). Sin activar, los decoradores devuelven la función original.
+# Los .prof se pueden abrir con: python -m pstats archivo.prof (o snakeviz).
+# ===========================================================================================
+
+import atexit
+import builtins
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+T0 = time.perf_counter()        # Referencia: el import de este módulo (primera línea de main.py)
+
+ENABLED = False
+OUT_DIR: Optional[str] = None
+
+# Paquetes cuyo primer import se mide (incluye el de sus dependencias)
+WATCH_IMPORTS = ("pandas", "numpy", "matplotlib", "google.generativeai", "firebase_admin",
+                 "pyrebase", "PIL", "tkcalendar", "reportlab", "firebase_service")
+
+_stack: List[cProfile.Profile] = []            # Perfiles activos (fases anidadas)
+_phases: Dict[str, List[float]] = {}           # fase -> duraciones (s)
+_marks: Dict[str, float] = {}                  # hito -> segundos desde T0
+_imports: Dict[str, float] = {}                # paquete -> segundos de su primer import
+_real_import = builtins.__import__
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Activación
+# -------------------------------------------------------------------------------------------
+
+def configure(argv: Optional[List[str]] = None) -> bool:
+    """
+    Activa el perfilado si 'argv' trae --perfil [CARPETA] (la opción se quita de argv)
+    o si KLARITY_PROFILE está definida. Debe llamarse antes de importar el resto de la
+    app para medir sus imports. Retorna True si quedó activo.
+    """
+    global ENABLED, OUT_DIR
+    destino = os.environ.get("KLARITY_PROFILE", "").strip()
+    if argv is not None and "--perfil" in argv:
+        i = argv.index("--perfil")
+        destino = "1"
+        if i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+            destino = argv.pop(i + 1)
+        argv.pop(i)
+    if not destino or destino.lower() in ("0", "false", "no"):
+        return False
+
+    if destino.lower() in ("1", "true", "si", "sí", "yes"):
+        from utils import cache_dir
+        destino = os.path.join(cache_dir("perfiles"), f"{datetime.now():%Y%m%d_%H%M%S}")
+    os.makedirs(destino, exist_ok=True)
+    OUT_DIR = destino
+    ENABLED = True
+    builtins.__import__ = _timed_import
+    atexit.register(write_summary)
+    print(f"[profiling] Perfilado activo → {OUT_DIR}")
+    return True
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level == 0:
+        for pkg in WATCH_IMPORTS:
+            if (name == pkg or name.startswith(pkg + ".")) and pkg not in _imports \
+                    and pkg not in sys.modules:
+                t = time.perf_counter()
+                try:
+                    return _real_import(name, globals, locals, fromlist, level)
+                finally:
+                    _imports[pkg] = time.perf_counter() - t
+    return _real_import(name, globals, locals, fromlist, level)
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Fases e hitos
+# -------------------------------------------------------------------------------------------
+
+@contextmanager
+def phase(nombre: str):
+    """Mide el bloque como la fase 'nombre' (no hace nada si el perfilado está inactivo)."""
+    if not ENABLED or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    prof = cProfile.Profile()
+    if _stack:
+        _stack[-1].disable()            # La fase externa no cuenta el tiempo de esta
+    _stack.append(prof)
+    inicio = time.perf_counter()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        dur = time.perf_counter() - inicio
+        _stack.pop()
+        veces = _phases.setdefault(nombre, [])
+        veces.append(dur)
+        try:
+            prof.dump_stats(os.path.join(OUT_DIR, f"{_safe(nombre)}-{len(veces)}.prof"))
+        except OSError as e:
+            print(f"[profiling] No se pudo guardar el perfil de {nombre}: {e}")
+        if _stack:
+            _stack[-1].enable()
+
+
+def profiled(nombre: str) -> Callable:
+    """Decorador: cada llamada a la función es una fase 'nombre'."""
+    def deco(fn: Callable) -> Callable:
+        if not ENABLED:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            with phase(nombre):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return deco
+
+
+def mark_once(nombre: str) -> None:
+    """Registra el hito 'nombre' (segundos desde el arranque) la primera vez que ocurre."""
+    if ENABLED and nombre not in _marks:
+        _marks[nombre] = time.perf_counter() - T0
+
+
+def _safe(nombre: str) -> str:
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in nombre)
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Resumen
+# -------------------------------------------------------------------------------------------
+
+def summary() -> Dict:
+    """Datos del resumen: hitos, imports medidos y fases (en milisegundos)."""
+    return {
+        "hitos_ms": {k: round(v * 1000, 1) for k, v in sorted(_marks.items(), key=lambda kv: kv[1])},
+        "imports_ms": {k: round(v * 1000, 1)
+                       for k, v in sorted(_imports.items(), key=lambda kv: -kv[1])},
+        "fases": {k: {"veces": len(v), "primera_ms": round(v[0] * 1000, 1),
+                      "total_ms": round(sum(v) * 1000, 1), "max_ms": round(max(v) * 1000, 1)}
+                  for k, v in _phases.items()},
+    }
+
+
+def summary_text(datos: Dict) -> str:
+    lineas = ["Hitos (desde el arranque de main.py)"]
+    for k, v in datos["hitos_ms"].items():
+        lineas.append(f"  {k:<28} {v:>10.1f} ms")
+    lineas.append("")
+    lineas.append("Imports (primer import, incluye sus dependencias)")
+    for k, v in datos["imports_ms"].items():
+        lineas.append(f"  {k:<28} {v:>10.1f} ms")
+    lineas.append("")
+    lineas.append(f"  {'Fase':<28} {'veces':>5} {'primera':>10} {'total':>10} {'máx':>10}")
+    for k, f in sorted(datos["fases"].items(), key=lambda kv: -kv[1]["total_ms"]):
+        lineas.append(f"  {k:<28} {f['veces']:>5} {f['primera_ms']:>8.1f}ms "
+                      f"{f['total_ms']:>8.1f}ms {f['max_ms']:>8.1f}ms")
+    lineas.append("")
+    lineas.append("Los hitos posteriores al login incluyen el tiempo que tardó el usuario en entrar.")
+    return "\n".join(lineas) + "\n"
+
+
+def write_summary() -> None:
+    """Escribe resumen.json y resumen.txt en la carpeta de salida y muestra el texto."""
+    if not ENABLED:
+        return
+    datos = summary()
+    texto = summary_text(datos)
+    try:
+        with open(os.path.join(OUT_DIR, "resumen.json"), "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(OUT_DIR, "resumen.txt"), "w", encoding="utf-8") as f:
+            f.write(texto)
+    except OSError as e:
+        print(f"[profiling] No se pudo escribir el resumen: {e}")
+    print(texto)
@@ -0,0 +1,184 @@
+# ===========================================================================================
+# report_pdf.py
+# -------------------------------------------------------------------------------------------
+# Composición del reporte financiero en PDF (ReportLab):
+# - Portada con el periodo, las tarjetas de Ingresos/Gastos/Saldo y los gráficos.
+# - Tabla de gasto por categoría.
+# - Interpretación de Gemini (u otro texto), repartida en las páginas necesarias.
+# Los gráficos llegan como imágenes PIL en memoria (las mismas que dibuja Agg para la
+# pantalla, ver chart_render.py): nunca se escriben archivos temporales.
+# No depende de Tk, por lo que puede usarse desde un hilo de trabajo o sin interfaz.
+# ===========================================================================================
+
+from datetime import date, datetime
+from io import BytesIO
+from typing import BinaryIO, Dict, Optional, Sequence, Union
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfgen import canvas
+
+from constants import (APP_NAME, COLOR_BLANCO, COLOR_PRINCIPAL_AZUL,
+                       COLOR_ROJO_GASTO, COLOR_VERDE_CRECIMIENTO)
+from utils import money
+
+MARGIN = 50
+FONT = "Helvetica"
+FONT_BOLD = "Helvetica-Bold"
+
+
+class _Writer:
+    """Lleva la posición vertical y abre páginas nuevas cuando hace falta."""
+
+    def __init__(self, c: canvas.Canvas, titulo: str):
+        self.c = c
+        self.titulo = titulo
+        self.w, self.h = letter
+        self.page = 1
+        self.y = self.h - MARGIN
+
+    def need(self, alto: float) -> None:
+        if self.y - alto < MARGIN:
+            self.new_page()
+
+    def new_page(self) -> None:
+        self._footer()
+        self.c.showPage()
+        self.page += 1
+        self.y = self.h - MARGIN
+
+    def _footer(self) -> None:
+        self.c.setFont(FONT, 8)
+        self.c.setFillColor(HexColor("#777777"))
+        self.c.drawString(MARGIN, MARGIN / 2, self.titulo)
+        self.c.drawRightString(self.w - MARGIN, MARGIN / 2, f"Página {self.page}")
+
+    def finish(self) -> None:
+        self._footer()
+        self.c.save()
+
+
+def _cards(wr: _Writer, resumen: Dict) -> None:
+    """Tres tarjetas de color con Ingresos, Gastos y Saldo."""
+    c = wr.c
+    ancho = (wr.w - 2 * MARGIN - 20) / 3
+    alto = 58
+    wr.need(alto)
+    tarjetas = (("Ingresos", resumen.get("ingresos", 0), COLOR_VERDE_CRECIMIENTO),
+                ("Gastos", resumen.get("gastos", 0), COLOR_ROJO_GASTO),
+                ("Saldo", resumen.get("saldo", 0), COLOR_PRINCIPAL_AZUL))
+    for i, (titulo, valor, color) in enumerate(tarjetas):
+        x = MARGIN + i * (ancho + 10)
+        c.setFillColor(HexColor(color))
+        c.roundRect(x, wr.y - alto, ancho, alto, 6, stroke=0, fill=1)
+        c.setFillColor(HexColor(COLOR_BLANCO))
+        c.setFont(FONT, 10)
+        c.drawCentredString(x + ancho / 2, wr.y - 18, titulo)
+        c.setFont(FONT_BOLD, 16)
+        c.drawCentredString(x + ancho / 2, wr.y - 42, money(valor))
+    wr.y -= alto + 20
+
+
+def _image(wr: _Writer, img) -> None:
+    """Inserta una imagen PIL escalada al ancho útil de la página."""
+    max_w = wr.w - 2 * MARGIN
+    max_h = wr.h - 2 * MARGIN - 40
+    escala = min(max_w / img.width, max_h / img.height)
+    iw, ih = img.width * escala, img.height * escala
+    wr.need(ih)
+    wr.c.drawImage(ImageReader(img), MARGIN + (max_w - iw) / 2, wr.y - ih, iw, ih,
+                   mask="auto")
+    wr.y -= ih + 16
+
+
+def _heading(wr: _Writer, texto: str) -> None:
+    wr.need(30)
+    wr.c.setFillColor(HexColor(COLOR_PRINCIPAL_AZUL))
+    wr.c.setFont(FONT_BOLD, 13)
+    wr.c.drawString(MARGIN, wr.y - 14, texto)
+    wr.y -= 26
+
+
+def _category_table(wr: _Writer, gastos_cat: Dict[str, float]) -> None:
+    """Tabla de gasto por categoría (de mayor a menor) con su porcentaje."""
+    if not gastos_cat:
+        return
+    _heading(wr, "Gastos por categoría")
+    total = sum(gastos_cat.values()) or 1.0
+    c = wr.c
+    for nombre, valor in sorted(gastos_cat.items(), key=lambda kv: kv[1], reverse=True):
+        wr.need(16)
+        c.setFillColor(HexColor("#333333"))
+        c.setFont(FONT, 10)
+        c.drawString(MARGIN + 6, wr.y - 11, str(nombre))
+        c.drawRightString(wr.w - MARGIN - 70, wr.y - 11, money(valor))
+        c.drawRightString(wr.w - MARGIN - 6, wr.y - 11, f"{valor / total:.0%}")
+        wr.y -= 16
+    wr.y -= 10
+
+
+def _text(wr: _Writer, texto: str) -> None:
+    """Texto libre con ajuste de línea; continúa en páginas nuevas si no cabe."""
+    c = wr.c
+    ancho = wr.w - 2 * MARGIN
+    for parrafo in texto.splitlines():
+        negrita = parrafo.startswith("---")
+        fuente = FONT_BOLD if negrita else FONT
+        lineas = simpleSplit(parrafo.strip("- ") if negrita else parrafo, fuente, 10, ancho) or [""]
+        for linea in lineas:
+            wr.need(14)
+            c.setFillColor(HexColor("#333333"))
+            c.setFont(fuente, 10)
+            c.drawString(MARGIN, wr.y - 10, linea)
+            wr.y -= 14
+
+
+def build_report(out: Union[str, BinaryIO],
+                 d0: date,
+                 d1: date,
+                 resumen: Dict,
+                 charts: Sequence = (),
+                 gastos_cat: Optional[Dict[str, float]] = None,
+                 interpretacion: str = "",
+                 usuario: str = "") -> None:
+    """
+    Genera el PDF del reporte en 'out' (ruta o archivo binario, p. ej. BytesIO).
+    - resumen: {"ingresos", "gastos", "saldo"} del periodo [d0, d1].
+    - charts: imágenes PIL de los gráficos (en el orden en que se muestran).
+    - gastos_cat: {categoría: gasto} para la tabla.
+    - interpretacion: texto de la IA ("--- Título ---" se muestra como subtítulo).
+    """
+    titulo = f"{APP_NAME} · Reporte {d0:%Y-%m-%d} a {d1:%Y-%m-%d}"
+    c = canvas.Canvas(out, pagesize=letter)
+    c.setTitle(titulo)
+    c.setAuthor(usuario or APP_NAME)
+    wr = _Writer(c, titulo)
+
+    c.setFillColor(HexColor(COLOR_PRINCIPAL_AZUL))
+    c.setFont(FONT_BOLD, 20)
+    c.drawString(MARGIN, wr.y - 20, "Reporte financiero")
+    c.setFont(FONT, 10)
+    c.setFillColor(HexColor("#555555"))
+    sub = f"Periodo: {d0:%Y-%m-%d} — {d1:%Y-%m-%d}"
+    if usuario:
+        sub = f"{usuario} · {sub}"
+    c.drawString(MARGIN, wr.y - 36, sub)
+    c.drawRightString(wr.w - MARGIN, wr.y - 36, f"Generado: {datetime.now():%Y-%m-%d %H:%M}")
+    wr.y -= 56
+
+    _cards(wr, resumen)
+    for img in charts:
+        _image(wr, img)
+    _category_table(wr, gastos_cat or {})
+    if interpretacion.strip():
+        _heading(wr, "Interpretación")
+        _text(wr, interpretacion.strip())
+    wr.finish()
+
+
+def report_bytes(*args, **kwargs) -> bytes:
+    """Igual que build_report, pero devuelve el PDF como bytes."""
+    buf = BytesIO()
+    build_report(buf, *args, **kwargs)
+    return buf.getvalue()
@@ -0,0 +1,178 @@
+# ===========================================================================================
+# search_index.py
+# -------------------------------------------------------------------------------------------
+# Índice de búsqueda en memoria para transacciones (descripción y categoría):
+# - Índice invertido: palabra normalizada -> keys de transacciones que la contienen.
+# - Índice de trigramas sobre el vocabulario: permite encontrar palabras que
+#   contienen el texto buscado ("flix" -> "netflix") sin recorrer todas las filas.
+# - Búsqueda por prefijo ("netf") con bisect sobre el vocabulario ordenado.
+# - Insensible a tildes y mayúsculas ("regalias" encuentra "Regalías").
+# - Se construye una vez por versión de datos y se actualiza de forma incremental
+#   al agregar, editar o eliminar transacciones.
+# ===========================================================================================
+
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+_WORD = re.compile(r"\w+")
+
+# Campos de la transacción que se indexan
+FIELDS = ("descripcion", "categoria")
+
+
+def normalize(text: str) -> str:
+    """Quita tildes/diacríticos y pasa a minúsculas: 'Regalías' -> 'regalias'."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    """Divide un texto normalizado en palabras."""
+    return _WORD.findall(normalize(text))
+
+
+@lru_cache(maxsize=65536)
+def _words_of(text: str) -> frozenset:
+    # Las descripciones se repiten mucho (gastos recurrentes): se tokenizan una vez
+    return frozenset(tokenize(text))
+
+
+def _trigrams(word: str) -> Set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class TransactionIndex:
+    """
+    Índice invertido + trigramas sobre las transacciones de un usuario.
+    - version: versión de datos (firebase_service.transactions_version) con la que
+      se construyó; si no coincide, hay que reconstruirlo.
+    """
+
+    def __init__(self, data: Optional[Dict] = None, version: int = 0):
+        self.version = version
+        self._postings: Dict[str, Set[str]] = {}   # palabra -> keys
+        self._docs: Dict[str, Set[str]] = {}       # key -> palabras
+        self._vocab: List[str] = []                # palabras ordenadas (prefijos)
+        self._tri: Dict[str, Set[str]] = {}        # trigrama -> palabras
+        for key, rec in (data or {}).items():
+            self.add(key, rec)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ─── Mantenimiento incremental ──────────────────────────────────────
+
+    def add(self, key: str, record: Dict) -> None:
+        """Indexa (o re-indexa) la transacción 'key'."""
+        if key in self._docs:
+            self.remove(key)
+        words = set()
+        for field in FIELDS:
+            words.update(_words_of(str(record.get(field, ""))))
+        self._docs[key] = words
+        for w in words:
+            keys = self._postings.get(w)
+            if keys is None:
+                keys = self._postings[w] = set()
+                insort(self._vocab, w)
+                for t in _trigrams(w):
+                    self._tri.setdefault(t, set()).add(w)
+            keys.add(key)
+
+    def update(self, key: str, record: Dict) -> None:
+        """Alias de add(): re-indexa tras una edición."""
+        self.add(key, record)
+
+    def remove(self, key: str) -> None:
+        """Quita 'key' del índice (y las palabras que ya nadie usa)."""
+        for w in self._docs.pop(key, ()):
+            keys = self._postings.get(w)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._postings[w]
+                i = bisect_left(self._vocab, w)
+                if i < len(self._vocab) and self._vocab[i] == w:
+                    del self._vocab[i]
+                for t in _trigrams(w):
+                    ws = self._tri.get(t)
+                    if ws is not None:
+                        ws.discard(w)
+                        if not ws:
+                            del self._tri[t]
+
+    # ─── Consulta ───────────────────────────────────────────────────────
+
+    def _words_matching(self, term: str) -> Iterable[str]:
+        """Palabras del vocabulario que empiezan por 'term' o lo contienen (>= 3 letras)."""
+        found = set()
+        i = bisect_left(self._vocab, term)
+        while i < len(self._vocab) and self._vocab[i].startswith(term):
+            found.add(self._vocab[i])
+            i += 1
+        if len(term) >= 3:
+            candidates = None
+            for t in _trigrams(term):
+                ws = self._tri.get(t)
+                if not ws:
+                    candidates = set()
+                    break
+                candidates = set(ws) if candidates is None else candidates & ws
+            found.update(w for w in (candidates or ()) if term in w)
+        return found
+
+    def search(self, query: str) -> Optional[Set[str]]:
+        """
+        Devuelve las keys que coinciden con TODAS las palabras de 'query'.
+        Retorna None si la consulta está vacía (sin filtro).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return None
+        result: Optional[Set[str]] = None
+        # Empezamos por los términos más largos: suelen ser los más selectivos
+        for term in sorted(terms, key=len, reverse=True):
+            keys: Set[str] = set()
+            for w in self._words_matching(term):
+                keys |= self._postings[w]
+            result = keys if result is None else result & keys
+            if not result:
+                return set()
+        return result
+
+
+# Un índice por usuario; se reconstruye solo si cambió la versión de datos.
+_indexes: Dict[str, TransactionIndex] = {}
+
+
+def index_for(uid: str, version: int, data: Dict) -> TransactionIndex:
+    """
+    Devuelve el índice de 'uid' para la versión 'version' de sus datos,
+    construyéndolo desde 'data' solo si la versión cambió.
+    """
+    idx = _indexes.get(uid)
+    if idx is None or idx.version != version:
+        idx = _indexes[uid] = TransactionIndex(data, version)
+    return idx
+
+
+def apply_change(uid: str, old_version: int, new_version: int,
+                 key: str, record: Optional[Dict] = None) -> None:
+    """
+    Aplica al índice de 'uid' una escritura local ya confirmada:
+    - record=None elimina 'key'; si no, la agrega o re-indexa.
+    Solo se actualiza si el índice estaba al día (old_version); en otro caso
+    se deja que index_for lo reconstruya en la próxima búsqueda.
+    """
+    idx = _indexes.get(uid)
+    if idx is None or idx.version != old_version:
+        return
+    if record is None:
+        idx.remove(key)
+    else:
+        idx.update(key, record)
+    idx.version = new_version
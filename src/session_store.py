@@ -0,0 +1,114 @@
+# ===========================================================================================
+# session_store.py
+# -------------------------------------------------------------------------------------------
+# Sesión guardada entre ejecuciones, para entrar sin volver a escribir la contraseña:
+# - Guarda email, uid y refresh token del último login (nunca la contraseña).
+# - Usa el llavero del sistema (paquete 'keyring', en requirements.txt: Llavero de macOS,
+#   Credential Manager de Windows, Secret Service en Linux) si tiene backend.
+# - Si no (p. ej. Linux sin Secret Service, o keyring sin instalar), un archivo en la caché
+#   (<caché>/sesion/sesion.json) con permisos 0600 en una carpeta 0700. El token queda en
+#   texto plano: lo protegen solo esos permisos (en Windows, los de la carpeta del usuario).
+# ===========================================================================================
+
+import json
+import os
+from typing import Dict, Optional
+
+from utils import cache_dir
+
+try:
+    import keyring
+except ImportError:     # El llavero del sistema es opcional
+    keyring = None
+
+SERVICIO = "KlarityFinanzasApp"
+CUENTA = "sesion"
+
+
+def _ruta() -> str:
+    return os.path.join(cache_dir("sesion", private=True), "sesion.json")
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Llavero del sistema (si está disponible)
+# -------------------------------------------------------------------------------------------
+
+def _keyring_save(texto: str) -> bool:
+    if keyring is None:
+        return False
+    try:
+        keyring.set_password(SERVICIO, CUENTA, texto)
+        return True
+    except Exception:   # Sin backend utilizable (p. ej. Linux sin Secret Service)
+        return False
+
+
+def _keyring_load() -> Optional[str]:
+    if keyring is None:
+        return None
+    try:
+        return keyring.get_password(SERVICIO, CUENTA)
+    except Exception:
+        return None
+
+
+def _keyring_clear() -> None:
+    if keyring is None:
+        return
+    try:
+        keyring.delete_password(SERVICIO, CUENTA)
+    except Exception:   # No había nada guardado o no hay backend
+        pass
+
+
+# -------------------------------------------------------------------------------------------
+# 2) API: guardar, leer y olvidar
+# -------------------------------------------------------------------------------------------
+
+def save(sesion: Dict) -> None:
+    """Guarda 'sesion' ({"email", "localId", "refreshToken"}) para la próxima ejecución."""
+    texto = json.dumps(sesion)
+    if _keyring_save(texto):
+        _file_clear()   # Si antes se usó el archivo, no se deja una copia
+        return
+    ruta = _ruta()
+    tmp = ruta + ".tmp"
+    try:
+        # Se crea ya con 0600: el token nunca queda legible por otros usuarios
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(tmp, ruta)
+    except OSError as e:
+        print(f"[session_store] No se pudo guardar la sesión: {e}")
+
+
+def load() -> Optional[Dict]:
+    """Sesión guardada, o None si no hay (o está dañada)."""
+    texto = _keyring_load()
+    if texto is None:
+        try:
+            with open(_ruta(), encoding="utf-8") as f:
+                texto = f.read()
+        except OSError:
+            return None
+    try:
+        sesion = json.loads(texto)
+    except ValueError:
+        return None
+    if not isinstance(sesion, dict) or not sesion.get("refreshToken"):
+        return None
+    return sesion
+
+
+def _file_clear() -> None:
+    try:
+        os.remove(_ruta())
+    except OSError:
+        pass
+
+
+def clear() -> None:
+    """Olvida la sesión guardada (al cerrar sesión o si el token ya no es válido)."""
+    _keyring_clear()
+    _file_clear()
@@ -0,0 +1,237 @@
+# ===========================================================================================
+# stall_watchdog.py
+# -------------------------------------------------------------------------------------------
+# Vigilante (opcional) de bloqueos de la interfaz:
+# - Un latido programado con root.after marca cada vuelta del loop de Tk.
+# - Un hilo monitor revisa el latido; si el loop lleva más del umbral sin latir, toma la
+#   pila del hilo principal (sys._current_frames) y la escribe en un log rotativo.
+# - Cada entrada lleva la vista activa (destino de 'navegar' en el Dashboard), el
+#   callback de Tk que se estaba ejecutando (botón, bind, after…) y el "culpable": la
+#   llamada a Firebase, pandas, matplotlib, etc. que hizo la app, con la línea de la app
+#   desde donde se hizo.
+#
+# Se activa con variables de entorno (leídas por install()):
+#   KLARITY_WATCHDOG=1             activa el vigilante
+#   KLARITY_WATCHDOG_MS=500        umbral de bloqueo en milisegundos
+#   KLARITY_WATCHDOG_LOG=ruta      archivo de log (por defecto, <caché>/logs/bloqueos.log)
+# ===========================================================================================
+
+import logging
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+import traceback
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional, Tuple
+
+from utils import cache_dir
+
+_TRUE = ("1", "true", "si", "sí", "yes", "on")
+
+THRESHOLD_MS = 500          # Bloqueo mínimo que se reporta
+BEAT_MS = 100               # Periodo del latido
+MAX_SAMPLES = 20            # Pilas guardadas por bloqueo (una por periodo de latido)
+
+# Prefijos de módulo que suelen bloquear el loop, con la etiqueta que se reporta
+HEAVY = (
+    ("firebase_service", "firebase"), ("pyrebase", "firebase"), ("firebase_admin", "firebase"),
+    ("requests", "red"), ("urllib3", "red"), ("fake_firebase", "firebase"),
+    ("google", "gemini"), ("pandas", "pandas"), ("numpy", "numpy"),
+    ("matplotlib", "matplotlib"), ("PIL", "imagen"), ("reportlab", "pdf"), ("json", "json"),
+)
+
+_SRC = os.path.dirname(os.path.abspath(__file__))
+
+# Contexto actual de la interfaz (lo actualizan navegar y los callbacks de Tk)
+context: Dict[str, Optional[str]] = {"vista": None, "accion": None}
+
+
+def set_view(nombre: Optional[str]) -> None:
+    """Vista activa del Dashboard ("Transacciones", "Reportes", …)."""
+    context["vista"] = nombre
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Atribución: de una pila a "quién bloqueó"
+# -------------------------------------------------------------------------------------------
+
+def _module_of(frame) -> str:
+    return frame.f_globals.get("__name__", "") or ""
+
+
+def _label_of(modulo: str) -> Optional[str]:
+    raiz = modulo.split(".", 1)[0]
+    for prefijo, etiqueta in HEAVY:
+        if raiz == prefijo:
+            return etiqueta
+    return None
+
+
+def _app_line(f) -> Optional[str]:
+    """'archivo.py:línea en función' si 'f' es código propio de la app (src/)."""
+    archivo = f.f_code.co_filename
+    if os.path.dirname(os.path.abspath(archivo)) != _SRC:
+        return None
+    return f"{os.path.basename(archivo)}:{f.f_lineno} en {f.f_code.co_name}"
+
+
+def culprit(frame) -> Tuple[str, str]:
+    """
+    Atribuye la pila que termina en 'frame' (la más interna). Retorna (quién, dónde):
+    - quién: la llamada a una biblioteca "pesada" que hizo la app, por ejemplo
+      "pandas: pandas.core.frame.apply" (o "app" si el tiempo se va en código propio).
+    - dónde: la línea de la app que la invocó, p. ej. "ui_dashboard.py:48 en resumen_periodo".
+    """
+    pesada = None
+    f = frame
+    while f is not None:
+        modulo = _module_of(f)
+        etiqueta = _label_of(modulo)
+        if etiqueta:
+            # Se sobrescribe al salir: queda la llamada pesada más externa
+            pesada = f"{etiqueta}: {modulo}.{f.f_code.co_name}"
+        else:
+            linea = _app_line(f)
+            if linea:
+                return pesada or "app", linea
+        f = f.f_back
+    return pesada or "otro", f"{frame.f_code.co_filename}:{frame.f_lineno}"
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Etiquetado de callbacks de Tk
+# -------------------------------------------------------------------------------------------
+
+def _name_of(func) -> str:
+    nombre = f"{getattr(func, '__module__', '?')}.{getattr(func, '__qualname__', repr(func))}"
+    code = getattr(func, "__code__", None)
+    if code is not None and "<lambda>" in nombre:
+        nombre += f":{code.co_firstlineno}"
+    return nombre
+
+
+def _install_tk_hook() -> None:
+    """
+    Reemplaza tkinter.CallWrapper por una subclase que anota en 'context' el callback
+    en ejecución. Hereda del CallWrapper vigente, así se combina con tracing.py.
+    """
+    base = tk.CallWrapper
+
+    class _TaggedCallWrapper(base):
+        def __call__(self, *args):
+            previa = context["accion"]
+            context["accion"] = _name_of(self.func)
+            try:
+                return super().__call__(*args)
+            finally:
+                context["accion"] = previa
+
+    tk.CallWrapper = _TaggedCallWrapper
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Vigilante
+# -------------------------------------------------------------------------------------------
+
+class StallWatchdog:
+    """
+    Detecta bloqueos del loop de Tk de más de 'threshold_ms' y los registra en 'log'.
+    - root: ventana raíz (el latido se programa con root.after).
+    """
+
+    def __init__(self, root: tk.Misc, log: logging.Logger,
+                 threshold_ms: int = THRESHOLD_MS, beat_ms: int = BEAT_MS):
+        self.root = root
+        self.log = log
+        self.threshold = threshold_ms / 1000
+        self.beat_ms = beat_ms
+        self._last = time.monotonic()
+        self._main_id = threading.main_thread().ident
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._monitor, name="stall-watchdog",
+                                        daemon=True)
+
+    def start(self) -> None:
+        self._beat()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _beat(self) -> None:
+        self._last = time.monotonic()
+        if not self._stop.is_set():
+            try:
+                self.root.after(self.beat_ms, self._beat)
+            except tk.TclError:         # La raíz ya se destruyó
+                self._stop.set()
+
+    def _monitor(self) -> None:
+        muestras: List[Tuple[str, str, str]] = []   # (culpable, sitio, pila)
+        inicio = None
+        ctx0: Dict = {}
+        while not self._stop.wait(self.beat_ms / 2000):
+            retraso = time.monotonic() - self._last
+            if retraso > self.threshold:
+                frame = sys._current_frames().get(self._main_id)
+                if frame is None:
+                    continue
+                if inicio is None:
+                    inicio = self._last
+                    ctx0 = dict(context)
+                if len(muestras) < MAX_SAMPLES:
+                    quien, sitio = culprit(frame)
+                    muestras.append((quien, sitio, "".join(traceback.format_stack(frame))))
+                if len(muestras) == 1:
+                    self.log.warning("Bloqueo en curso (>%d ms) | vista=%s | accion=%s | %s | %s\n%s",
+                                     self.threshold * 1000, ctx0.get("vista"),
+                                     ctx0.get("accion"), muestras[0][0], muestras[0][1],
+                                     muestras[0][2])
+            elif inicio is not None:
+                self._report(time.monotonic() - inicio, ctx0, muestras)
+                muestras = []
+                inicio = None
+
+    def _report(self, duracion: float, ctx: Dict, muestras: List[Tuple[str, str, str]]) -> None:
+        """Resumen del bloqueo terminado: duración y culpables por frecuencia."""
+        conteo: Dict[Tuple[str, str], int] = {}
+        for quien, sitio, _ in muestras:
+            conteo[(quien, sitio)] = conteo.get((quien, sitio), 0) + 1
+        culpables = "; ".join(f"{q} @ {s} ({n}/{len(muestras)})"
+                              for (q, s), n in sorted(conteo.items(), key=lambda kv: -kv[1]))
+        self.log.warning("Bloqueo de %.0f ms | vista=%s | accion=%s | %s",
+                         duracion * 1000, ctx.get("vista"), ctx.get("accion"), culpables)
+
+
+# -------------------------------------------------------------------------------------------
+# 4) Activación
+# -------------------------------------------------------------------------------------------
+
+def _logger(path: str) -> logging.Logger:
+    log = logging.getLogger("klarity.bloqueos")
+    if not log.handlers:
+        handler = RotatingFileHandler(path, maxBytes=1_000_000, backupCount=5, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    return log
+
+
+def install(root: tk.Misc) -> Optional[StallWatchdog]:
+    """
+    Activa el vigilante si KLARITY_WATCHDOG lo pide; si no, no hace nada y retorna None.
+    Debe llamarse antes de crear las ventanas, para etiquetar todos sus callbacks.
+    """
+    if os.environ.get("KLARITY_WATCHDOG", "").strip().lower() not in _TRUE:
+        return None
+    umbral = int(os.environ.get("KLARITY_WATCHDOG_MS") or THRESHOLD_MS)
+    ruta = os.environ.get("KLARITY_WATCHDOG_LOG") or \
+        os.path.join(cache_dir("logs"), "bloqueos.log")
+    _install_tk_hook()
+    wd = StallWatchdog(root, _logger(ruta), threshold_ms=umbral)
+    wd.start()
+    wd.log.info("Vigilante activo (umbral %d ms)", umbral)
+    return wd
@@ -0,0 +1,211 @@
+# ===========================================================================================
+# tracing.py
+# -------------------------------------------------------------------------------------------
+# Trazas de extremo a extremo, de la acción en la interfaz a las llamadas de red:
+# - span(nombre): bloque medido con padre/hijo. El span activo viaja en una ContextVar,
+#   así que las llamadas a Firebase (ver metrics.instrumented) y a Gemini hechas dentro
+#   de una acción quedan como hijas suyas, también en hilos lanzados con el contexto
+#   copiado (utils.run_with_progress, utils.RenderScheduler).
+# - Cada span raíz abre una traza con un id de correlación (trace_id) que heredan todos
+#   sus descendientes.
+# - Cada callback de Tk (botón, bind, trace de variables, after) abre un span "ui";
+#   los que duran menos de MIN_UI_MS y no tienen hijos se descartan (movimiento del
+#   ratón, sondeos periódicos…).
+# - Exporta en formato Chrome trace-event JSON: se abre en chrome://tracing o en
+#   https://ui.perfetto.dev para ver la interacción completa en una línea de tiempo.
+#
+# Se activa con KLARITY_TRACE=1 (archivo en <caché>/trazas/) o KLARITY_TRACE=ruta.json;
+# el archivo se escribe al cerrar la app. Sin activar, span() no mide nada y
+# traced() devuelve la función original.
+# ===========================================================================================
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tkinter as tk
+from datetime import datetime
+from itertools import count
+from typing import Callable, Dict, List, Optional
+
+T0 = time.perf_counter()
+MIN_UI_MS = 2.0                 # Callbacks de Tk más cortos (y sin hijos) no se guardan
+MAX_EVENTS = 500_000            # Tope de eventos en memoria
+
+ENABLED = False
+OUT_PATH: Optional[str] = None
+
+_events: List[Dict] = []
+_threads: Dict[int, str] = {}
+_ids = count(1)
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("klarity_span",
+                                                                           default=None)
+
+
+# -------------------------------------------------------------------------------------------
+# 1) Spans
+# -------------------------------------------------------------------------------------------
+
+class Span:
+    """Un tramo medido. Se usa como context manager (ver span())."""
+
+    __slots__ = ("name", "cat", "args", "trace_id", "span_id", "parent", "start",
+                 "children", "_token")
+
+    def __init__(self, name: str, cat: str, args: Dict):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.parent = _current.get()
+        self.span_id = next(_ids)
+        self.trace_id = self.parent.trace_id if self.parent else f"{self.span_id:08x}"
+        self.children = 0
+        self.start = 0.0
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        if self.parent is not None:
+            self.parent.children += 1
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        fin = time.perf_counter()
+        _current.reset(self._token)
+        dur_ms = (fin - self.start) * 1000
+        if self.cat == "ui" and self.children == 0 and dur_ms < MIN_UI_MS:
+            return
+        args = dict(self.args)
+        args.update(trace_id=self.trace_id, span_id=self.span_id,
+                    parent_id=self.parent.span_id if self.parent else None)
+        if exc_type is not None:
+            args["error"] = exc_type.__name__
+        _emit(self.name, self.cat, self.start, fin, args)
+
+
+class _NoSpan:
+    """Span vacío que se usa cuando las trazas están desactivadas."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, cat: str = "app", **args):
+    """Context manager que mide el bloque como hijo del span activo (o como raíz)."""
+    if not ENABLED:
+        return _NO_SPAN
+    return Span(name, cat, args)
+
+
+def traced(name: Optional[str] = None, cat: str = "app") -> Callable:
+    """Decorador: cada llamada es un span 'name' (por defecto, el nombre de la función)."""
+    def deco(fn: Callable) -> Callable:
+        if not ENABLED:
+            return fn
+        nombre = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            with Span(nombre, cat, {}):
+                return fn(*a, **kw)
+        return wrapper
+    return deco
+
+
+def current_trace_id() -> Optional[str]:
+    """Id de correlación de la traza activa (None si no hay ninguna)."""
+    s = _current.get()
+    return s.trace_id if s else None
+
+
+def _emit(name: str, cat: str, inicio: float, fin: float, args: Dict) -> None:
+    if len(_events) >= MAX_EVENTS:
+        return
+    hilo = threading.current_thread()
+    _threads.setdefault(hilo.ident, hilo.name)
+    _events.append({"name": name, "cat": cat, "ph": "X", "pid": os.getpid(), "tid": hilo.ident,
+                    "ts": round((inicio - T0) * 1e6, 1), "dur": round((fin - inicio) * 1e6, 1),
+                    "args": args})
+
+
+# -------------------------------------------------------------------------------------------
+# 2) Callbacks de Tk como acciones de la interfaz
+# -------------------------------------------------------------------------------------------
+
+def _callback_name(func) -> str:
+    nombre = getattr(func, "__qualname__", None) or repr(func)
+    code = getattr(func, "__code__", None)
+    if code is not None and "<lambda>" in nombre:
+        nombre += f":{code.co_firstlineno}"
+    return f"{getattr(func, '__module__', '?')}.{nombre}"
+
+
+def _install_tk_hook() -> None:
+    base = tk.CallWrapper
+
+    class _TracedCallWrapper(base):
+        def __call__(self, *args):
+            with Span(_callback_name(self.func), "ui", {}):
+                return super().__call__(*args)
+
+    tk.CallWrapper = _TracedCallWrapper
+
+
+# -------------------------------------------------------------------------------------------
+# 3) Activación y exportación
+# -------------------------------------------------------------------------------------------
+
+def configure() -> bool:
+    """
+    Activa las trazas si KLARITY_TRACE está definida. Debe llamarse al arrancar, antes
+    de importar los módulos que usan @traced y de crear ventanas. Retorna True si quedó activo.
+    """
+    global ENABLED, OUT_PATH
+    destino = os.environ.get("KLARITY_TRACE", "").strip()
+    if not destino or destino.lower() in ("0", "false", "no"):
+        return False
+    if destino.lower() in ("1", "true", "si", "sí", "yes"):
+        from utils import cache_dir
+        destino = os.path.join(cache_dir("trazas"), f"traza_{datetime.now():%Y%m%d_%H%M%S}.json")
+    OUT_PATH = destino
+    ENABLED = True
+    _install_tk_hook()
+    atexit.register(write)
+    print(f"[tracing] Trazas activas → {OUT_PATH}")
+    return True
+
+
+def chrome_trace() -> Dict:
+    """Eventos acumulados en formato Chrome trace-event (con nombres de hilo)."""
+    pid = os.getpid()
+    meta = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": nombre}}
+            for tid, nombre in list(_threads.items())]
+    meta.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                 "args": {"name": "Klarity"}})
+    return {"traceEvents": meta + list(_events), "displayTimeUnit": "ms"}
+
+
+def write(path: Optional[str] = None) -> Optional[str]:
+    """Escribe la traza en 'path' (por defecto, la ruta configurada). Retorna la ruta."""
+    path = path or OUT_PATH
+    if not ENABLED or not path:
+        return None
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(chrome_trace(), f, ensure_ascii=False)
+    except OSError as e:
+        print(f"[tracing] No se pudo escribir {path}: {e}")
+        return None
+    return path
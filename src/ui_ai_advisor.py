@@ -4,7 +4,8 @@
 # Módulo “Asistente AI” de KlarityFinanzasApp:
 # - Permite generar resúmenes, consejos y planes de mejora basados en transacciones.
 # - Soporta consultas libres.
-# - Almacena un historial de sugerencias en Firebase.
+# - Almacena un historial de sugerencias en Firebase (cabeceras paginadas; el texto
+#   completo se descarga solo al abrir una sugerencia).
 # - Utiliza Google Generative AI (Gemini) para el procesamiento de lenguaje.
 # ===========================================================================================
 
@@ -27,6 +28,7 @@ from constants import (
 )
 from utils import clear_frame
 import firebase_service as fb
+import tracing
 
 # ─── Configuración para cargar la clave de Gemini ────────────────────────────────────────
 # Obtenemos la carpeta raíz y agregamos 'config' al path para importar gemini_config.py
@@ -50,6 +52,23 @@ except Exception as e:
     print(f"[ui_ai_advisor] No se pudo inicializar Gemini: {e}")
 
 
+def build_prompt(template: str, raw: dict, desde: date, hasta: date):
+    """
+    Prompt de 'template' con las transacciones de 'raw' entre 'desde' y 'hasta'
+    (ambos incluidos) en JSON. Retorna None si no hay transacciones en el rango.
+    """
+    d0 = datetime.combine(desde, datetime.min.time()).timestamp()
+    d1 = datetime.combine(hasta, datetime.min.time()).timestamp() + 86400
+    txs = [v for v in (raw or {}).values() if d0 <= v['fecha'] < d1]
+    if not txs:
+        return None
+    return template.format(
+        desde=desde.isoformat(),
+        hasta=hasta.isoformat(),
+        json_txs=json.dumps(txs, indent=2)
+    )
+
+
 def build(frame: tk.Frame, user: dict):
     """
     Construye la interfaz del Asistente AI:
@@ -122,37 +141,32 @@ def build(frame: tk.Frame, user: dict):
             messagebox.showerror("API", "Gemini no está configurado.", parent=frame)
             return
 
-        # 4.2) Filtrar transacciones por rango de fecha
-        d0 = datetime.combine(date_from.get_date(), datetime.min.time()).timestamp()
-        d1 = datetime.combine(date_to.get_date(), datetime.min.time()).timestamp() + 86400
-        txs = [v for v in (raw or {}).values() if d0 <= v['fecha'] < d1]
-        if not txs:
+        # 4.2) Filtrar transacciones por rango de fecha y construir el prompt
+        #      usando la plantilla con datos JSON
+        with tracing.span("asistente.prompt"):
+            prompt = build_prompt(template, raw, date_from.get_date(), date_to.get_date())
+        if prompt is None:
             messagebox.showinfo("Sin datos", "No hay transacciones en ese rango.", parent=frame)
             return
 
-        # 4.3) Construir prompt usando la plantilla con datos JSON
-        prompt = template.format(
-            desde=date_from.get_date().isoformat(),
-            hasta=date_to.get_date().isoformat(),
-            json_txs=json.dumps(txs, indent=2)
-        )
-
         # 4.4) Mostrar mensaje de espera y generar en fondo
         out.delete("1.0", tk.END)
         out.insert(tk.END, "Generando, por favor espera...")
         frame.update_idletasks()
 
         try:
-            resp = model.generate_content(prompt).text
+            with tracing.span("gemini.generate_content", cat="gemini",
+                              prompt_chars=len(prompt)):
+                resp = model.generate_content(prompt).text
         except Exception as e:
             messagebox.showerror("Error API", str(e), parent=frame)
             return
 
         # 4.5) Guardar en Firebase y mostrar resultado
-        fb.save_ai_suggestion(uid, resp)
+        cabecera = fb.save_ai_suggestion(uid, resp)
         out.delete("1.0", tk.END)
         out.insert(tk.END, resp)
-        load_history()  # Refrescar historial tras guardar
+        add_header(cabecera, arriba=True)  # Agregarla al historial sin releerlo
 
     # Botones rápidos que usan distintas plantillas de prompt
     tk.Button(
@@ -225,15 +239,17 @@ def build(frame: tk.Frame, user: dict):
         frame.update_idletasks()
 
         try:
-            resp = model.generate_content(prompt).text
+            with tracing.span("gemini.generate_content", cat="gemini",
+                              prompt_chars=len(prompt)):
+                resp = model.generate_content(prompt).text
         except Exception as e:
             messagebox.showerror("Error API", str(e), parent=frame)
             return
 
-        fb.save_ai_suggestion(uid, resp)
+        cabecera = fb.save_ai_suggestion(uid, resp)
         out.delete("1.0", tk.END)
         out.insert(tk.END, resp)
-        load_history()
+        add_header(cabecera, arriba=True)
 
     tk.Button(
         qframe, text="Enviar",
@@ -282,40 +298,58 @@ def build(frame: tk.Frame, user: dict):
     # 8) Funciones de gestión de historial
     # ────────────────────────────────────────────────────────────────────────────
 
+    historial = {"ultimo": None}   # ts más antiguo mostrado (para pedir la página siguiente)
+
+    def add_header(cab, arriba=False):
+        """Inserta una cabecera {"ts", "titulo", "largo"} en el Treeview."""
+        ts_str = str(cab["ts"])
+        if tree.exists(ts_str):
+            return
+        try:
+            dt = datetime.fromtimestamp(int(ts_str)).strftime("%Y-%m-%d %H:%M")
+        except (TypeError, ValueError):
+            dt = ts_str
+        tree.insert("", 0 if arriba else "end", iid=ts_str, values=(dt, cab.get("titulo", "")))
+
     def load_history():
         """
-        Recupera sugerencias de Firebase y las muestra en el Treeview.
-        Solo mostramos fecha y primer renglón como extracto.
+        Recupera la primera página de cabeceras (las más recientes) y las muestra en el
+        Treeview: fecha y primer renglón como extracto, sin bajar los textos completos.
         """
         tree.delete(*tree.get_children())
-        suggestions, _ = fb.get_ai_suggestions(uid)
-
-        # Orden descendente por timestamp
-        for ts_str, rec in sorted(suggestions.items(), reverse=True):
-            try:
-                dt = datetime.fromtimestamp(int(ts_str)).strftime("%Y-%m-%d %H:%M")
-            except:
-                dt = ts_str
-            excerpt = rec["texto"].split("\n",1)[0]
-            tree.insert("", "end", iid=ts_str, values=(dt, excerpt))
+        historial["ultimo"] = None
+        load_more()
+
+    def load_more():
+        """Agrega al final la página de cabeceras anterior a la última mostrada."""
+        pagina, _ = fb.get_ai_suggestion_headers(uid, antes=historial["ultimo"])
+        for cab in pagina.values():      # Orden descendente por timestamp
+            add_header(cab)
+        if pagina:
+            historial["ultimo"] = list(pagina)[-1]
+        # Si la página vino completa puede haber más
+        if len(pagina) >= fb.PAGINA_SUGERENCIAS:
+            btn_more.pack(pady=4)
+        else:
+            btn_more.pack_forget()
 
     def on_select(event):
         """
         Cuando el usuario selecciona un elemento del historial,
-        mostramos el texto completo en el área de salida.
+        mostramos el texto completo en el área de salida (se descarga
+        solo esa sugerencia, y una sola vez).
         """
         sel = tree.selection()
         if not sel:
             return
         ts = sel[0]
-        suggestions, _ = fb.get_ai_suggestions(uid)
-        text = suggestions.get(ts, {}).get("texto", "")
+        text, _ = fb.get_ai_suggestion(uid, ts)
         out.delete("1.0", tk.END)
         out.insert(tk.END, text)
 
     def delete_selected():
         """
-        Elimina la sugerencia seleccionada de Firebase y actualiza la vista.
+        Elimina la sugerencia seleccionada de Firebase y la quita de la vista.
         """
         sel = tree.selection()
         if not sel:
@@ -323,8 +357,9 @@ def build(frame: tk.Frame, user: dict):
         ts = sel[0]
         if not messagebox.askyesno("Confirmar", "¿Eliminar esta sugerencia?", parent=frame):
             return
-        fb.delete_ai_suggestion(uid, ts)
-        load_history()
+        ok, _ = fb.delete_ai_suggestion(uid, ts)
+        if ok:
+            tree.delete(ts)
         out.delete("1.0", tk.END)
 
     tree.bind("<<TreeviewSelect>>", on_select)
@@ -339,6 +374,15 @@ def build(frame: tk.Frame, user: dict):
     )
     btn_del.pack(pady=4)
 
+    btn_more = tk.Button(
+        hframe,
+        text="Cargar más",
+        bg=COLOR_PRINCIPAL_AZUL,
+        fg=COLOR_BLANCO,
+        font=FONT_NORMAL,
+        command=load_more
+    )
+
 
     # ────────────────────────────────────────────────────────────────────────────
     # 9) Carga inicial del historial para mostrar al entrar
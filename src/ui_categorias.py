@@ -90,13 +90,15 @@ def build(frame: tk.Frame, user: dict):
 
     def cargar(items=None):
         """
-        Carga las categorías desde Firebase y las inserta en la tabla.
+        Carga las categorías (desde la caché de firebase_service) y las inserta en la tabla.
         - items: lista pre-ordenada [(key, data), ...], si no se pasa,
           se obtienen y usan en orden original.
         """
         tree.delete(*tree.get_children())
-        cats_dict, _ = fb.get_categories(uid)
-        data_list = items if items is not None else list(cats_dict.items())
+        if items is None:
+            idx, _ = fb.get_category_index(uid)
+            items = list(idx.by_key.items())
+        data_list = items
 
         # Si no hay categorías, mostramos fila indicativa
         if not data_list:
@@ -113,9 +115,10 @@ def build(frame: tk.Frame, user: dict):
         """
         Ordena las categorías por columna 'col' (Nombre o Tipo).
         Alterna ascendente/descendente según sort_reverse.
+        El orden es local: usa la caché, sin volver a Firebase.
         """
-        cats_dict, _ = fb.get_categories(uid)
-        items = list(cats_dict.items())
+        idx, _ = fb.get_category_index(uid)
+        items = list(idx.by_key.items())
         # Ordenamos usando la clave correspondiente en el diccionario
         items.sort(
             key=lambda x: x[1][col.lower()],
@@ -219,9 +222,10 @@ def build(frame: tk.Frame, user: dict):
         """
         sel = tree.selection()
         if sel:
-            cats_dict, _ = fb.get_categories(uid)
+            idx, _ = fb.get_category_index(uid)
             key = sel[0]
-            modal_cat(cat=cats_dict[key], key=key)
+            if key in idx.by_key:
+                modal_cat(cat=idx.by_key[key], key=key)
 
 
     # ────────────────────────────────────────────────────────────────
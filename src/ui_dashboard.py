@@ -6,18 +6,26 @@
 # - Construye barra lateral de navegación.
 # - Gestiona contenido dinámico: Home, Transacciones, Categorías, Reportes, Asistente AI, Perfil.
 # - Permite cerrar sesión y volver al login.
+# - Panel oculto de diagnóstico (Ctrl+Shift+D) con los tiempos de Firebase (metrics.py).
 # ===========================================================================================
 
 import tkinter as tk                             # Widgets básicos
 from tkinter import ttk                          # Widgets “themed” (combobox, treeview...)
+from tkinter import messagebox                   # Aviso de sesión cerrada
 from datetime import datetime, date, timedelta   # Para manejo de fechas
 from tkcalendar import DateEntry                # Selector de fecha en GUI
 
 from constants import *                          # Colores, fuentes y otros valores
-from utils import clear_frame                    # Función para limpiar contenedores
+from utils import clear_frame, RenderScheduler, run_in_background, cache_dir  # Limpieza, redibujado agrupado, 2º plano
 
 # Importamos los módulos de cada sección para renderizar en el panel central
 import firebase_service as fb
+import metrics                                   # Tiempos de Firebase (panel de diagnóstico)
+import stall_watchdog                            # Vista activa para los reportes de bloqueos
+import profiling                                 # Fases del modo de perfilado
+import tracing                                   # Span de cada navegación
+import columnar                                  # Transacciones por columnas para el Home
+import ledger_store                              # Caché en disco (columnas mapeadas) para arrancar
 import ui_transacciones as trans
 import ui_categorias as cats
 import ui_reportes as reps
@@ -25,12 +33,131 @@ import ui_perfil as perfil
 import ui_ai_advisor as advisor
 
 import pandas as pd                              # Para DataFrame y manipulación de datos
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt                  # Para crear gráficos
+import numpy as np                               # Series de los gráficos desde la instantánea
+from chart_render import ChartView               # Gráficos renderizados con Agg en segundo plano
 
 import os                                        # Para comprobar existencia de archivos
-from PIL import Image, ImageTk, ImageOps, ImageDraw
-                                                # Para cargar y manipular imágenes
+import json                                      # Instantánea del Home en disco
+from image_cache import get_photo, MASK_CIRCLE   # Logo y avatar decodificados una sola vez
+
+# ===========================================================================================
+# Cálculos del Home (sin Tk, también los usa benchmarks/bench.py)
+# ===========================================================================================
+
+def resumen_periodo(raw, d0, d1):
+    """
+    Transacciones de 'raw' ({key: {...}} o su columnar.Ledger) con fecha en [d0, d1)
+    como DataFrame (con la columna "signed": monto con signo) y sus totales.
+    Retorna (df_r, saldo, ingresos, gastos), o None si no hay transacciones.
+    """
+    # DataFrame sobre las columnas del Ledger (sin un dict por transacción)
+    led = raw if isinstance(raw, columnar.Ledger) else columnar.Ledger.from_raw(raw)
+    if not len(led):
+        return None
+
+    # Convertimos timestamp a datetime y filtramos por rango
+    df = led.to_dataframe(fechas=True)
+    df_r = df[(df["fecha"] >= pd.Timestamp(d0)) &
+              (df["fecha"] <  pd.Timestamp(d1))].copy()
+
+    # Calculamos totales: ingresos, gastos, saldo
+    df_r["signed"] = df_r["monto"].where(df_r["tipo"]=="Ingreso", -df_r["monto"])
+    saldo = df_r["signed"].sum()
+    ing   = df_r[df_r["tipo"]=="Ingreso"]["monto"].sum()
+    gas   = df_r[df_r["tipo"]=="Gasto"]["monto"].sum()
+    return df_r, saldo, ing, gas
+
+
+def rango_fechas(led):
+    """(primera, última) fecha con movimientos del Ledger; sin datos, (hoy, hoy)."""
+    rango = led.rango()
+    if rango is None:
+        hoy = date.today()
+        return hoy, hoy
+    return (datetime.fromtimestamp(rango[0]).date(),
+            datetime.fromtimestamp(rango[1]).date())
+
+
+def gastos_por_categoria(df_r):
+    """Serie {categoría: gasto} del periodo (para el pastel)."""
+    serie = (df_r[df_r["tipo"]=="Gasto"]
+             .groupby("categoria", observed=True)["monto"].sum())
+    serie.index = serie.index.astype(str)
+    return serie
+
+
+def saldo_acumulado(df_r):
+    """Saldo acumulado día a día en el periodo (para la línea)."""
+    return (df_r.sort_values("fecha")
+            .set_index("fecha")["signed"]
+            .cumsum()
+            .resample("D").last().ffill())
+
+
+def estado_home(led, d0, d1):
+    """
+    Lo que pinta el Home para [d0, d1): tarjetas y series de los gráficos, en tipos
+    simples para guardarlo tal cual en la instantánea. None si no hay transacciones.
+    """
+    calculo = resumen_periodo(led, d0, d1)
+    if calculo is None:
+        return None
+    df_r, saldo, ing, gas = calculo
+    cat = gastos_por_categoria(df_r)
+    serie = saldo_acumulado(df_r)
+    return {
+        "saldo": float(saldo), "ingresos": float(ing), "gastos": float(gas),
+        "pastel": [list(cat.index), cat.to_numpy().tolist()],
+        "saldo_acum": [serie.index.strftime("%Y-%m-%d").tolist(), serie.to_numpy().tolist()],
+    }
+
+
+# -------------------------------------------------------------------------------------------
+# Instantánea del Home: lo último que se pintó (saludo, periodo, tarjetas y series),
+# por usuario, para mostrarlo al abrir sin esperar a Firebase. La carpeta es privada (0700)
+# y la instantánea se borra al cerrar sesión.
+# -------------------------------------------------------------------------------------------
+
+FORMATO_INSTANTANEA = 1
+
+
+def _ruta_instantanea(uid):
+    nombre = "".join(c if c.isalnum() or c in "-_" else "_" for c in uid)
+    return os.path.join(cache_dir("home", private=True), nombre + ".json")
+
+
+def cargar_instantanea(uid):
+    """Instantánea guardada de 'uid', o None si no hay o no se puede leer."""
+    try:
+        with open(_ruta_instantanea(uid), encoding="utf-8") as f:
+            snap = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snap, dict) or snap.get("formato") != FORMATO_INSTANTANEA:
+        return None
+    return snap
+
+
+def guardar_instantanea(uid, snap):
+    """Guarda la instantánea de 'uid' (escritura atómica: tmp + os.replace)."""
+    ruta = _ruta_instantanea(uid)
+    try:
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snap, f, ensure_ascii=False)
+        os.replace(ruta + ".tmp", ruta)
+    except OSError as e:
+        print(f"[dashboard] No se pudo guardar la instantánea: {e}")
+
+
+def borrar_instantanea(uid):
+    """Elimina la instantánea de 'uid' (al cerrar sesión)."""
+    try:
+        os.remove(_ruta_instantanea(uid))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"[dashboard] No se pudo borrar la instantánea: {e}")
+
 
 # ===========================================================================================
 # Clase DashboardWindow
@@ -41,6 +168,9 @@ from PIL import Image, ImageTk, ImageOps, ImageDraw
 # 2) Panel central dinámico según la sección elegida.
 # ===========================================================================================
 
+VIGILANCIA_SESION_MS = 1000     # Cada cuánto se revisa fb.session_lost()
+
+
 class DashboardWindow:
     def __init__(self, root, user):
         """
@@ -55,8 +185,26 @@ class DashboardWindow:
         self.win.title("Klarity – Dashboard")
         self.win.geometry("1024x720")               # Tamaño inicial
         self.win.configure(bg=COLOR_FONDO_GRIS)
+        # Cambios de categorías hechos en otro lugar invalidan la caché local
+        self._cat_stream = fb.watch_categories(user["localId"])
+        self.win.bind("<Destroy>", self._on_destroy)
+        # Atajo oculto: panel de diagnóstico con los tiempos de Firebase
+        self._diag = None
+        self.win.bind("<Control-Shift-D>", self._diagnostics)
         self._build_ui()                            # Construye todos los elementos UI
+        # Si la sesión se invalida (token revocado, contraseña cambiada...), vuelve al login
+        self.win.after(VIGILANCIA_SESION_MS, self._vigilar_sesion)
+
+    def _on_destroy(self, event):
+        """Cierra la suscripción a categorías cuando se destruye la ventana."""
+        if event.widget is self.win and self._cat_stream is not None:
+            try:
+                self._cat_stream.close()
+            except Exception:
+                pass
+            self._cat_stream = None
 
+    @profiling.profiled("dashboard._build_ui")
     def _build_ui(self):
         """
         Genera la interfaz completa:
@@ -75,10 +223,8 @@ class DashboardWindow:
 
         # ------ Logo en la parte superior ------
         try:
-            # Intentamos cargar logo desde assets/
-            logo = Image.open("assets/klarity_logo.png")\
-                        .resize((80, 80), Image.Resampling.LANCZOS)
-            ph_logo = ImageTk.PhotoImage(logo)
+            # Intentamos cargar logo desde assets/ (vía caché de imágenes)
+            ph_logo = get_photo("assets/klarity_logo.png", (80, 80))
             tk.Label(nav, image=ph_logo,
                      bg=COLOR_PRINCIPAL_AZUL).pack(pady=(18, 8))
             nav.logo = ph_logo  # Guardamos referencia para evitar GC
@@ -118,7 +264,10 @@ class DashboardWindow:
             btn = self.btn_refs[name]
             btn.configure(bg=COLOR_VERDE_CRECIMIENTO)
             self.selected = btn
-            fn()
+            stall_watchdog.set_view(name)   # Contexto para los reportes de bloqueos
+            with tracing.span(f"navegar.{name}", cat="ui"), \
+                    profiling.phase(f"seccion.{name}"):
+                fn()
 
         # Creamos botones dinámicamente
         for txt, fn in items:
@@ -156,12 +305,15 @@ class DashboardWindow:
         self.content.pack(side="right", fill="both", expand=True)
 
         # Carga inicial: sección Home
+        stall_watchdog.set_view("Dashboard")
         self._home()
+        self.win.after_idle(profiling.mark_once, "dashboard_pintado")
 
     # =======================================================================================
     #  Secciones dinámicas: Home, o "sección principal"
     # =======================================================================================
 
+    @profiling.profiled("dashboard._home")
     def _home(self):
         """
         Renderiza la vista de inicio:
@@ -173,51 +325,70 @@ class DashboardWindow:
         # 1) Limpiamos cualquier widget anterior
         clear_frame(self.content)
 
-        # 2) Cabecera con saludo
+        # 2) Datos para pintar. En el primer Home de la sesión no se espera a Firebase:
+        #    se usa la instantánea del último Home pintado (saludo, tarjetas y series) y
+        #    las columnas mapeadas de ledger_store; la lectura real llega en segundo
+        #    plano y solo se redibuja si cambió algo.
         uid = self.user["localId"]
-        perfil_data, _ = fb.get_profile(uid)
-        nombre = perfil_data.get("nombre") or self.user["email"]
+        datos = {"ledger": None, "version": fb.transactions_version(uid), "huella": None,
+                 "snap": None, "perfil": None}
+        if datos["version"] == 0:
+            datos["snap"] = cargar_instantanea(uid)
+            datos["ledger"] = ledger_store.load(uid)
+        en_2o_plano = datos["snap"] is not None or datos["ledger"] is not None
+
+        if datos["snap"] is not None:
+            datos["perfil"] = datos["snap"]["perfil"]
+        else:
+            perfil_data, _ = fb.get_profile(uid)
+            datos["perfil"] = {"nombre": perfil_data.get("nombre"),
+                               "foto": perfil_data.get("foto")}
+
+        # 3) Cabecera con saludo
         header = tk.Frame(self.content, bg=COLOR_FONDO_GRIS)
         header.pack(fill="x", pady=(8, 4), padx=6)
-        tk.Label(header,
-                 text=f"¡Bienvenido/a {nombre}!",
-                 font=FONT_TITLE,
-                 bg=COLOR_FONDO_GRIS,
-                 fg=COLOR_PRINCIPAL_AZUL
-                 ).pack(side="left")
-
-        # Posible foto de perfil clicable para ir a la sección Perfil
-        foto_path = perfil_data.get("foto")
-        if foto_path and os.path.exists(foto_path):
-            try:
-                img = Image.open(foto_path)\
-                           .resize((60, 60), Image.Resampling.LANCZOS)
-                # Creamos máscara circular
-                mask = Image.new("L", (60, 60), 0)
-                ImageDraw.Draw(mask).ellipse((0, 0, 60, 60), fill=255)
-                img.putalpha(mask)
-                ph = ImageTk.PhotoImage(img)
-                pic = tk.Label(header, image=ph,
-                               bg=COLOR_FONDO_GRIS,
-                               cursor="hand2")
-                pic.image = ph
-                pic.pack(side="right")
-                # Al click invocamos botón de 'Perfil'
-                pic.bind("<Button-1>",
-                         lambda e: self.btn_refs["Perfil"].invoke())
-            except Exception:
-                pass
 
-        # 3) Rango total de datos (para limitar DateEntry)
-        raw, _ = fb.get_transactions(uid)
-        fechas = [datetime.fromtimestamp(v["fecha"]).date()
-                  for v in (raw or {}).values() if "fecha" in v]
-        if fechas:
-            min_date, max_date = min(fechas), max(fechas)
+        def pintar_cabecera():
+            clear_frame(header)
+            nombre = datos["perfil"].get("nombre") or self.user["email"]
+            tk.Label(header,
+                     text=f"¡Bienvenido/a {nombre}!",
+                     font=FONT_TITLE,
+                     bg=COLOR_FONDO_GRIS,
+                     fg=COLOR_PRINCIPAL_AZUL
+                     ).pack(side="left")
+
+            # Posible foto de perfil clicable para ir a la sección Perfil
+            foto_path = datos["perfil"].get("foto")
+            if foto_path and os.path.exists(foto_path):
+                try:
+                    # Avatar circular 60x60: se decodifica solo si la foto cambió
+                    ph = get_photo(foto_path, (60, 60), MASK_CIRCLE)
+                    pic = tk.Label(header, image=ph,
+                                   bg=COLOR_FONDO_GRIS,
+                                   cursor="hand2")
+                    pic.image = ph
+                    pic.pack(side="right")
+                    # Al click invocamos botón de 'Perfil'
+                    pic.bind("<Button-1>",
+                             lambda e: self.btn_refs["Perfil"].invoke())
+                except Exception:
+                    pass
+
+        pintar_cabecera()
+
+        # Transacciones y rango total de datos (para limitar DateEntry)
+        if not en_2o_plano:
+            raw, _ = fb.get_transactions(uid)
+            datos["version"] = fb.transactions_version(uid)
+            datos["ledger"] = columnar.ledger_for(uid, datos["version"], raw)
+        if datos["ledger"] is not None:
+            datos["huella"] = datos["ledger"].fingerprint()
+            min_date, max_date = rango_fechas(datos["ledger"])
         else:
-            max_date = date.today()
-            min_date = max_date - timedelta(days=30)
-            min_date = max_date
+            min_date = date.fromisoformat(datos["snap"]["min"])
+            max_date = date.fromisoformat(datos["snap"]["max"])
+        profiling.mark_once("primera_lectura")
 
         # 4) Barra de filtros: periodo rápido + selectores
         toolbar = tk.Frame(self.content, bg=COLOR_FONDO_GRIS)
@@ -271,6 +442,13 @@ class DashboardWindow:
         date_to.pack(side="left", padx=4)
         date_to.set_date(max_date)
 
+        # Se restaura el último periodo pintado (si sigue dentro de los datos)
+        if datos["snap"] is not None:
+            d0, d1 = (date.fromisoformat(d) for d in datos["snap"]["rango"])
+            if min_date <= d0 <= d1 <= max_date:
+                date_from.set_date(d0)
+                date_to.set_date(d1)
+
         btn_apply = ttk.Button(toolbar, text="Aplicar filtro")
         btn_apply.pack(side="left", padx=6)
 
@@ -282,6 +460,14 @@ class DashboardWindow:
         ttk.Checkbutton(toolbar, text="Pastel", variable=show_pie).pack(side="left", padx=2)
         ttk.Checkbutton(toolbar, text="Saldo",  variable=show_line).pack(side="left", padx=2)
 
+        # Indicador discreto mientras llega la lectura real en segundo plano
+        actualizando = tk.Label(toolbar,
+                                text="Actualizando…",
+                                bg=COLOR_FONDO_GRIS,
+                                fg=COLOR_TEXTO_GRIS,
+                                font=("Lato", 9, "italic")
+                                )
+
         # 5) Contenedor 'resumen' para tarjetas y gráficos
         resumen = tk.Frame(self.content, bg=COLOR_FONDO_GRIS)
         resumen.pack(fill="both", expand=True)
@@ -289,13 +475,40 @@ class DashboardWindow:
         # ---------------------------------------------
         # Función interna: renderizar tarjetas y gráficos
         # ---------------------------------------------
+        views = []  # ChartView activos (para cancelar su trabajo al redibujar)
+
         def render():
-            # Limpia contenido previo
+            # Cancelamos gráficos pendientes y limpiamos contenido previo
+            for v in views:
+                v.cancel()
+            views.clear()
             clear_frame(resumen)
 
-            # Construye DataFrame con todas las transacciones
-            df = pd.DataFrame(list((raw or {}).values()))
-            if df.empty:
+            # Rango seleccionado. Si es el de la instantánea y los datos no cambiaron
+            # desde entonces, se pinta lo guardado; si no, se calcula y se guarda.
+            d0 = date_from.get_date()
+            d1 = date_to.get_date() + timedelta(days=1)
+            rango = [d0.isoformat(), date_to.get_date().isoformat()]
+            snap = datos["snap"]
+            if snap is not None and snap["rango"] == rango and \
+                    datos["huella"] in (None, snap["huella"]):
+                estado, huella = snap["estado"], snap["huella"]
+            elif datos["ledger"] is None:
+                # Solo hay instantánea y es de otro periodo: se espera la lectura
+                tk.Label(resumen,
+                         text="Cargando movimientos…",
+                         bg=COLOR_FONDO_GRIS,
+                         fg=COLOR_TEXTO_GRIS,
+                         font=FONT_NORMAL
+                         ).pack(pady=30)
+                return
+            else:
+                estado, huella = estado_home(datos["ledger"], d0, d1), datos["huella"]
+                datos["snap"] = {"formato": FORMATO_INSTANTANEA, "perfil": datos["perfil"],
+                                 "min": min_date.isoformat(), "max": max_date.isoformat(),
+                                 "rango": rango, "huella": huella, "estado": estado}
+                guardar_instantanea(uid, datos["snap"])
+            if estado is None:
                 # Si no hay datos, mostramos mensaje
                 tk.Label(resumen,
                          text="Sin movimientos registrados.",
@@ -304,23 +517,7 @@ class DashboardWindow:
                          font=FONT_NORMAL
                          ).pack(pady=30)
                 return
-
-            # Convertimos timestamp a datetime
-            df["fecha"] = pd.to_datetime(df["fecha"], unit="s")
-
-            # Filtramos por rango seleccionado
-            d0 = date_from.get_date()
-            d1 = date_to.get_date() + timedelta(days=1)
-            df_r = df[(df["fecha"] >= pd.Timestamp(d0)) &
-                      (df["fecha"] <  pd.Timestamp(d1))].copy()
-
-            # Calculamos totales: ingresos, gastos, saldo
-            df_r["signed"] = df_r.apply(
-                lambda r: r["monto"] if r["tipo"]=="Ingreso" else -r["monto"], axis=1
-            )
-            saldo = df_r["signed"].sum()
-            ing   = df_r[df_r["tipo"]=="Ingreso"]["monto"].sum()
-            gas   = df_r[df_r["tipo"]=="Gasto"]["monto"].sum()
+            saldo, ing, gas = estado["saldo"], estado["ingresos"], estado["gastos"]
 
             # --- Tarjetas de resumen ---
             cards = tk.Frame(resumen, bg=COLOR_FONDO_GRIS)
@@ -348,67 +545,115 @@ class DashboardWindow:
             card(2, "Gastos",  -gas,  COLOR_ROJO_GASTO)
 
             # --- Gráficos dinámicos ---
+            # Se dibujan con Agg en segundo plano y se cachean por
+            # (gráfico, rango, huella de los datos, tamaño): volver al mismo
+            # periodo o re-activar un toggle los muestra al instante.
             row = tk.Frame(resumen, bg=COLOR_FONDO_GRIS)
             row.pack(fill="x", pady=8)
             row.columnconfigure((0,1), weight=1, uniform="row")
 
+            width = resumen.winfo_width()
+            if width <= 1:
+                width = 1004  # Aún no mapeado: ancho por defecto (1024 - márgenes)
+            half = (max(320, (width - 24) // 2), 300)
+            full = (max(480, width - 12), 300)
+
+            def chart(kind, size):
+                v = ChartView(row if kind != "line" else resumen)
+                views.append(v)
+                return v, ("home", kind, uid, tuple(rango), huella, size)
+
             # Barras Ingresos vs Gastos
             if show_bar.get():
-                fig, ax = plt.subplots(figsize=(5,3))
-                ax.bar(["Ingresos","Gastos"], [ing, gas])
-                ax.set_ylabel("$ COP")
-                ax.set_title("Ingresos vs Gastos", fontweight="bold")
-                ax.grid(axis="y", linestyle="--", alpha=0.3)
-                fig.tight_layout()
-                canvas = FigureCanvasTkAgg(fig, master=row)
-                canvas.draw()
-                canvas.get_tk_widget().grid(row=0, column=0, padx=4, sticky="nsew")
-                plt.close(fig)
+                v, key = chart("bar", half)
+                v.widget.grid(row=0, column=0, padx=4, sticky="nsew")
+                v.show(key, half, lambda: [
+                    ("Ingresos vs Gastos", ["Ingresos", "Gastos"], [ing, gas], "bar")
+                ])
 
             # Pastel: distribución de gastos por categoría
             if show_pie.get():
-                gastos_cat = (df_r[df_r["tipo"]=="Gasto"]
-                              .groupby("categoria")["monto"].sum())
-                if not gastos_cat.empty:
-                    fig2, ax2 = plt.subplots(figsize=(5,3))
-                    ax2.pie(gastos_cat,
-                            labels=gastos_cat.index,
-                            autopct="%1.0f%%",
-                            startangle=90)
-                    ax2.set_title("Distribución de Gastos", fontweight="bold")
-                    fig2.tight_layout()
-                    canvas2 = FigureCanvasTkAgg(fig2, master=row)
-                    canvas2.draw()
-                    canvas2.get_tk_widget().grid(row=0, column=1, padx=4, sticky="nsew")
-                    plt.close(fig2)
+                etiquetas, valores = estado["pastel"]
+                if etiquetas:
+                    v, key = chart("pie", half)
+                    v.widget.grid(row=0, column=1, padx=4, sticky="nsew")
+                    v.show(key, half, lambda: [
+                        ("Distribución de Gastos", etiquetas, np.array(valores), "pie")
+                    ])
 
             # Línea: saldo acumulado en el periodo
             if show_line.get():
-                fig3, ax3 = plt.subplots(figsize=(10,3))
-                serie = (df_r.sort_values("fecha")
-                         .set_index("fecha")["signed"]
-                         .cumsum()
-                         .resample("D").last().ffill())
-                ax3.plot(serie.index, serie.values, linewidth=2)
-                ax3.axhline(0, linestyle="--", linewidth=0.7)
-                ax3.fill_between(serie.index, serie.values,
-                                 where=serie.values>=0, alpha=0.15)
-                ax3.fill_between(serie.index, serie.values,
-                                 where=serie.values<0, alpha=0.15)
-                ax3.set_ylabel("$ COP")
-                ax3.set_title("Saldo Acumulado", fontweight="bold")
-                ax3.grid(axis="y", linestyle="--", alpha=0.3)
-                fig3.tight_layout()
-                canvas3 = FigureCanvasTkAgg(fig3, master=resumen)
-                canvas3.draw()
-                canvas3.get_tk_widget().pack(pady=(6,10), fill="x")
-                plt.close(fig3)
-
-        # Asignamos la función al botón Aplicar filtro
-        btn_apply.configure(command=render)
+                def serie_saldo():
+                    dias, valores = estado["saldo_acum"]
+                    return [("Saldo Acumulado", np.array(dias, dtype="datetime64[D]"),
+                             np.array(valores), "line")]
+
+                v, key = chart("line", full)
+                v.widget.pack(pady=(6,10), fill="x")
+                v.show(key, full, serie_saldo)
+
+        # Si cambia el ancho disponible, los gráficos se vuelven a pedir
+        # al nuevo tamaño (los anteriores siguen en caché).
+        last_width = [0]
+
+        def on_resize(event):
+            if abs(event.width - last_width[0]) > 20:
+                last_width[0] = event.width
+                scheduler.mark_dirty()
+
+        resumen.bind("<Configure>", on_resize)
+
+        # Los cambios de filtro solo marcan la vista como sucia: el recálculo
+        # se hace una vez por ciclo ocioso, aunque lleguen varios seguidos.
+        scheduler = RenderScheduler(resumen, render)
+        btn_apply.configure(command=scheduler.mark_dirty)
+        for var in (show_bar, show_pie, show_line):
+            var.trace_add("write", scheduler.mark_dirty)
         # Render inicial
         render()
 
+        # Lectura real tras pintar con lo guardado: si cambió el perfil se rehace el
+        # saludo; si cambiaron las transacciones (otra huella) se amplía el rango de
+        # fechas (si el filtro llegaba al borde) y se redibuja. Si no, no se toca nada.
+        def refrescar():
+            perfil_data, _ = fb.get_profile(uid)
+            raw, err = fb.get_transactions(uid)
+            version = fb.transactions_version(uid)
+            led = columnar.ledger_for(uid, version, raw)
+            return perfil_data, led, led.fingerprint(), version, err
+
+        def al_refrescar(res, error):
+            nonlocal min_date, max_date
+            actualizando.pack_forget()
+            if error is not None or res[4]:
+                return      # Sin conexión: se queda lo guardado
+            perfil_data, led, huella, version, _ = res
+            perfil_nuevo = {"nombre": perfil_data.get("nombre"), "foto": perfil_data.get("foto")}
+            if perfil_data and perfil_nuevo != datos["perfil"]:
+                datos["perfil"] = perfil_nuevo
+                pintar_cabecera()
+                if datos["snap"] is not None:
+                    datos["snap"]["perfil"] = perfil_nuevo
+                    guardar_instantanea(uid, datos["snap"])
+            pintada = datos["huella"] or (datos["snap"] or {}).get("huella")
+            datos.update(ledger=led, version=version, huella=huella)
+            if huella == pintada:
+                return
+            nuevo_min, nuevo_max = rango_fechas(led)
+            for de, borde, nuevo in ((date_from, min_date, nuevo_min),
+                                     (date_to, max_date, nuevo_max)):
+                estado = str(de.cget("state"))
+                de.config(state="normal", mindate=nuevo_min, maxdate=nuevo_max)
+                if de.get_date() == borde:
+                    de.set_date(nuevo)
+                de.config(state=estado)
+            min_date, max_date = nuevo_min, nuevo_max
+            scheduler.mark_dirty()
+
+        if en_2o_plano:
+            actualizando.pack(side="right", padx=6)
+            run_in_background(resumen, refrescar, al_refrescar)
+
         # -------------------------
         # Gestión de periodos rápidos
         # -------------------------
@@ -447,15 +692,94 @@ class DashboardWindow:
                 date_from.config(state="disabled")
                 date_to.config(state="disabled")
 
-            render()
+            scheduler.mark_dirty()
 
         period_var.trace_add("write", on_period_change)
 
+    # =======================================================================================
+    #  Panel oculto de diagnóstico (Ctrl+Shift+D): percentiles por operación de Firebase
+    # =======================================================================================
+
+    def _diagnostics(self, event=None):
+        """
+        Abre (o trae al frente) una ventana con lo que mide metrics.py: llamadas,
+        errores, reintentos, p50/p95/p99 y volumen por operación. Se refresca sola.
+        """
+        if self._diag is not None and self._diag.winfo_exists():
+            self._diag.lift()
+            return
+        top = self._diag = tk.Toplevel(self.win)
+        top.title("Klarity – Diagnóstico")
+        top.geometry("860x360")
+        top.configure(bg=COLOR_FONDO_GRIS)
+
+        if not metrics.ENABLED:
+            tk.Label(top,
+                     text="Métricas desactivadas.\n"
+                          "Inicie la app con KLARITY_METRICS=1 para medir las llamadas a Firebase.",
+                     bg=COLOR_FONDO_GRIS, fg=COLOR_TEXTO_GRIS, font=FONT_NORMAL,
+                     justify="center").pack(expand=True)
+            return
+
+        cols = ("Operación", "Llamadas", "Errores", "Reintentos",
+                "p50 ms", "p95 ms", "p99 ms", "Máx ms", "KB", "Registros")
+        tree = ttk.Treeview(top, columns=cols, show="headings")
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, width=170 if c == "Operación" else 70,
+                        anchor="w" if c == "Operación" else "e")
+        tree.pack(fill="both", expand=True, padx=8, pady=(8, 4))
+
+        pie = tk.Frame(top, bg=COLOR_FONDO_GRIS)
+        pie.pack(fill="x", padx=8, pady=(0, 8))
+        estado = tk.Label(pie, bg=COLOR_FONDO_GRIS, fg=COLOR_TEXTO_GRIS, font=FONT_NORMAL)
+        estado.pack(side="right")
+
+        def refrescar(repetir=True):
+            if not top.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for f in metrics.snapshot():
+                errores = ", ".join(f"{k}×{v}" for k, v in f["errores"].items()) or "0"
+                tree.insert("", "end", values=(
+                    f["op"], f["llamadas"], errores, f["reintentos"],
+                    f"{f['p50'] * 1000:.1f}", f"{f['p95'] * 1000:.1f}",
+                    f"{f['p99'] * 1000:.1f}", f"{f['max'] * 1000:.1f}",
+                    f"{f['bytes'] / 1024:,.0f}".replace(",", "."), f["registros"]))
+            estado.config(text=f"Actualizado {datetime.now():%H:%M:%S}")
+            if repetir:
+                top.after(2000, refrescar)
+
+        def reiniciar():
+            metrics.reset()
+            refrescar(repetir=False)
+
+        ttk.Button(pie, text="Reiniciar", command=reiniciar).pack(side="left")
+        refrescar()
+
     # =======================================================================================
     #  Logout: cierra esta ventana y regresa al login
     # =======================================================================================
 
+    def _vigilar_sesion(self):
+        """Revisa cada VIGILANCIA_SESION_MS si firebase_service cerró la sesión por su cuenta."""
+        try:
+            if not self.win.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        if fb.session_lost() is None:
+            self.win.after(VIGILANCIA_SESION_MS, self._vigilar_sesion)
+            return
+        messagebox.showwarning("Sesión cerrada",
+                               "Tu sesión ya no es válida. Vuelve a iniciar sesión.",
+                               parent=self.win)
+        self._logout()
+
     def _logout(self):
         import ui_login as login_module
+        fb.end_session()             # Olvida la sesión guardada (no más entrada automática)
+        ledger_store.clear(self.user["localId"])   # Y sus transacciones cacheadas en disco
+        borrar_instantanea(self.user["localId"])    # Y el último Home pintado
         self.win.destroy()           # Cierra el Dashboard
         login_module.start(self.root)  # Vuelve a la ventana de login
@@ -6,16 +6,19 @@
 # 2. Ofrecer la opción de mostrar/ocultar contraseña.
 # 3. Enlace para ir a la ventana de Registro.
 # 4. Validar campos y manejar respuestas de Firebase.
-# 5. Tras login exitoso, crear categorías por defecto y pasar al Dashboard.
+# 5. Tras login exitoso, lanzar la precarga en paralelo (fb.prefetch) y pasar al Dashboard.
+# 6. Al abrir la app, entrar directo al Dashboard si se pudo reanudar la sesión guardada.
 # ===========================================================================================
 
 import os
 import tkinter as tk                       # Biblioteca principal de GUI
 from tkinter import messagebox            # Ventanas de diálogo (errores, avisos, info)
 from constants import *                   # Colores, fuentes y constantes visuales
-from utils import center_window           # Función auxiliar para centrar ventanas
+from utils import center_window, run_in_background  # Centrar ventanas, trabajo en 2º plano
 import firebase_service as fb             # Lógica de autenticación con Firebase
 import ui_dashboard as dashboard          # Módulo para mostrar el dashboard tras login
+from image_cache import get_photo         # Logo compartido (decodificado una sola vez)
+import profiling                          # Fases del modo de perfilado
 
 # -------------------------------------------------------------------------------------------
 # Función auxiliar: alterna visibilidad de contraseña en un Entry
@@ -97,10 +100,8 @@ class LoginWindow:
         # 1) Logo de la aplicación
         # -------------------------------
         try:
-            from PIL import Image, ImageTk
-            # Carga y redimensiona la imagen a 130x130
-            img = Image.open("assets/klarity_logo.png").resize((130, 130))
-            photo = ImageTk.PhotoImage(img)
+            # Logo a 130x130 desde la caché de imágenes
+            photo = get_photo("assets/klarity_logo.png", (130, 130))
             # Label que muestra la imagen
             tk.Label(frm, image=photo, bg=COLOR_FONDO_GRIS).pack()
             frm.image = photo  # Referencia para evitar garbage collector
@@ -163,7 +164,9 @@ class LoginWindow:
         - Toma email y contraseña del usuario.
         - Valida que no estén vacíos.
         - Llama a fb.login_user para autenticación.
-        - Si OK: crea categorías por defecto, destruye ventana y abre Dashboard.
+        - Si OK: lanza la precarga en paralelo de lo que pide el Dashboard (perfil,
+          categorías por defecto, transacciones, sugerencias), cierra la ventana y
+          abre el Dashboard sin esperarla.
         - Si error: muestra un messagebox con el mensaje amigable.
         """
         email = self.email.get().strip()
@@ -181,8 +184,9 @@ class LoginWindow:
             messagebox.showerror("Inicio de sesión fallido", err, parent=self.win)
             return
 
-        # 3) Si es exitoso, nos aseguramos de que existan categorías por defecto
-        fb.ensure_default_categories(user["localId"])
+        # 3) Si es exitoso, precargamos en paralelo (incluye asegurar las
+        #    categorías por defecto); el Dashboard toma los resultados al pedirlos
+        fb.prefetch(user["localId"])
 
         # 4) Cerramos ventana de login y abrimos dashboard
         self.win.destroy()
@@ -248,9 +252,7 @@ class RegisterWindow:
         # Logo de Klarity (igual que en login)
         # -------------------------------
         try:
-            from PIL import Image, ImageTk
-            img = Image.open("assets/klarity_logo.png").resize((130, 130))
-            photo = ImageTk.PhotoImage(img)
+            photo = get_photo("assets/klarity_logo.png", (130, 130))
             tk.Label(frm, image=photo, bg=COLOR_FONDO_GRIS).pack()
             frm.image = photo
         except Exception:
@@ -354,8 +356,21 @@ class RegisterWindow:
 # Función de utilidad: start()
 # -------------------------------------------------------------------------------------------
 # Permite iniciar el flujo de login desde fuera de este módulo:
-# ui_login.start(root) creará la ventana de login.
+# ui_login.start(root) creará la ventana de login; con 'reanudacion' (el Future de
+# fb.resume_session_async) primero se espera la sesión guardada y, si se reanudó,
+# se abre directamente el Dashboard.
 # ===========================================================================================
 
-def start(root: tk.Tk):
-    LoginWindow(root)
+@profiling.profiled("login.start")
+def start(root: tk.Tk, reanudacion=None):
+    if reanudacion is None:
+        LoginWindow(root)
+        return
+
+    def al_reanudar(user, error):
+        if user and error is None:
+            dashboard.DashboardWindow(root, user)
+        else:
+            LoginWindow(root)
+
+    run_in_background(root, reanudacion.result, al_reanudar)
@@ -10,7 +10,7 @@
 import os
 import tkinter as tk
 from tkinter import messagebox, filedialog
-from PIL import Image, ImageTk, ImageDraw  # Pillow para manipulación de imágenes
+from image_cache import get_photo, MASK_CIRCLE  # Avatar circular cacheado
 
 from constants import *       # Colores, fuentes, constantes globales
 from utils import clear_frame  # Función para vaciar el contenedor antes de renderizar
@@ -59,19 +59,9 @@ def build(frame: tk.Frame, user: dict):
 
     if avatar_path:
         try:
-            # Abrir imagen y convertir a RGBA para manejar transparencia
-            img = Image.open(avatar_path).convert("RGBA")
-            # Redimensionar a 150x150 píxeles
-            img = img.resize((150,150), resample=Image.LANCZOS)
-
-            # Crear máscara circular
-            mask = Image.new("L", (150,150), 0)
-            draw = ImageDraw.Draw(mask)
-            draw.ellipse((0,0,150,150), fill=255)
-            img.putalpha(mask)  # Aplicar la máscara
-
-            # Convertir a PhotoImage para Tkinter
-            avatar_img = ImageTk.PhotoImage(img)
+            # Avatar 150x150 con máscara circular, listo para Tkinter.
+            # La caché evita re-decodificar la foto en cada visita al Perfil.
+            avatar_img = get_photo(avatar_path, (150,150), MASK_CIRCLE)
         except Exception:
             avatar_img = None  # Si hay fallo, ignoramos la imagen
 
@@ -99,14 +89,8 @@ def build(frame: tk.Frame, user: dict):
         foto_var.set(p)  # Guardar nueva ruta
 
         try:
-            # Mismo proceso de máscara circular para preview
-            img2 = Image.open(p).convert("RGBA")
-            img2 = img2.resize((150,150), resample=Image.LANCZOS)
-            mask2 = Image.new("L", (150,150), 0)
-            draw2 = ImageDraw.Draw(mask2)
-            draw2.ellipse((0,0,150,150), fill=255)
-            img2.putalpha(mask2)
-            tk2 = ImageTk.PhotoImage(img2)
+            # Misma máscara circular para el preview
+            tk2 = get_photo(p, (150,150), MASK_CIRCLE)
             lbl_avatar.configure(image=tk2)
             lbl_avatar.image = tk2
         except Exception:
@@ -233,7 +217,12 @@ def build(frame: tk.Frame, user: dict):
             messagebox.showerror("Error", f"No se pudo cambiar la contraseña:\n{err2}", parent=sec)
             return
 
-        # 3) Éxito: notificamos y limpiamos campos
+        # 3) El cambio revoca los refresh tokens: la sesión sigue con la nueva contraseña
+        ok3, err3 = fb.renew_session(email, new)
+        if not ok3:
+            print(f"[perfil] No se pudo renovar la sesión: {err3}")
+
+        # 4) Éxito: notificamos y limpiamos campos
         messagebox.showinfo("Éxito", "Contraseña actualizada correctamente.", parent=sec)
         entry_old.delete(0, 'end')
         entry_new.delete(0, 'end')
@@ -6,25 +6,31 @@
 # - Cálculo de resúmenes de ingresos, gastos y saldo.
 # - Visualización de múltiples gráficos (pie, barras, líneas).
 # - Interpretación automática con Gemini (IA).
-# - Exportación a PDF (opcional, usando ReportLab).
+# - Exportación a PDF en segundo plano (ReportLab, ver report_pdf.py).
+# - Exportación de la tabla diaria del periodo a CSV/Parquet.
 # ===========================================================================================
 
 import os
 import sys
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from tkinter.scrolledtext import ScrolledText
 from tkcalendar import DateEntry
 from datetime import datetime, date, timedelta
 import json
 
 import pandas as pd                           # Para manipulación de datos
-import matplotlib.pyplot as plt               # Para generar gráficos
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import matplotlib.dates as mdates             # Conversión eje temporal -> fechas (zoom)
+import aggregates as agg                      # Buckets diarios para agregados por ventana
+import columnar                               # Transacciones por columnas (compartidas entre vistas)
+from chart_render import ChartView, render_cached  # Gráficos con Agg en segundo plano + caché LRU
+import exporter                               # Exportación a CSV/Parquet
+import report_pdf                             # Composición del PDF (sin Tk)
 
 from constants import *                       # Colores, fuentes, constantes
-from utils import clear_frame                 # Limpia el contenedor antes de renderizar
+from utils import clear_frame, RenderScheduler, run_with_progress  # Limpieza, redibujado agrupado y tareas en 2º plano
 import firebase_service as fb                 # Lógica CRUD de transacciones
+import tracing                                # Spans de Interpretar (ventana, Gemini, texto)
 
 # ─── Configuración de Gemini (Google Generative AI) ──────────────────────────────────
 # Añadimos carpeta config al path para importar gemini_config.py
@@ -46,12 +52,6 @@ except Exception as e:
     # Si falla, seguimos sin IA pero informamos en consola
     print(f"[ui_reportes] No se pudo inicializar Gemini: {e}")
 
-# Para exportar a PDF
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from io import BytesIO
-
 
 def build(frame: tk.Frame, user: dict):
     """
@@ -67,8 +67,9 @@ def build(frame: tk.Frame, user: dict):
     clear_frame(frame)
     uid = user['localId']
 
-    # 2) Cargar todas las transacciones
+    # 2) Cargar todas las transacciones, junto con la versión a la que corresponden
     raw, _ = fb.get_transactions(uid)
+    datos = {"raw": raw, "version": fb.transactions_version(uid)}
 
     # ──────────────────────────────────────────────────────────────────────────
     # 3) Cabecera: Título, presets y selectores de fecha
@@ -134,12 +135,14 @@ def build(frame: tk.Frame, user: dict):
         bg=COLOR_VERDE_CRECIMIENTO,
         fg=COLOR_BLANCO,
         relief='flat',
-        command=lambda: refresh_dashboard()
+        command=lambda: scheduler.mark_dirty()
     )
     btn_apply.pack(side='left', padx=5)
 
     # Cuando cambie el preset, ajustamos fechas automáticamente
     def on_preset(*_):
+        if syncing[0]:
+            return  # Cambio a "Personalizado" hecho por el zoom: fechas ya fijadas
         hoy = date.today()
         p = period_var.get()
 
@@ -154,7 +157,7 @@ def build(frame: tk.Frame, user: dict):
         else:
             date_from.set_date(min_date); date_to.set_date(max_date)
 
-        refresh_dashboard()
+        scheduler.mark_dirty()
 
     period_var.trace_add('write', on_preset)
 
@@ -199,6 +202,28 @@ def build(frame: tk.Frame, user: dict):
     )
     btn_interp.grid(row=0, column=3, padx=6)
 
+    # Botón “Exportar” que guarda la tabla diaria del periodo (CSV/Parquet)
+    btn_export = tk.Button(
+        summary,
+        text="Exportar",
+        bg=COLOR_VERDE_CRECIMIENTO,
+        fg=COLOR_BLANCO,
+        relief='flat',
+        command=lambda: exportar()
+    )
+    btn_export.grid(row=0, column=4, padx=6)
+
+    # Botón “Exportar PDF”: tarjetas, gráficos e interpretación en un PDF
+    btn_pdf = tk.Button(
+        summary,
+        text="Exportar PDF",
+        bg=COLOR_PRINCIPAL_AZUL,
+        fg=COLOR_BLANCO,
+        relief='flat',
+        command=lambda: exportar_pdf()
+    )
+    btn_pdf.grid(row=0, column=5, padx=6)
+
 
     # ──────────────────────────────────────────────────────────────────────────
     # 5) Panel principal: opciones de series y contenedor de gráficos + interpretación
@@ -223,14 +248,16 @@ def build(frame: tk.Frame, user: dict):
     for txt, key in opts:
         var = tk.BooleanVar(value=True)
         sel_vars[key] = var
-        ttk.Checkbutton(left, text=txt, variable=var).pack(anchor='w')
+        ttk.Checkbutton(left, text=txt, variable=var,
+                        command=lambda: scheduler.mark_dirty()).pack(anchor='w')
 
-    # Contenedor central para gráficos (canvas Matplotlib)
+    # Contenedor central para gráficos: imagen renderizada con Agg en segundo
+    # plano y cacheada por (series, rango, versión de datos, tamaño)
     center = tk.Frame(main, bg=COLOR_FONDO_GRIS)
     center.pack(side='left', fill='both', expand=True)
-    fig = plt.Figure(figsize=(8,5))
-    canvas = FigureCanvasTkAgg(fig, master=center)
-    canvas.get_tk_widget().pack(fill='both', expand=True)
+    center.pack_propagate(False)  # El tamaño lo decide la ventana, no la imagen
+    chart = ChartView(center)
+    chart.widget.pack(fill='both', expand=True)
 
     # Panel derecho: cuadro de texto para interpretación IA
     right = tk.Frame(main, bg=COLOR_FONDO_GRIS)
@@ -241,94 +268,156 @@ def build(frame: tk.Frame, user: dict):
 
 
     # ──────────────────────────────────────────────────────────────────────────
-    # 6) Función para filtrar DataFrame según fechas seleccionadas
+    # 6) Agregados de la ventana de fechas seleccionada
+    #    Las transacciones se agrupan por día una sola vez por versión de datos;
+    #    cada filtro, zoom o desplazamiento solo suma los días visibles.
     # ──────────────────────────────────────────────────────────────────────────
 
-    def get_filtered_df():
-        # Construimos datetime de inicio y fin
-        d0 = datetime.combine(date_from.get_date(), datetime.min.time())
-        d1 = datetime.combine(date_to.get_date(), datetime.max.time())
-        df = pd.DataFrame(list((raw or {}).values()))
-        if df.empty:
-            return df
-        df['fecha'] = pd.to_datetime(df['fecha'], unit='s')
-        # Retornamos solo filas dentro del rango
-        return df[(df['fecha'] >= d0) & (df['fecha'] <= d1)]
+    def get_buckets():
+        # Si otra vista escribió desde que se leyó 'raw', se relee: datos y versión van
+        # siempre juntos en las cachés (buckets, gráficos y Ledger en disco)
+        if fb.transactions_version(uid) != datos["version"]:
+            datos["raw"], _ = fb.get_transactions(uid)
+            datos["version"] = fb.transactions_version(uid)
+        version = datos["version"]
+        return agg.buckets_for((uid, version), columnar.ledger_for(uid, version, datos["raw"]))
+
+    def get_window():
+        buckets = get_buckets()
+        return buckets.window(date_from.get_date(), date_to.get_date())
 
 
     # ──────────────────────────────────────────────────────────────────────────
     # 7) Refresh: recalcula resúmenes, limpia y redibuja todos los gráficos
     # ──────────────────────────────────────────────────────────────────────────
 
+    def series_for(w, selected):
+        """Series a dibujar (título, x, y, tipo) para la ventana 'w' y las series elegidas."""
+        return agg.report_panels(w, selected)
+
+    def chart_request():
+        """(clave, tamaño, series elegidas) del gráfico para los filtros actuales."""
+        selected = tuple(k for k, var in sel_vars.items() if var.get())
+        width, height = center.winfo_width(), center.winfo_height()
+        size = (width, height) if width > 1 and height > 1 else (800, 500)
+        key = ('reportes', uid, selected,
+               date_from.get_date().isoformat(), date_to.get_date().isoformat(),
+               datos["version"], size)
+        return key, size, selected
+
     def refresh_dashboard():
-        df = get_filtered_df()
-        # Cálculo de totales
-        ingresos = df[df['tipo']=='Ingreso']['monto'].sum() if not df.empty else 0
-        gastos   = df[df['tipo']=='Gasto']['monto'].sum()   if not df.empty else 0
-        saldo    = ingresos - gastos
+        w = get_window()
+        ingresos, gastos, saldo = w['ingresos'], w['gastos'], w['saldo']
 
         # Actualizamos valores en las tarjetas
         lbl_ing.config(text=f"${ingresos:,.0f}".replace(',', '.'))
         lbl_gas.config(text=f"${gastos:,.0f}".replace(',', '.'))
         lbl_sal.config(text=f"${saldo:,.0f}".replace(',', '.'))
 
-        # Limpiamos figura y ajustamos espacio
-        fig.clf()
-        fig.subplots_adjust(hspace=0.4, wspace=0.4)
-
-        # Armamos lista de series a dibujar
-        series = []
-        df_sorted = df.sort_values('fecha') if not df.empty else df
-
-        # 7.1) Pie chart: Gastos por Categoría
-        if sel_vars['g1'].get() and not df.empty:
-            g1 = df[df['tipo']=='Gasto'].groupby('categoria')['monto'].sum()
-            series.append(('Gastos x Categoría', g1, 'pie'))
-
-        # 7.2) Bar chart: Ingresos vs Gastos
-        if sel_vars['g2'].get() and not df.empty:
-            series.append(('Ingresos vs Gastos',
-                           pd.Series({'Ingresos': ingresos, 'Gastos': gastos}),
-                           'bar'))
-
-        # 7.3) Line chart: Saldo Acumulado diario
-        if sel_vars['g3'].get() and not df_sorted.empty:
-            df2 = df_sorted.copy()
-            df2['signed'] = df2.apply(
-                lambda r: r['monto'] if r['tipo']=='Ingreso' else -r['monto'],
-                axis=1
-            )
-            # Cálculo de cumsum diario, rellenando días sin transacciones
-            serie_acum = df2.set_index('fecha')['signed'] \
-                            .cumsum().resample('D').last().ffill()
-            series.append(('Saldo Acumulado', serie_acum, 'line'))
-
-        # 7.4) Barh chart: Top 5 categorías de Gasto
-        if sel_vars['g4'].get() and not df.empty:
-            g4 = df[df['tipo']=='Gasto'].groupby('categoria')['monto'].sum()
-            g4 = g4.sort_values(ascending=False).head(5)
-            series.append(('Top 5 Categorías', g4, 'barh'))
-
-        # Insertamos cada subplot
-        for idx, (title, data, kind) in enumerate(series):
-            ax = fig.add_subplot(2, 2, idx+1)
-            if kind == 'pie':
-                data.plot.pie(ax=ax, autopct='%1.0f%%', startangle=90)
-            elif kind == 'bar':
-                data.plot.bar(ax=ax)
-            elif kind == 'line':
-                data.plot(ax=ax)
-            elif kind == 'barh':
-                data.plot.barh(ax=ax)
-                ax.invert_yaxis()
-
-            ax.set_title(title)
-            ax.grid(axis='y', linestyle='--', alpha=0.3)
-
-        # Redibujamos canvas
-        canvas.draw()
+        # Clave del gráfico: si ya se dibujó esta combinación, se muestra de inmediato
+        key, size, selected = chart_request()
+
+        # Dibujo en rejilla 2x2 fuera del hilo de Tk
+        chart.show(key, size, lambda: series_for(w, selected), layout=(2, 2))
 
 
+    # ──────────────────────────────────────────────────────────────────────────
+    # 7.5) Zoom y desplazamiento sobre "Saldo Acumulado" e "Ingresos vs Gastos"
+    #      - Rueda del ratón: acerca/aleja alrededor del cursor.
+    #      - Arrastrar sobre el saldo: desplaza la ventana en el tiempo.
+    #      - Doble clic: vuelve al rango completo.
+    #      Desde/Hasta se mantienen sincronizados con la ventana visible.
+    # ──────────────────────────────────────────────────────────────────────────
+
+    syncing = [False]   # Evita que on_preset pise las fechas al pasar a Personalizado
+
+    def set_window(d0, d1):
+        d0 = max(d0, min_date)
+        d1 = min(d1, max_date)
+        if d1 < d0:
+            return
+        if period_var.get() != 'Personalizado':
+            syncing[0] = True
+            period_var.set('Personalizado')
+            syncing[0] = False
+        date_from.set_date(d0)
+        date_to.set_date(d1)
+        scheduler.mark_dirty()
+
+    def cursor_day(info, fx):
+        """Día bajo el cursor en el eje temporal del saldo."""
+        x0, x1 = info['xlim']
+        return mdates.num2date(x0 + fx * (x1 - x0)).date()
+
+    def on_wheel(event, direction=None):
+        hit = chart.locate(event.x, event.y)
+        if hit is None or hit[0]['kind'] not in ('line', 'bar'):
+            return
+        info, fx = hit
+        if direction is None:
+            direction = 1 if event.delta > 0 else -1
+        factor = 0.8 if direction > 0 else 1.25   # >0: acercar
+
+        d0, d1 = date_from.get_date(), date_to.get_date()
+        span = max((d1 - d0).days, 1)
+        new_span = max(int(round(span * factor)), 1)
+        if new_span == span:
+            new_span = span - 1 if direction > 0 else span + 1
+        # El saldo hace zoom alrededor del cursor; las barras, alrededor del centro
+        pivot = cursor_day(info, fx) if info['kind'] == 'line' else d0 + timedelta(days=span // 2)
+        pivot = min(max(pivot, d0), d1)
+        rel = (pivot - d0).days / span
+        nd0 = pivot - timedelta(days=int(round(new_span * rel)))
+        set_window(nd0, nd0 + timedelta(days=new_span))
+
+    drag = {}
+
+    def on_press(event):
+        hit = chart.locate(event.x, event.y)
+        if hit is None or hit[0]['kind'] != 'line':
+            drag.clear()
+            return
+        info = hit[0]
+        x0, y0, x1, y1 = info['bbox']
+        days_per_px = (info['xlim'][1] - info['xlim'][0]) / max(x1 - x0, 1)
+        drag.update(x=event.x, d0=date_from.get_date(), d1=date_to.get_date(),
+                    days_per_px=days_per_px)
+
+    def on_motion(event):
+        if not drag:
+            return
+        shift = int(round((drag['x'] - event.x) * drag['days_per_px']))
+        if not shift:
+            return
+        span = drag['d1'] - drag['d0']
+        nd0 = drag['d0'] + timedelta(days=shift)
+        # Al llegar a un extremo se conserva el ancho de la ventana
+        nd0 = min(max(nd0, min_date), max_date - span)
+        set_window(nd0, nd0 + span)
+
+    chart.widget.bind('<MouseWheel>', on_wheel)                       # Windows / macOS
+    chart.widget.bind('<Button-4>', lambda e: on_wheel(e, 1))         # Linux: arriba
+    chart.widget.bind('<Button-5>', lambda e: on_wheel(e, -1))        # Linux: abajo
+    chart.widget.bind('<ButtonPress-1>', on_press)
+    chart.widget.bind('<B1-Motion>', on_motion)
+    chart.widget.bind('<ButtonRelease-1>', lambda e: drag.clear())
+    chart.widget.bind('<Double-Button-1>', lambda e: set_window(min_date, max_date))
+
+    # Presets, checkboxes y "Aplicar" solo marcan la vista como sucia;
+    # refresh_dashboard corre una vez por ciclo ocioso.
+    scheduler = RenderScheduler(frame, refresh_dashboard)
+
+    # Si el panel cambia de tamaño, pedimos el gráfico al nuevo tamaño
+    last_size = [(0, 0)]
+
+    def on_resize(event):
+        w, h = last_size[0]
+        if abs(event.width - w) > 20 or abs(event.height - h) > 20:
+            last_size[0] = (event.width, event.height)
+            scheduler.mark_dirty()
+
+    center.bind('<Configure>', on_resize)
+
     # Inicializamos dashboard al cargar
     refresh_dashboard()
 
@@ -338,9 +427,8 @@ def build(frame: tk.Frame, user: dict):
     # ──────────────────────────────────────────────────────────────────────────
 
     def interpretar():
-        df = get_filtered_df()
-        ingresos = df[df['tipo']=='Ingreso']['monto'].sum() if not df.empty else 0
-        gastos   = df[df['tipo']=='Gasto']['monto'].sum()   if not df.empty else 0
+        with tracing.span("reportes.ventana"):
+            w = get_window()
 
         txt_interp.configure(state='normal')
         txt_interp.delete('1.0', 'end')
@@ -352,23 +440,17 @@ def build(frame: tk.Frame, user: dict):
 
             # Preparamos datos según tipo de gráfico
             if key == 'g1':
-                s = df[df['tipo']=='Gasto'].groupby('categoria')['monto'].sum().to_dict()
+                s = w['gastos_cat'].to_dict()
                 title = 'Gastos x Categoría'
             elif key == 'g2':
-                s = {'Ingresos': ingresos, 'Gastos': gastos}
+                s = {'Ingresos': w['ingresos'], 'Gastos': w['gastos']}
                 title = 'Ingresos vs Gastos'
             elif key == 'g3':
-                df2 = df.copy()
-                df2['signed'] = df2.apply(
-                    lambda r: r['monto'] if r['tipo']=='Ingreso' else -r['monto'],
-                    axis=1
-                )
-                s = df2.set_index('fecha')['signed'].cumsum() \
-                       .resample('D').last().ffill().dropna().to_dict()
+                s = {d.strftime('%Y-%m-%d'): v
+                     for d, v in w['saldo_acum'].dropna().items()}
                 title = 'Saldo Acumulado'
             else:
-                tmp = df[df['tipo']=='Gasto'].groupby('categoria')['monto'].sum()
-                s = tmp.sort_values(ascending=False).head(5).to_dict()
+                s = w['top5'].to_dict()
                 title = 'Top 5 Categorías'
 
             # Montamos prompt para IA
@@ -376,13 +458,94 @@ def build(frame: tk.Frame, user: dict):
 
             if model:
                 try:
-                    text = model.generate_content(prompt).text
+                    with tracing.span("gemini.generate_content", cat="gemini",
+                                      grafico=title, prompt_chars=len(prompt)):
+                        text = model.generate_content(prompt).text
                 except Exception as e:
                     text = f"[Error de Gemini: {e}]"
             else:
                 text = "[Gemini no disponible]"
 
             # Insertamos sección de interpretación
-            txt_interp.insert('end', f"--- {title} ---\n{text}\n\n")
+            with tracing.span("reportes.insertar_texto", grafico=title):
+                txt_interp.insert('end', f"--- {title} ---\n{text}\n\n")
 
         txt_interp.configure(state='disabled')
+
+
+    # ──────────────────────────────────────────────────────────────────────────
+    # 9) Exportar: tabla diaria del periodo (ingresos, gastos, saldo y gasto por
+    #    categoría), escrita por bloques en segundo plano
+    # ──────────────────────────────────────────────────────────────────────────
+
+    def exportar():
+        d0, d1 = date_from.get_date(), date_to.get_date()
+        path = filedialog.asksaveasfilename(
+            parent=frame, title="Exportar reporte",
+            initialfile=f"reporte_{d0:%Y%m%d}_{d1:%Y%m%d}.csv",
+            defaultextension='.csv', filetypes=exporter.filetypes())
+        if not path:
+            return
+        buckets = get_buckets()
+
+        def trabajo(report, cancelled):
+            return exporter.export_frame(path, buckets.table(d0, d1),
+                                         report=report, cancelled=cancelled)
+
+        def listo(n, error):
+            if isinstance(error, InterruptedError):
+                return
+            if error is not None:
+                messagebox.showerror("Exportar", str(error), parent=frame)
+                return
+            messagebox.showinfo("Exportar", f"{n} días exportados.", parent=frame)
+
+        run_with_progress(frame, "Exportando…", trabajo, listo)
+
+
+    # ──────────────────────────────────────────────────────────────────────────
+    # 10) Exportar PDF: se arma en segundo plano; el gráfico se reutiliza del
+    #     caché de pantalla (o se dibuja con Agg si aún no está)
+    # ──────────────────────────────────────────────────────────────────────────
+
+    def exportar_pdf():
+        d0, d1 = date_from.get_date(), date_to.get_date()
+        path = filedialog.asksaveasfilename(
+            parent=frame, title="Exportar PDF",
+            initialfile=f"reporte_{d0:%Y%m%d}_{d1:%Y%m%d}.pdf",
+            defaultextension='.pdf', filetypes=[("PDF", "*.pdf")])
+        if not path:
+            return
+        # Todo lo que viene de widgets se lee aquí, en el hilo de Tk
+        w = get_window()
+        key, size, selected = chart_request()
+        texto = txt_interp.get('1.0', 'end')
+        usuario = user.get('displayName') or user.get('email', '')
+
+        def trabajo(report, cancelled):
+            charts = []
+            if selected:
+                report(0.2, "Preparando gráficos…")
+                charts.append(render_cached(key, lambda: series_for(w, selected),
+                                            size, (2, 2)))
+            if cancelled():
+                raise InterruptedError("Exportación cancelada.")
+            report(0.6, "Componiendo PDF…")
+            report_pdf.build_report(
+                path, d0, d1,
+                {'ingresos': w['ingresos'], 'gastos': w['gastos'], 'saldo': w['saldo']},
+                charts=charts,
+                gastos_cat={str(k): float(v) for k, v in w['gastos_cat'].items()},
+                interpretacion=texto, usuario=usuario)
+            report(1.0, "Listo")
+            return path
+
+        def listo(ruta, error):
+            if isinstance(error, InterruptedError):
+                return
+            if error is not None:
+                messagebox.showerror("Exportar PDF", str(error), parent=frame)
+                return
+            messagebox.showinfo("Exportar PDF", f"Reporte guardado en:\n{ruta}", parent=frame)
+
+        run_with_progress(frame, "Generando PDF…", trabajo, listo)
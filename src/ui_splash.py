@@ -7,7 +7,7 @@
 
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk                   # Pillow para abrir y mostrar imágenes
+from image_cache import get_photo                # Logo decodificado una sola vez (caché)
 from constants import (                           # Variables de estilo globales
     COLOR_PRINCIPAL_AZUL,
     COLOR_VERDE_CRECIMIENTO,
@@ -57,8 +57,7 @@ class SplashScreen:
         
         # Intentar cargar y mostrar el logo desde assets/klarity_logo.png
         try:
-            img = Image.open("assets/klarity_logo.png").resize((150, 150))
-            photo = ImageTk.PhotoImage(img)
+            photo = get_photo("assets/klarity_logo.png", (150, 150))
             lbl_img = tk.Label(frame, image=photo, bg=COLOR_PRINCIPAL_AZUL)
             lbl_img.image = photo              # Mantener referencia para evitar GC
             lbl_img.pack(pady=10)
@@ -5,17 +5,105 @@
 # - Mostrar el historial de transacciones del usuario en una tabla.
 # - Filtrar por periodo y rangos de fecha.
 # - Ordenar dinámicamente por cualquier columna.
-# - Agregar, editar y eliminar transacciones mediante modales.
+# - Buscar mientras se escribe en descripción y categoría.
+# - Agregar, editar y eliminar transacciones mediante modales
+#   (con autocompletado de descripción y categoría sugerida).
+# - Selección múltiple: eliminar, recategorizar o cambiar el tipo de varias
+#   transacciones a la vez con una sola confirmación y una sola escritura.
+# - Importar extractos bancarios CSV/OFX en segundo plano (ver importer.py).
+# - Exportar las filas filtradas a CSV/Parquet en segundo plano (ver exporter.py).
 # ===========================================================================================
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime, date, timedelta
 from tkcalendar import DateEntry
+import numpy as np
 
 from constants import *           # Colores, fuentes, constantes visuales
-from utils import clear_frame, money  # Funciones reutilizables
+from utils import clear_frame, money, RenderScheduler, run_with_progress  # Funciones reutilizables
 import firebase_service as fb     # Lógica CRUD de transacciones en Firebase
+import search_index               # Índice de búsqueda (descripción/categoría)
+import columnar                   # Columnas de fecha/monto/tipo/categoría para filtrar y ordenar
+import autocomplete               # Sugerencias de descripción, categoría y tipo
+import importer                   # Importación de extractos CSV/OFX
+import exporter                   # Exportación a CSV/Parquet
+
+
+# -------------------------------------------------------------------------------------------
+# Filtrado y filas de la tabla (sin Tk, también los usa benchmarks/bench.py)
+# -------------------------------------------------------------------------------------------
+
+MAX_FILAS = 500     # Filas que se insertan de una vez; "Mostrar más" agrega otras tantas
+
+def filtrar(data: dict, hits, d0: date, d1: date, campo: str, reverse: bool = False,
+            ledger=None) -> list:
+    """
+    Registros de 'data' (con su "__key") visibles en la tabla:
+    - hits: keys que coinciden con la búsqueda (None = sin búsqueda).
+    - d0, d1: rango de fechas, ambos incluidos.
+    - campo/reverse: orden según el encabezado elegido.
+    - ledger: columnar.Ledger de 'data'. Si se pasa, el filtro y el orden se hacen
+      sobre sus columnas y solo se copian los registros visibles.
+    """
+    if ledger is not None:
+        return _filtrar_columnas(data, ledger, hits, d0, d1, campo, reverse)
+
+    items = data.items() if hits is None else \
+        ((k, data[k]) for k in hits if k in data)
+
+    # Convertimos dict a lista de registros con clave
+    lista = [{"__key":k, **v} for k,v in items]
+
+    # Filtrar según fechas seleccionadas
+    lista = [t for t in lista
+             if d0 <= datetime.fromtimestamp(t["fecha"]).date() <= d1]
+
+    # Ordenar según encabezado
+    if campo in ("fecha","monto"):
+        lista.sort(key=lambda t: t.get(campo,0), reverse=reverse)
+    else:
+        lista.sort(key=lambda t: t.get(campo,"").lower(), reverse=reverse)
+    return lista
+
+
+def _filtrar_columnas(data, ledger, hits, d0, d1, campo, reverse):
+    """Como filtrar(), pero con las columnas del Ledger (mismo resultado y orden)."""
+    return [{"__key":k, **data[k]}
+            for k in filtrar_keys(ledger, hits, d0, d1, campo, reverse) if k in data]
+
+
+def filtrar_keys(ledger, hits, d0: date, d1: date, campo: str, reverse: bool = False) -> list:
+    """
+    Keys visibles en la tabla, en el mismo orden que filtrar(), sin copiar los
+    registros: la tabla solo arma las filas que llega a insertar.
+    """
+    # Rango de fechas en hora local: [inicio de d0, inicio del día siguiente a d1)
+    t0 = datetime.combine(d0, datetime.min.time()).timestamp()
+    t1 = datetime.combine(d1 + timedelta(days=1), datetime.min.time()).timestamp()
+    visible = (ledger.fecha >= t0) & (ledger.fecha < t1)
+    if hits is not None:
+        en_busqueda = np.zeros(len(ledger), dtype=bool)
+        en_busqueda[ledger.positions(hits)] = True
+        visible &= en_busqueda
+
+    # Orden según encabezado: el de todas las filas (calculado una vez por versión de
+    # datos) restringido a las visibles; como es estable, da lo mismo que ordenarlas
+    orden = ledger.order(campo, reverse)
+    pos = orden[visible[orden]]
+
+    return ledger.keys_at(pos)
+
+
+def fila(t: dict) -> tuple:
+    """Valores de la fila del Treeview para el registro 't'."""
+    return (
+        datetime.fromtimestamp(t["fecha"]).strftime("%Y-%m-%d"),
+        t.get("descripcion",""),
+        money(t.get("monto",0)),  # Formatea con separadores COP
+        t.get("tipo",""),
+        t.get("categoria","—")
+    )
 
 
 def build(frame: tk.Frame, user: dict):
@@ -35,6 +123,7 @@ def build(frame: tk.Frame, user: dict):
     # ─────────────────────────────────────────────────────────────────────
 
     data_all, _ = fb.get_transactions(uid)  # Traemos todas las transacciones
+    data_all = data_all or {}
     fechas = []
     for v in (data_all or {}).values():
         try:
@@ -102,7 +191,7 @@ def build(frame: tk.Frame, user: dict):
               background=[("active", COLOR_ROJO_GASTO)])
 
     # ─────────────────────────────────────────────────────────────────────
-    # 5) Toolbar superior: título y botones de Nuevo/Editar/Eliminar
+    # 5) Toolbar superior: título y botones de Nuevo/Editar/Eliminar/acciones en lote
     # ─────────────────────────────────────────────────────────────────────
 
     top = tk.Frame(frame, bg=COLOR_FONDO_GRIS)
@@ -121,12 +210,20 @@ def build(frame: tk.Frame, user: dict):
     # Contenedor de botones
     acciones = tk.Frame(top, bg=COLOR_FONDO_GRIS)
     acciones.grid(row=0, column=1, sticky="e")
-    btn_editar = ttk.Button(acciones, text="✏️ Editar",   style="Accent.TButton")
-    btn_borrar = ttk.Button(acciones, text="🗑️ Eliminar", style="Danger.TButton")
-    btn_nuevo  = ttk.Button(acciones, text="+ Nuevo",     style="Accent.TButton")
-    btn_editar.grid (row=0, column=0, padx=4)
-    btn_borrar.grid (row=0, column=1, padx=4)
-    btn_nuevo .grid (row=0, column=2, padx=4)
+    btn_recat  = ttk.Button(acciones, text="🏷️ Recategorizar", style="Accent.TButton")
+    btn_tipo   = ttk.Button(acciones, text="⇄ Cambiar tipo",   style="Accent.TButton")
+    btn_editar = ttk.Button(acciones, text="✏️ Editar",        style="Accent.TButton")
+    btn_borrar = ttk.Button(acciones, text="🗑️ Eliminar",      style="Danger.TButton")
+    btn_nuevo  = ttk.Button(acciones, text="+ Nuevo",          style="Accent.TButton")
+    btn_import = ttk.Button(acciones, text="📥 Importar",       style="Accent.TButton")
+    btn_export = ttk.Button(acciones, text="📤 Exportar",       style="Accent.TButton")
+    btn_recat .grid (row=0, column=0, padx=4)
+    btn_tipo  .grid (row=0, column=1, padx=4)
+    btn_editar.grid (row=0, column=2, padx=4)
+    btn_borrar.grid (row=0, column=3, padx=4)
+    btn_nuevo .grid (row=0, column=4, padx=4)
+    btn_import.grid (row=0, column=5, padx=4)
+    btn_export.grid (row=0, column=6, padx=4)
 
     # Línea divisoria
     ttk.Separator(frame, orient="horizontal")\
@@ -193,14 +290,26 @@ def build(frame: tk.Frame, user: dict):
                            style="Accent.TButton")
     btn_all.pack(side="left", padx=4)
 
+    # Búsqueda mientras se escribe (descripción y categoría)
+    tk.Label(filtro,
+             text="Buscar:",
+             bg=COLOR_FONDO_GRIS,
+             fg=COLOR_TEXTO_GRIS
+             ).pack(side="left", padx=(12,0))
+    search_var = tk.StringVar()
+    tk.Entry(filtro, textvariable=search_var, width=22)\
+        .pack(side="left", padx=4)
+
     # ─────────────────────────────────────────────────────────────────────
     # 7) Tabla con encabezados clicables y zebra-striping
+    #    (Ctrl/Shift + clic para seleccionar varias filas)
     # ─────────────────────────────────────────────────────────────────────
 
     cols = ("Fecha","Descripción","Monto","Tipo","Categoría")
     tree = ttk.Treeview(frame,
                         columns=cols,
                         show="headings",
+                        selectmode="extended",
                         height=15)
     # Configuramos cada encabezado para ordenar llamando a sort_by_column
     for c in cols:
@@ -208,12 +317,15 @@ def build(frame: tk.Frame, user: dict):
                      text=c,
                      command=lambda _c=c: sort_by_column(_c))
         tree.column(c, anchor="center", stretch=True)
-    tree.pack(fill="both", expand=True, padx=10, pady=(0,10))
-
-    # Zebra-striping: filas alternas claro/oscuro
-    def tag_rows():
-        for i, iid in enumerate(tree.get_children()):
-            tree.item(iid, tags=("odd",) if i%2 else ("even",))
+    # Pie: cuántas filas se muestran y botón para insertar las siguientes
+    pie = tk.Frame(frame, bg=COLOR_FONDO_GRIS)
+    pie.pack(side="bottom", fill="x", padx=10, pady=(0,10))
+    lbl_filas = tk.Label(pie, bg=COLOR_FONDO_GRIS, fg=COLOR_TEXTO_GRIS)
+    lbl_filas.pack(side="left")
+    btn_mas = ttk.Button(pie, text="Mostrar más", style="Accent.TButton")
+    tree.pack(fill="both", expand=True, padx=10, pady=(0,4))
+
+    # Zebra-striping: filas alternas claro/oscuro (la etiqueta va en cada insert)
     tree.tag_configure("odd",  background="#f0f4f7")
     tree.tag_configure("even", background="#e7edf1")
 
@@ -233,50 +345,112 @@ def build(frame: tk.Frame, user: dict):
         else:
             sort_col     = col
             sort_reverse = False
-        cargar()  # Refresca la tabla con el nuevo orden
+        poblar()  # Reordena con los datos ya cargados
 
     def cargar():
         """
-        Recupera transacciones de Firebase, aplica filtros de fecha
-        y orden, luego inserta filas en el Treeview.
+        Recupera transacciones de Firebase y repuebla la tabla.
         """
-        tree.delete(*tree.get_children())
+        nonlocal data_all
         data, _ = fb.get_transactions(uid)
-        # Convertimos dict a lista de registros con clave
-        lista = [{"__key":k, **v} for k,v in (data or {}).items()]
-
-        # Filtrar según fechas seleccionadas
-        d0 = date_from.get_date()
-        d1 = date_to.get_date()
-        lista = [t for t in lista
-                 if d0 <= datetime.fromtimestamp(t["fecha"]).date() <= d1]
-
-        # Ordenar según encabezado
-        key = col_map[sort_col]
-        if key in ("fecha","monto"):
-            lista.sort(key=lambda t: t.get(key,0), reverse=sort_reverse)
+        data_all = data or {}
+        poblar()
+
+    # Estado de la tabla:
+    # - visibles: keys que pasan el filtro, en orden; solo las 'mostradas' primeras
+    #   están insertadas en el Treeview.
+    # - consulta: (versión, hits, fechas y orden) de lo que está pintado.
+    # - filas_cache: tuplas de fila por key para 'filas_version' (se rehacen si cambia).
+    visibles, mostradas, consulta = [], 0, None
+    filas_cache, filas_version = {}, None
+
+    def poblar():
+        """
+        Aplica filtros de fecha, búsqueda y orden sobre los datos ya cargados
+        (sin ir a Firebase), luego inserta las primeras filas en el Treeview.
+        Si el resultado no cambió (p. ej. un espacio más en "Buscar"), no hace nada.
+        """
+        nonlocal visibles, mostradas, consulta, filas_cache, filas_version
+
+        # Búsqueda por texto: el índice se reconstruye solo si cambió la versión
+        version = fb.transactions_version(uid)
+        idx = search_index.index_for(uid, version, data_all)
+        hits = idx.search(search_var.get())
+
+        nueva = (version, hits, date_from.get_date(), date_to.get_date(),
+                 sort_col, sort_reverse)
+        if nueva == consulta:
+            return
+        # Tras una escritura local (solo cambia la versión) se conservan las filas mostradas
+        cuantas = mostradas if consulta is not None and consulta[1:] == nueva[1:] else 0
+        consulta = nueva
+        if version != filas_version:
+            filas_cache, filas_version = {}, version
+
+        # Fechas, búsqueda y orden según encabezado (sobre las columnas del Ledger)
+        visibles = filtrar_keys(columnar.ledger_for(uid, version, data_all), hits,
+                                date_from.get_date(), date_to.get_date(),
+                                col_map[sort_col], sort_reverse)
+        tree.delete(*tree.get_children())
+        mostradas = 0
+        insertar(max(cuantas, MAX_FILAS))
+
+    def insertar(hasta):
+        """Inserta las filas visibles que faltan hasta la posición 'hasta'."""
+        nonlocal mostradas
+        for i in range(mostradas, min(hasta, len(visibles))):
+            k = visibles[i]
+            valores = filas_cache.get(k)
+            if valores is None:
+                valores = filas_cache[k] = fila(data_all[k])
+            tree.insert("", "end", iid=k, values=valores,
+                        tags=("odd",) if i%2 else ("even",))
+        mostradas = min(hasta, len(visibles))
+        lbl_filas.configure(text=f"Mostrando {mostradas} de {len(visibles)} movimientos")
+        if mostradas < len(visibles):
+            btn_mas.pack(side="right")
         else:
-            lista.sort(key=lambda t: t.get(key,"").lower(), reverse=sort_reverse)
-
-        # Insertar filas en el Treeview
-        for t in lista:
-            tree.insert("", "end", iid=t["__key"], values=(
-                datetime.fromtimestamp(t["fecha"]).strftime("%Y-%m-%d"),
-                t.get("descripcion",""),
-                money(t.get("monto",0)),  # Formatea con separadores COP
-                t.get("tipo",""),
-                t.get("categoria","—")
-            ))
-        tag_rows()
+            btn_mas.pack_forget()
+
+    btn_mas.configure(command=lambda: insertar(mostradas + MAX_FILAS))
+
+    def parchar(version, cambios):
+        """
+        Aplica localmente escrituras ya confirmadas en Firebase, sin recargar:
+        - cambios: {key: registro_nuevo} (None si se eliminó).
+        Actualiza data_all, el Ledger, el índice de búsqueda y el autocompletado.
+        """
+        nonlocal data_all
+        # Copia: data_all puede ser el mismo dict que el snapshot de firebase_service
+        nuevo = dict(data_all)
+        nueva_version = fb.transactions_version(uid)
+        columnar.apply_changes(uid, version, nueva_version, cambios)
+        v = version
+        for k, rec in cambios.items():
+            previo = nuevo.get(k)
+            if rec is None:
+                nuevo.pop(k, None)
+            else:
+                nuevo[k] = rec
+            search_index.apply_change(uid, v, nueva_version, k, rec)
+            autocomplete.apply_change(uid, v, nueva_version, previo, rec)
+            v = nueva_version
+        data_all = nuevo
+
+    # Los filtros agrupan sus recargas: una sola por ciclo ocioso
+    scheduler = RenderScheduler(tree, cargar)
+    # Cada tecla en "Buscar" solo filtra localmente, también agrupado
+    search_scheduler = RenderScheduler(tree, poblar)
+    search_var.trace_add("write", search_scheduler.mark_dirty)
 
     # Asignamos funciones a botones de filtro
-    btn_apply.configure(command=cargar)
+    btn_apply.configure(command=scheduler.mark_dirty)
 
     def mostrar_todos():
         """Resetea DateEntry al rango completo y recarga."""
         date_from.set_date(min_date)
         date_to.set_date(max_date)
-        cargar()
+        scheduler.mark_dirty()
     btn_all.configure(command=mostrar_todos)
 
     # Gestión de selección de periodos rápidos
@@ -312,7 +486,7 @@ def build(frame: tk.Frame, user: dict):
         if p!="Personalizado":
             date_from.config(state="disabled")
             date_to.config(state="disabled")
-        cargar()
+        scheduler.mark_dirty()
 
     period_var.trace_add("write", on_period_change)
 
@@ -320,6 +494,11 @@ def build(frame: tk.Frame, user: dict):
     # 9) Modal para agregar/editar transacción
     # ─────────────────────────────────────────────────────────────────────
 
+    # Nombres de categorías desde la caché compartida (sin ir a Firebase por modal)
+    def nombres_categorias():
+        idx, _ = fb.get_category_index(uid)
+        return idx.names() or ["—"]
+
     def modal_edit(key=None, data=None):
         """
         Abre un Toplevel con campos para crear o editar:
@@ -346,9 +525,8 @@ def build(frame: tk.Frame, user: dict):
         fp = DateEntry(m, date_pattern="yyyy-mm-dd")
         fp.grid(row=2, column=1, **ent)
 
-        # ComboBox de categorías existentes
-        cats_dict, _ = fb.get_categories(uid)
-        names = [c["nombre"] for c in cats_dict.values()] if cats_dict else ["—"]
+        # ComboBox de categorías existentes (cacheadas: sin ir a Firebase por modal)
+        names = nombres_categorias()
         tk.Label(m, text="Categoría:", bg=COLOR_FONDO_GRIS).grid(row=3, column=0, **lab)
         cb = ttk.Combobox(m, values=names, state="readonly"); cb.grid(row=3, column=1, **ent)
         cb.current(0)
@@ -360,6 +538,75 @@ def build(frame: tk.Frame, user: dict):
         ttk.Radiobutton(m, text="Gasto",   variable=tv, value="Gasto")\
             .grid(row=4, column=1, pady=4)
 
+        # Al elegir una categoría, el tipo se ajusta al de esa categoría
+        def on_categoria(_event):
+            tipo = fb.get_category_index(uid)[0].tipo_of(cb.get())
+            if tipo:
+                tv.set(tipo)
+        cb.bind("<<ComboboxSelected>>", on_categoria)
+
+        # ── Autocompletado de la descripción ────────────────────────────
+        # Lista flotante bajo el campo con las descripciones más usadas que
+        # empiezan por lo escrito; al elegir una se pre-seleccionan la
+        # categoría y el tipo con que más se ha usado.
+        trie = autocomplete.trie_for(uid, fb.transactions_version(uid), data_all)
+        lb = tk.Listbox(m, height=5, activestyle="none",
+                        selectbackground=COLOR_VERDE_CRECIMIENTO)
+
+        def ocultar_sugerencias(*_):
+            lb.place_forget()
+
+        def aplicar_sugerencia(texto):
+            desc.delete(0, "end")
+            desc.insert(0, texto)
+            ocultar_sugerencias()
+            sug = trie.suggest(texto)
+            if sug:
+                categoria, tipo = sug
+                if categoria in names:
+                    cb.set(categoria)
+                if tipo in ("Ingreso", "Gasto"):
+                    tv.set(tipo)
+            em.focus_set()
+
+        def on_desc_key(event):
+            if event.keysym in ("Down", "Up", "Return", "Tab", "Escape"):
+                return
+            opciones = [o for o in trie.complete(desc.get()) if o != desc.get()]
+            if not opciones:
+                ocultar_sugerencias()
+                return
+            lb.delete(0, "end")
+            for o in opciones:
+                lb.insert("end", o)
+            lb.configure(height=len(opciones))
+            lb.place(in_=desc, x=0, rely=1.0, relwidth=1.0)
+            lb.lift()
+
+        def on_desc_nav(event):
+            if not lb.winfo_ismapped():
+                return
+            if event.keysym == "Escape":
+                ocultar_sugerencias()
+                return "break"
+            cur = lb.curselection()
+            i = cur[0] if cur else -1
+            if event.keysym in ("Down", "Up"):
+                i = min(i + 1, lb.size() - 1) if event.keysym == "Down" else max(i - 1, 0)
+                lb.selection_clear(0, "end")
+                lb.selection_set(i)
+                return "break"
+            if event.keysym in ("Return", "Tab") and cur:
+                aplicar_sugerencia(lb.get(i))
+                return "break"
+
+        desc.bind("<KeyRelease>", on_desc_key)
+        for k in ("<Down>", "<Up>", "<Return>", "<Tab>", "<Escape>"):
+            desc.bind(k, on_desc_nav)
+        lb.bind("<ButtonRelease-1>",
+                lambda e: lb.curselection() and aplicar_sugerencia(lb.get(lb.curselection()[0])))
+        em.bind("<FocusIn>", ocultar_sugerencias)
+
         # Si es edición, prellenar campos
         if is_edit and data:
             desc.insert(0, data.get("descripcion",""))
@@ -383,16 +630,20 @@ def build(frame: tk.Frame, user: dict):
                 # Convertimos fecha a timestamp en segundos
                 "fecha": datetime.combine(fp.get_date(), datetime.min.time()).timestamp()
             }
+            version = fb.transactions_version(uid)
             if is_edit:
                 ok, err = fb.update_transaction(uid, key, payload)
+                new_key = key
             else:
-                _, err = fb.add_transaction(uid, payload)
+                new_key, err = fb.add_transaction(uid, payload)
                 ok = (err is None)
             if err or not ok:
                 messagebox.showerror("Error", err or "Error desconocido", parent=m)
                 return
+            # Actualización local (índices incluidos) y re-filtrado sin ir a Firebase
+            parchar(version, {new_key: {**(data_all.get(new_key) or {}), **payload}})
             m.destroy()
-            cargar()
+            poblar()
 
         # Botón Guardar
         ttk.Button(m,
@@ -403,20 +654,291 @@ def build(frame: tk.Frame, user: dict):
 
     # Enlazamos botones de CRUD con sus funciones
     btn_nuevo .configure(command=lambda: modal_edit())
-    btn_borrar.configure(command=lambda: (
-        messagebox.askyesno("Confirmar", "¿Eliminar movimiento?", parent=frame)
-        and fb.delete_transaction(uid, tree.selection()[0])
-        and cargar()
-    ))
-    btn_editar.configure(command=lambda: (
-        tree.selection() and
-        fb.get_single_transaction(uid, tree.selection()[0])[0] and
-        modal_edit(tree.selection()[0],
-                   fb.get_single_transaction(uid, tree.selection()[0])[0])
-    ))
+    def eliminar():
+        """Elimina los movimientos seleccionados tras una sola confirmación."""
+        sel = tree.selection()
+        if not sel:
+            return
+        pregunta = ("¿Eliminar movimiento?" if len(sel) == 1
+                    else f"¿Eliminar {len(sel)} movimientos?")
+        if not messagebox.askyesno("Confirmar", pregunta, parent=frame):
+            return
+        version = fb.transactions_version(uid)
+        ok, err = fb.bulk_delete_transactions(uid, sel)
+        if err or not ok:
+            messagebox.showerror("Error", err or "Error desconocido", parent=frame)
+            return
+        parchar(version, {k: None for k in sel})
+        poblar()
+
+    def actualizar_seleccion(campos, descripcion):
+        """
+        Aplica 'campos' a todas las filas seleccionadas con una sola escritura
+        y actualiza esas filas en la tabla.
+        """
+        sel = tree.selection()
+        if not sel:
+            return False
+        if len(sel) > 1 and not messagebox.askyesno(
+                "Confirmar", f"¿{descripcion} {len(sel)} movimientos?", parent=frame):
+            return False
+        version = fb.transactions_version(uid)
+        nuevos, err = fb.bulk_update_transactions(uid, {k: dict(campos) for k in sel})
+        if err:
+            messagebox.showerror("Error", err, parent=frame)
+            return False
+        # El snapshot de firebase_service puede no tener todos los campos: completamos
+        # con lo que ya está cargado en la tabla
+        nuevos = {k: {**data_all.get(k, {}), **rec} for k, rec in nuevos.items()}
+        parchar(version, nuevos)
+        for k, rec in nuevos.items():
+            if tree.exists(k):
+                tree.item(k, values=fila(rec))
+        return True
+
+    def modal_lote(titulo, construir):
+        """
+        Modal pequeño para acciones en lote sobre la selección:
+        - construir(m) agrega los campos y retorna una función que da el dict de campos
+          (o None si falta elegir algo; el modal sigue abierto).
+        """
+        sel = tree.selection()
+        if not sel:
+            return
+        m = tk.Toplevel(frame)
+        m.title(f"{titulo} ({len(sel)})")
+        m.grab_set()
+        m.configure(bg=COLOR_FONDO_GRIS)
+        leer = construir(m)
+
+        def aplicar():
+            campos = leer()
+            if campos is not None and actualizar_seleccion(campos, titulo):
+                m.destroy()
+
+        ttk.Button(m, text="Aplicar", style="Accent.TButton", command=aplicar)\
+            .grid(row=5, columnspan=2, pady=(10,8))
+
+    def recategorizar():
+        """
+        Asigna una misma categoría a todas las filas seleccionadas; el tipo pasa a ser
+        el de esa categoría (como en el modal de edición).
+        """
+        def construir(m):
+            tk.Label(m, text="Categoría:", bg=COLOR_FONDO_GRIS)\
+                .grid(row=0, column=0, sticky="e", padx=5, pady=4)
+            cb = ttk.Combobox(m, values=nombres_categorias(), state="readonly")
+            cb.grid(row=0, column=1, padx=5, pady=4)
+            cb.current(0)
+
+            def leer():
+                campos = {"categoria": cb.get()}
+                tipo = fb.get_category_index(uid)[0].tipo_of(cb.get())
+                if tipo:
+                    campos["tipo"] = tipo
+                return campos
+            return leer
+        modal_lote("Recategorizar", construir)
+
+    def cambiar_tipo():
+        """
+        Marca todas las filas seleccionadas como Ingreso o Gasto, con una categoría de
+        ese tipo (solo se listan esas), para que tipo y categoría no se contradigan.
+        """
+        def construir(m):
+            tv = tk.StringVar(value="Gasto")
+            ttk.Radiobutton(m, text="Ingreso", variable=tv, value="Ingreso")\
+                .grid(row=0, column=0, padx=5, pady=4)
+            ttk.Radiobutton(m, text="Gasto",   variable=tv, value="Gasto")\
+                .grid(row=0, column=1, padx=5, pady=4)
+            tk.Label(m, text="Categoría:", bg=COLOR_FONDO_GRIS)\
+                .grid(row=1, column=0, sticky="e", padx=5, pady=4)
+            cb = ttk.Combobox(m, state="readonly")
+            cb.grid(row=1, column=1, padx=5, pady=4)
+
+            def on_tipo(*_):
+                nombres = fb.get_category_index(uid)[0].names(tv.get())
+                cb.configure(values=nombres)
+                cb.set(nombres[0] if nombres else "")
+            tv.trace_add("write", on_tipo)
+            on_tipo()
+
+            def leer():
+                if not cb.get():
+                    messagebox.showwarning(
+                        "Cambiar tipo", f"No hay categorías de tipo {tv.get()}.", parent=m)
+                    return None
+                return {"tipo": tv.get(), "categoria": cb.get()}
+            return leer
+        modal_lote("Cambiar tipo", construir)
+
+    def editar():
+        """Edita la fila seleccionada con el registro ya cargado (sin ir a Firebase)."""
+        sel = tree.selection()
+        if len(sel) != 1:
+            if sel:
+                messagebox.showinfo("Editar", "Selecciona un solo movimiento para editar.",
+                                    parent=frame)
+            return
+        rec = data_all.get(sel[0])
+        if rec:
+            modal_edit(sel[0], rec)
+
+    btn_borrar.configure(command=eliminar)
+    btn_editar.configure(command=editar)
+    btn_recat .configure(command=recategorizar)
+    btn_tipo  .configure(command=cambiar_tipo)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 10) Importar extractos CSV/OFX
+    # ─────────────────────────────────────────────────────────────────────
+
+    # Campos que se pueden mapear a columnas del CSV (fecha y algún monto, obligatorios)
+    campos_import = [("fecha", "Fecha*"), ("descripcion", "Descripción"),
+                     ("monto", "Monto"), ("debito", "Débito"), ("credito", "Crédito"),
+                     ("tipo", "Tipo"), ("categoria", "Categoría")]
+
+    def importar():
+        """Elige un archivo y, si es CSV, confirma el mapa de columnas antes de importar."""
+        path = filedialog.askopenfilename(
+            parent=frame, title="Importar extracto",
+            filetypes=[("Extractos", "*.csv *.ofx *.qfx"), ("CSV", "*.csv"),
+                       ("OFX", "*.ofx *.qfx"), ("Todos", "*.*")])
+        if not path:
+            return
+        if path.lower().endswith((".ofx", ".qfx")):
+            ejecutar_importacion(path, None)
+            return
+
+        # Codificación detectada una vez (UTF-8 o cp1252) para la cabecera y la importación
+        encoding = importer.csv_encoding(path)
+        try:
+            header = importer.header_of(path, encoding)
+        except UnicodeDecodeError:
+            messagebox.showerror("Importar", "No se pudo leer el archivo: codificación "
+                                 "desconocida.", parent=frame)
+            return
+        if not header:
+            messagebox.showerror("Importar", "El archivo está vacío.", parent=frame)
+            return
+        propuesta = importer.guess_columns(header)
+
+        m = tk.Toplevel(frame)
+        m.title("Columnas del extracto")
+        m.grab_set()
+        m.configure(bg=COLOR_FONDO_GRIS)
+        combos = {}
+        for i, (campo, etiqueta) in enumerate(campos_import):
+            tk.Label(m, text=f"{etiqueta}:", bg=COLOR_FONDO_GRIS)\
+                .grid(row=i, column=0, sticky="e", padx=5, pady=3)
+            cb = ttk.Combobox(m, values=[""] + header, state="readonly", width=28)
+            cb.set(propuesta.get(campo, ""))
+            cb.grid(row=i, column=1, padx=5, pady=3)
+            combos[campo] = cb
+        tk.Label(m, text="Indica Monto, o bien Débito/Crédito.",
+                 bg=COLOR_FONDO_GRIS, fg=COLOR_TEXTO_GRIS, font=FONT_NORMAL)\
+            .grid(row=len(campos_import), columnspan=2, pady=(4,0))
+
+        def continuar():
+            mapping = {c: cb.get() for c, cb in combos.items() if cb.get()}
+            if "fecha" not in mapping or not ({"monto", "debito", "credito"} & set(mapping)):
+                messagebox.showerror("Importar", "Selecciona la fecha y el monto.", parent=m)
+                return
+            m.destroy()
+            ejecutar_importacion(path, mapping, encoding)
+
+        ttk.Button(m, text="Importar", style="Accent.TButton", command=continuar)\
+            .grid(row=len(campos_import) + 1, columnspan=2, pady=(10,8))
+
+    def ejecutar_importacion(path, mapping, encoding=None):
+        """
+        Importa en un hilo de trabajo (lectura, deduplicado y escrituras por bloques)
+        mostrando una barra de progreso; al terminar parcha la tabla localmente.
+        """
+        version = fb.transactions_version(uid)
+        trie = autocomplete.trie_for(uid, version, data_all)
+        cat_index, _ = fb.get_category_index(uid)
+        existentes = data_all
+
+        def trabajo(report, cancelled):
+            return importer.run_import(
+                path, existentes,
+                lambda bloque: fb.bulk_add_transactions(uid, bloque),
+                mapping=mapping, trie=trie, cat_index=cat_index,
+                progress=lambda f, r: report(
+                    f, f"{r.importadas} importadas · {r.duplicadas} duplicadas"),
+                cancelled=cancelled, encoding=encoding)
+
+        def listo(r, error):
+            if error is not None:
+                messagebox.showerror("Importar", str(error), parent=frame)
+                return
+            terminar(version, r)
+
+        run_with_progress(frame, "Importando…", trabajo, listo)
+
+    def terminar(version, r):
+        """Incorpora lo importado a la tabla y muestra el resumen."""
+        nonlocal min_date, max_date
+        if r.nuevos:
+            parchar(version, r.nuevos)
+            dias = [datetime.fromtimestamp(t["fecha"]).date() for t in r.nuevos.values()]
+            min_date = min(min_date, min(dias))
+            max_date = max(max_date, max(dias))
+            date_from.config(mindate=min_date)
+            date_to.config(mindate=min_date)
+            period_var.set("Personalizado")
+            date_from.set_date(min_date)
+            date_to.set_date(max_date)
+            poblar()
+        resumen = (f"Filas leídas: {r.leidas}\n"
+                   f"Importadas: {r.importadas}\n"
+                   f"Duplicadas (omitidas): {r.duplicadas}\n"
+                   f"Inválidas (omitidas): {r.invalidas}")
+        if r.error:
+            messagebox.showwarning("Importar", f"{r.error}\n\n{resumen}", parent=frame)
+        else:
+            messagebox.showinfo("Importar", resumen, parent=frame)
+
+    btn_import.configure(command=importar)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 11) Exportar las filas visibles (filtros y orden actuales)
+    # ─────────────────────────────────────────────────────────────────────
+
+    def exportar():
+        """Escribe las filas filtradas (no solo las insertadas) a CSV/Parquet en segundo plano."""
+        keys = list(visibles)
+        if not keys:
+            messagebox.showinfo("Exportar", "No hay movimientos para exportar.", parent=frame)
+            return
+        d0, d1 = date_from.get_date(), date_to.get_date()
+        path = filedialog.asksaveasfilename(
+            parent=frame, title="Exportar movimientos",
+            initialfile=f"movimientos_{d0:%Y%m%d}_{d1:%Y%m%d}.csv",
+            defaultextension=".csv", filetypes=exporter.filetypes())
+        if not path:
+            return
+        datos = data_all   # Referencia: las escrituras locales crean un dict nuevo
+
+        def listo(n, error):
+            if isinstance(error, InterruptedError):
+                return
+            if error is not None:
+                messagebox.showerror("Exportar", str(error), parent=frame)
+                return
+            messagebox.showinfo("Exportar", f"{n} movimientos exportados.", parent=frame)
+
+        run_with_progress(
+            frame, "Exportando…",
+            lambda report, cancelled: exporter.export_transactions(
+                path, datos, keys, report=report, cancelled=cancelled),
+            listo)
+
+    btn_export.configure(command=exportar)
 
     # ─────────────────────────────────────────────────────────────────────
-    # 10) Inicializar: mostramos todos al cargar la sección por primera vez
+    # 12) Inicializar: mostramos todos al cargar la sección por primera vez
     # ─────────────────────────────────────────────────────────────────────
 
     mostrar_todos()
@@ -5,9 +5,19 @@
 # - Limpiar contenedores de widgets en Tkinter.
 # - Centrar ventanas en pantalla.
 # - Formatear números como cadenas monetarias en pesos colombianos (COP).
+# - Ubicar la carpeta de caché local de la aplicación.
+# - Agrupar redibujados de vistas en un solo recálculo por ciclo ocioso (RenderScheduler).
+# - Ejecutar tareas largas en segundo plano con barra de progreso (run_with_progress)
+#   o sin interfaz, entregando el resultado en el hilo de Tk (run_in_background).
 # ===========================================================================================
 
+import contextvars
+import os
+import threading
 import tkinter as tk
+from tkinter import ttk
+
+import tracing
 
 def clear_frame(frame: tk.Frame) -> None:
     """
@@ -76,3 +86,194 @@ def money(value: float) -> str:
     # formateo con coma para miles y luego convertimos comas a puntos
     formatted = f"${value:,.0f}".replace(",", ".")
     return formatted
+
+
+def cache_dir(*parts: str, private: bool = False) -> str:
+    """
+    Devuelve la ruta de una subcarpeta dentro de la caché local de Klarity,
+    creándola si todavía no existe.
+
+    Parámetros:
+    - parts: nombres de subcarpetas (ej. "img" o un uid).
+    - private: si es True, las subcarpetas quedan con permisos 0700 (solo el
+      usuario), para datos personales como montos, descripciones o tokens.
+
+    La carpeta base es ~/.klarity/cache, salvo que la variable de entorno
+    KLARITY_CACHE_DIR indique otra ubicación.
+
+    Ejemplo:
+        >>> cache_dir("img")
+        '/home/usuario/.klarity/cache/img'
+    """
+    base = os.environ.get("KLARITY_CACHE_DIR") or \
+        os.path.join(os.path.expanduser("~"), ".klarity", "cache")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, mode=0o700 if private else 0o777, exist_ok=True)
+    if private:
+        # makedirs no cambia carpetas que ya existían (p. ej. de una versión anterior)
+        for i in range(1, len(parts) + 1):
+            try:
+                os.chmod(os.path.join(base, *parts[:i]), 0o700)
+            except OSError:
+                pass
+    return path
+
+
+class RenderScheduler:
+    """
+    Agrupa las peticiones de redibujado de una vista.
+
+    En lugar de recalcular en cada cambio de filtro, los controles marcan la
+    vista como "sucia" con mark_dirty(); el recálculo real se ejecuta una sola
+    vez cuando Tk queda ocioso (after_idle). Si llega otra petición antes,
+    la pendiente se cancela y se reprograma, de modo que solo corre la última.
+
+    Parámetros:
+    - widget: cualquier widget de la vista (da acceso a after_idle/after_cancel).
+    - fn: función sin argumentos que recalcula y redibuja.
+
+    Uso típico:
+        scheduler = RenderScheduler(frame, render)
+        period_var.trace_add("write", lambda *_: scheduler.mark_dirty())
+    """
+
+    def __init__(self, widget: tk.Misc, fn):
+        self.widget = widget
+        self.fn = fn
+        self._job = None
+        self._ctx = None
+
+    def mark_dirty(self, *_):
+        """Programa un redibujado, reemplazando el que estuviera pendiente."""
+        self.cancel()
+        # El redibujado corre en el contexto de quien lo pidió (traza de la acción)
+        self._ctx = contextvars.copy_context()
+        self._job = self.widget.after_idle(self._run)
+
+    def cancel(self) -> None:
+        """Descarta el redibujado pendiente, si existe."""
+        if self._job is not None:
+            try:
+                self.widget.after_cancel(self._job)
+            except tk.TclError:
+                pass
+            self._job = None
+
+    def _run(self) -> None:
+        self._job = None
+        # La vista pudo destruirse (navegación) antes de que Tk quedara ocioso.
+        try:
+            if not self.widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        ctx, self._ctx = self._ctx, None
+        if ctx is None:
+            self.fn()
+        else:
+            ctx.run(self._render)
+
+    def _render(self) -> None:
+        with tracing.span("render", cat="ui"):
+            self.fn()
+
+
+def run_with_progress(parent: tk.Misc, title: str, work, on_done, poll_ms: int = 100) -> None:
+    """
+    Ejecuta una tarea larga en un hilo de trabajo mostrando un modal con barra
+    de progreso y botón "Cancelar", sin bloquear la ventana.
+
+    Parámetros:
+    - parent: widget sobre el que se abre el modal.
+    - title: título del modal.
+    - work(report, cancelled): función que hace el trabajo (en el hilo de trabajo,
+      sin tocar widgets). report(fraccion, texto) informa el avance (0..1);
+      cancelled() es True si el usuario pidió cancelar.
+    - on_done(resultado, error): se llama en el hilo de Tk al terminar, con lo que
+      retornó work o con la excepción que lanzó.
+
+    Uso típico:
+        run_with_progress(frame, "Exportando…",
+                          lambda report, cancelled: exportar(ruta, report, cancelled),
+                          lambda n, err: messagebox.showinfo("Listo", f"{n} filas"))
+    """
+    estado = {"fraccion": 0.0, "texto": "", "cancelar": False,
+              "fin": False, "resultado": None, "error": None}
+
+    m = tk.Toplevel(parent)
+    m.title(title)
+    m.transient(parent.winfo_toplevel())
+    m.grab_set()
+    m.resizable(False, False)
+    m.protocol("WM_DELETE_WINDOW", lambda: estado.update(cancelar=True))
+    barra = ttk.Progressbar(m, length=320, mode="determinate", maximum=1.0)
+    barra.pack(padx=16, pady=(16, 6))
+    lbl = tk.Label(m, text="Procesando…")
+    lbl.pack(padx=16)
+    ttk.Button(m, text="Cancelar", command=lambda: estado.update(cancelar=True))\
+        .pack(pady=(8, 12))
+
+    def trabajo():
+        try:
+            estado["resultado"] = work(
+                lambda fraccion, texto="": estado.update(fraccion=fraccion, texto=texto),
+                lambda: estado["cancelar"])
+        except Exception as e:
+            estado["error"] = e
+        estado["fin"] = True
+
+    def revisar():
+        try:
+            if not m.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        barra["value"] = estado["fraccion"]
+        if estado["texto"]:
+            lbl.configure(text=estado["texto"])
+        if not estado["fin"]:
+            m.after(poll_ms, revisar)
+            return
+        m.grab_release()
+        m.destroy()
+        on_done(estado["resultado"], estado["error"])
+
+    # El hilo hereda el contexto (traza de la acción que lanzó la tarea)
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(trabajo,), daemon=True).start()
+    m.after(poll_ms, revisar)
+
+
+def run_in_background(widget: tk.Misc, work, on_done, poll_ms: int = 100) -> None:
+    """
+    Ejecuta work() en un hilo de trabajo, sin modal, y llama on_done(resultado, error)
+    en el hilo de Tk al terminar. Si 'widget' ya no existe (p. ej. se navegó a otra
+    sección), el resultado se descarta.
+
+    Uso típico:
+        run_in_background(frame, lambda: fb.get_transactions(uid),
+                          lambda res, err: actualizar(res[0]) if not err else None)
+    """
+    estado = {"fin": False, "resultado": None, "error": None}
+
+    def trabajo():
+        try:
+            estado["resultado"] = work()
+        except Exception as e:
+            estado["error"] = e
+        estado["fin"] = True
+
+    def revisar():
+        try:
+            if not widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        if not estado["fin"]:
+            widget.after(poll_ms, revisar)
+            return
+        on_done(estado["resultado"], estado["error"])
+
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(trabajo,), daemon=True).start()
+    widget.after(poll_ms, revisar)